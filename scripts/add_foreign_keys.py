@@ -2,32 +2,73 @@
 """
 Add foreign key constraints to a CBDB SQLite database based on foreign_keys_regen.csv.
 
-Reads the FK definitions from a CSV URL, groups them by table, and recreates
-each affected table with proper FOREIGN KEY constraints appended to the schema.
+Reads the FK definitions from a CSV URL, groups them by table, and appends
+proper FOREIGN KEY constraints to the schema of each affected table.
 Tables that already have FK constraints are skipped (idempotent).
 
+Two methods are available:
+
+* ``schema`` (default) rewrites the CREATE TABLE statements in sqlite_master
+  through PRAGMA writable_schema, in one transaction.  FOREIGN KEY clauses do
+  not change the on-disk record format, so no table data is copied; each new
+  statement is first validated against an in-memory database.
+* ``copy`` recreates every table with INSERT INTO ... SELECT, DROP and RENAME,
+  all inside one transaction with the rollback journal kept in memory.
+
+Both finish with a PRAGMA foreign_key_check report on the updated tables.
+
+The FK definitions can come from the CSV URL, a local CSV (--csv-file) or a
+JSON export of the parsed map (--fk-json).  Downloads are kept in a
+content-addressed cache.  A cached copy younger than --max-age (default one
+day) is used without any request; an older one is revalidated with ETag /
+Last-Modified.  With --offline the cached copy is used whatever its age.
+
 Usage:
-    python add_foreign_keys.py [--db DB_PATH] [--csv-url URL]
+    python add_foreign_keys.py [--db DB_PATH] [--csv-url URL | --csv-file PATH | --fk-json [PATH]]
+                               [--offline | --max-age SECONDS] [--export-fk-json [PATH]]
+                               [--method {schema,copy}]
+                               [--sql-profile PATH]
 """
 
 from __future__ import annotations
 
 import argparse
 import csv
+import hashlib
 import io
+import json
 import logging
+import os
 import re
 import sqlite3
+import time
+import urllib.error
 import urllib.request
 from collections import defaultdict
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple
 
+import sql_profiler
+import sqlite_profiles
+
+METHODS = ("schema", "copy")
+
 CSV_URL = (
     "https://raw.githubusercontent.com/cbdb-project/cbdb-user-mdb-tests"
     "/main/reports/foreign_keys_regen.csv"
 )
 
+# Versioned JSON export of the parsed FK map, for builds without network access.
+# Not shipped; write it with --export-fk-json.
+FK_JSON = Path(__file__).with_name("foreign_keys.json")
+FK_JSON_VERSION = 1
+
+CACHE_DIR = Path(os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache") / "cbdb_sqlite"
+# A cached download younger than this many seconds is used without revalidating it.
+CACHE_MAX_AGE = 24 * 3600
+FETCH_TIMEOUT = 60.0
+
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logger = logging.getLogger(__name__)
 
@@ -35,10 +76,122 @@ logger = logging.getLogger(__name__)
 FKDef = Tuple[str, str, str]
 
 
-def fetch_csv(url: str) -> str:
+def _decode(content: bytes) -> str:
+    return content.decode("utf-8-sig")  # strip BOM if present
+
+
+class DownloadCache:
+    """
+    Content-addressed cache of downloaded files.  Each body is stored once under
+    its SHA-256; index.json maps a URL to that digest, to the time it was last
+    fetched or revalidated and to the validators (ETag, Last-Modified) used to
+    revalidate it.
+    """
+
+    def __init__(self, directory: str | Path = CACHE_DIR):
+        self.directory = Path(directory)
+        self.index_path = self.directory / "index.json"
+
+    def _load_index(self) -> Dict[str, Dict[str, str]]:
+        try:
+            return json.loads(self.index_path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_bytes(data)
+        os.replace(tmp, path)
+
+    def lookup(self, url: str) -> Optional[Tuple[Dict[str, str], bytes]]:
+        """Return (entry, body) for *url*, or None if missing or corrupt."""
+        entry = self._load_index().get(url)
+        if entry is None:
+            return None
+        try:
+            body = (self.directory / entry["sha256"]).read_bytes()
+        except OSError:
+            return None
+        if hashlib.sha256(body).hexdigest() != entry["sha256"]:
+            logger.warning("Cached copy of %s is corrupt, ignoring it.", url)
+            return None
+        return entry, body
+
+    def store(self, url: str, body: bytes, etag: Optional[str], last_modified: Optional[str]) -> None:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        digest = hashlib.sha256(body).hexdigest()
+        blob = self.directory / digest
+        if not blob.exists():
+            self._write_atomic(blob, body)
+        index = self._load_index()
+        index[url] = {"sha256": digest, "checked_at": time.time()}
+        if etag:
+            index[url]["etag"] = etag
+        if last_modified:
+            index[url]["last_modified"] = last_modified
+        self._write_atomic(self.index_path, json.dumps(index, indent=2, sort_keys=True).encode("utf-8"))
+
+    def touch(self, url: str) -> None:
+        """Record that the cached copy of *url* was just revalidated."""
+        index = self._load_index()
+        if url in index:
+            index[url]["checked_at"] = time.time()
+            self._write_atomic(self.index_path, json.dumps(index, indent=2, sort_keys=True).encode("utf-8"))
+
+
+def fetch_csv(
+    url: str,
+    cache: Optional[DownloadCache] = None,
+    offline: bool = False,
+    max_age: float = CACHE_MAX_AGE,
+) -> str:
+    """
+    Return the text at *url*.  With a *cache*, a cached copy checked less than
+    *max_age* seconds ago, or any cached copy when *offline* is set, is used
+    without a request; an older one is revalidated with a conditional request
+    and reused if the server answers 304 or cannot be reached.
+    """
+    cached = cache.lookup(url) if cache else None
+    if offline:
+        if cached is None:
+            raise RuntimeError(f"--offline given but {url} is not in the cache")
+        logger.info("Using cached FK definitions for %s (offline)", url)
+        return _decode(cached[1])
+    if cached is not None:
+        age = time.time() - cached[0].get("checked_at", 0)
+        if 0 <= age < max_age:
+            logger.info("Using cached FK definitions for %s (checked %.0f min ago)", url, age / 60)
+            return _decode(cached[1])
+
     logger.info("Fetching FK definitions from %s", url)
-    with urllib.request.urlopen(url) as response:
-        return response.read().decode("utf-8-sig")  # strip BOM if present
+    request = urllib.request.Request(url)
+    if cached:
+        entry = cached[0]
+        if "etag" in entry:
+            request.add_header("If-None-Match", entry["etag"])
+        if "last_modified" in entry:
+            request.add_header("If-Modified-Since", entry["last_modified"])
+    try:
+        with urllib.request.urlopen(request, timeout=FETCH_TIMEOUT) as response:
+            body = response.read()
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+    except urllib.error.HTTPError as exc:
+        if exc.code == 304 and cached:
+            logger.info("  not modified, using cached copy.")
+            cache.touch(url)
+            return _decode(cached[1])
+        raise
+    except OSError as exc:
+        # URLError, or a timeout while reading the body.
+        if cached:
+            logger.warning("  %s unreachable (%s), using cached copy.", url, getattr(exc, "reason", exc))
+            return _decode(cached[1])
+        raise
+
+    if cache:
+        cache.store(url, body, etag, last_modified)
+    return _decode(body)
 
 
 def parse_foreign_keys(csv_content: str) -> Dict[str, List[FKDef]]:
@@ -67,6 +220,55 @@ def parse_foreign_keys(csv_content: str) -> Dict[str, List[FKDef]]:
     return dict(fk_map)
 
 
+def save_fk_json(fk_map: Dict[str, List[FKDef]], path: str | Path, source: str) -> None:
+    """Write *fk_map* as a versioned JSON artifact, with tables in sorted order."""
+    payload = {
+        "version": FK_JSON_VERSION,
+        "source": source,
+        "generated_at_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "foreign_keys": {table: [list(fk) for fk in fk_map[table]] for table in sorted(fk_map)},
+    }
+    text = json.dumps(payload, indent=2, ensure_ascii=False)
+    # Keep each (col, ref_table, ref_col) triple on one line so diffs stay readable.
+    text = re.sub(r'\[\s+("[^"]*"),\s+("[^"]*"),\s+("[^"]*")\s+\]', r"[\1, \2, \3]", text)
+    Path(path).write_text(text + "\n", encoding="utf-8")
+    logger.info("Wrote FK definitions for %d tables to %s", len(fk_map), path)
+
+
+def load_fk_json(path: str | Path) -> Dict[str, List[FKDef]]:
+    """Read an FK map written by save_fk_json."""
+    if not Path(path).exists():
+        raise FileNotFoundError(f"{path} does not exist; write it first with add_foreign_keys.py --export-fk-json")
+    payload = json.loads(Path(path).read_text(encoding="utf-8"))
+    if payload.get("version") != FK_JSON_VERSION:
+        raise ValueError(
+            f"{path}: unsupported FK map version {payload.get('version')!r}, expected {FK_JSON_VERSION}"
+        )
+    return {table: [tuple(fk) for fk in fks] for table, fks in payload["foreign_keys"].items()}
+
+
+def load_foreign_keys(
+    csv_url: str = CSV_URL,
+    csv_file: Optional[str | Path] = None,
+    fk_json: Optional[str | Path] = None,
+    offline: bool = False,
+    cache: Optional[DownloadCache] = None,
+    max_age: float = CACHE_MAX_AGE,
+) -> Dict[str, List[FKDef]]:
+    """
+    Return the FK map from *fk_json* if given, else from *csv_file*, else from
+    *csv_url* through *cache* (the default cache directory if None); see
+    fetch_csv for *offline* and *max_age*.
+    """
+    if fk_json:
+        logger.info("Loading FK definitions from %s", fk_json)
+        return load_fk_json(fk_json)
+    if csv_file:
+        logger.info("Reading FK definitions from %s", csv_file)
+        return parse_foreign_keys(_decode(Path(csv_file).read_bytes()))
+    return parse_foreign_keys(fetch_csv(csv_url, cache or DownloadCache(), offline, max_age))
+
+
 def _has_foreign_keys(conn: sqlite3.Connection, table: str) -> bool:
     return bool(conn.execute(f'PRAGMA foreign_key_list("{table}")').fetchall())
 
@@ -121,20 +323,55 @@ def _build_create_with_fks(create_sql: str, tmp_name: str, fk_defs: List[FKDef])
     return new_sql
 
 
+def _usable_create_sql(conn: sqlite3.Connection, table: str) -> Optional[str]:
+    """Return the CREATE TABLE statement of *table*, or None if it cannot be rewritten."""
+    create_sql = _get_create_sql(conn, table)
+    if not create_sql:
+        logger.warning("  %s: not found in sqlite_master, skipping.", table)
+        return None
+
+    if "VIRTUAL" in create_sql.upper():
+        logger.info("  %s: virtual table, skipping.", table)
+        return None
+
+    return create_sql
+
+
+def _log_success(table: str, fk_defs: List[FKDef]) -> None:
+    fk_summary = ", ".join(f"{col}->{ref_t}.{ref_c}" for col, ref_t, ref_c in fk_defs)
+    logger.info("  ✓ %s  (%d FKs: %s)", table, len(fk_defs), fk_summary)
+
+
+def _validate_create_sql(old_sql: str, new_sql: str) -> None:
+    """
+    Check that *new_sql* parses and declares exactly the same columns as *old_sql*,
+    i.e. that only constraints were added and stored records stay valid.
+    """
+    scratch = sqlite3.connect(":memory:")
+    try:
+        scratch.execute(old_sql)
+        old_name = scratch.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchone()[0]
+        old_columns = scratch.execute(f'PRAGMA table_info("{old_name}")').fetchall()
+        scratch.execute(f'DROP TABLE "{old_name}"')
+        scratch.execute(new_sql)
+        new_name = scratch.execute("SELECT name FROM sqlite_master WHERE type='table'").fetchone()[0]
+        new_columns = scratch.execute(f'PRAGMA table_info("{new_name}")').fetchall()
+    finally:
+        scratch.close()
+    if old_columns != new_columns:
+        raise ValueError("column definitions changed")
+
+
 def _recreate_with_fks(
     conn: sqlite3.Connection, table: str, fk_defs: List[FKDef]
 ) -> bool:
     """
     Recreate *table* with FOREIGN KEY constraints appended.  Returns True on success.
-    Foreign-key enforcement is disabled for the duration of the operation.
+    Runs inside a savepoint of the caller's transaction; foreign-key enforcement
+    must already be disabled.
     """
-    create_sql = _get_create_sql(conn, table)
+    create_sql = _usable_create_sql(conn, table)
     if not create_sql:
-        logger.warning("  %s: not found in sqlite_master, skipping.", table)
-        return False
-
-    if "VIRTUAL" in create_sql.upper():
-        logger.info("  %s: virtual table, skipping.", table)
         return False
 
     tmp = f"_fk_rebuild_{table}"
@@ -149,39 +386,147 @@ def _recreate_with_fks(
         for row in conn.execute(f'PRAGMA table_info("{table}")').fetchall()
     )
 
-    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("SAVEPOINT fk_rebuild")
     try:
         conn.execute(f'DROP TABLE IF EXISTS "{tmp}"')
         conn.execute(new_create)
         conn.execute(f'INSERT INTO "{tmp}" SELECT {col_list} FROM "{table}"')
         conn.execute(f'DROP TABLE "{table}"')
         conn.execute(f'ALTER TABLE "{tmp}" RENAME TO "{table}"')
-        conn.commit()
-        fk_summary = ", ".join(f"{col}->{ref_t}.{ref_c}" for col, ref_t, ref_c in fk_defs)
-        logger.info("  ✓ %s  (%d FKs: %s)", table, len(fk_defs), fk_summary)
+        conn.execute("RELEASE fk_rebuild")
+        _log_success(table, fk_defs)
         return True
     except Exception as exc:
-        conn.rollback()
-        try:
-            conn.execute(f'DROP TABLE IF EXISTS "{tmp}"')
-        except Exception:
-            pass
+        conn.execute("ROLLBACK TO fk_rebuild")
+        conn.execute("RELEASE fk_rebuild")
         logger.error("  ✗ %s: %s", table, exc)
         return False
+
+
+def _apply_by_copy(conn: sqlite3.Connection, plans: List[Tuple[str, List[FKDef]]]) -> List[str]:
+    """Recreate every planned table in a single transaction; return the updated tables."""
+    # One commit at the end, and no whole-schema check on RENAME while views
+    # still refer to dropped tables.
+    conn.execute("PRAGMA foreign_keys = OFF")
+    conn.execute("PRAGMA legacy_alter_table = ON")
+    updated = []
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table, fk_defs in plans:
+                if _recreate_with_fks(conn, table, fk_defs):
+                    updated.append(table)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
     finally:
+        conn.execute("PRAGMA legacy_alter_table = OFF")
         conn.execute("PRAGMA foreign_keys = ON")
+    return updated
 
 
-def add_foreign_keys(db_path: str | Path, csv_url: str = CSV_URL) -> None:
+def _apply_by_schema(conn: sqlite3.Connection, plans: List[Tuple[str, List[FKDef]]]) -> List[str]:
+    """
+    Rewrite the CREATE TABLE statements in sqlite_master in a single transaction;
+    return the updated tables.  No table data is touched.
+    """
+    rewrites = []
+    for table, fk_defs in plans:
+        create_sql = _usable_create_sql(conn, table)
+        if not create_sql:
+            continue
+        try:
+            new_create = _build_create_with_fks(create_sql, table, fk_defs)
+            _validate_create_sql(create_sql, new_create)
+        except (ValueError, sqlite3.Error) as exc:
+            logger.error("  ✗ %s: new CREATE TABLE rejected — %s", table, exc)
+            continue
+        rewrites.append((table, fk_defs, new_create))
+
+    if not rewrites:
+        return []
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        # Read under the write lock, so no other writer can bump it in between.
+        schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+        conn.execute("PRAGMA writable_schema = ON")
+        for table, _, new_create in rewrites:
+            conn.execute(
+                "UPDATE sqlite_master SET sql = ? WHERE type = 'table' AND name = ?",
+                (new_create, table),
+            )
+        # Bumping the schema version makes every connection reload the edited schema.
+        conn.execute(f"PRAGMA schema_version = {schema_version + 1}")
+        conn.execute("PRAGMA writable_schema = OFF")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        conn.execute("PRAGMA writable_schema = OFF")
+        raise
+
+    for table, fk_defs, _ in rewrites:
+        _log_success(table, fk_defs)
+    return [table for table, _, _ in rewrites]
+
+
+def report_foreign_key_check(conn: sqlite3.Connection, tables: List[str]) -> int:
+    """Log PRAGMA foreign_key_check results for *tables*; return the violation count."""
+    total = 0
+    for table in tables:
+        try:
+            violations = conn.execute(f'PRAGMA foreign_key_check("{table}")').fetchall()
+        except sqlite3.Error as exc:
+            logger.warning("  ! %s: foreign_key_check failed — %s", table, exc)
+            continue
+        if not violations:
+            continue
+        by_parent: Dict[str, int] = defaultdict(int)
+        for _, _, parent, _ in violations:
+            by_parent[parent] += 1
+        total += len(violations)
+        logger.warning(
+            "  ! %s: %d rows reference missing parents (%s)",
+            table,
+            len(violations),
+            ", ".join(f"{parent}: {count}" for parent, count in sorted(by_parent.items())),
+        )
+    logger.info("foreign_key_check: %d violations in %d tables checked.", total, len(tables))
+    return total
+
+
+def add_foreign_keys(
+    db_path: str | Path,
+    csv_url: str = CSV_URL,
+    method: str = "schema",
+    csv_file: Optional[str | Path] = None,
+    fk_json: Optional[str | Path] = None,
+    offline: bool = False,
+    fk_map: Optional[Dict[str, List[FKDef]]] = None,
+    profile: str = "bulk",
+    timeout: float = 5.0,
+    max_age: float = CACHE_MAX_AGE,
+) -> None:
     """
     Add FOREIGN KEY constraints to all applicable tables in *db_path* based on
     foreign_keys_regen.csv.  Tables that already have FK constraints are skipped.
+    *method* is "schema" (rewrite sqlite_master) or "copy" (rebuild each table);
+    an already loaded *fk_map* is used as is, otherwise see load_foreign_keys
+    for the other arguments.  *profile* selects the sqlite_profiles connection
+    settings; the copy method keeps its rollback journal in memory.  *timeout*
+    is how long to wait for another writer, in seconds.
     """
-    content = fetch_csv(csv_url)
-    fk_map = parse_foreign_keys(content)
-    logger.info("CSV parsed: FK definitions found for %d tables.", len(fk_map))
+    if method not in METHODS:
+        raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+
+    if fk_map is None:
+        with sql_profiler.stage("load_fk_map"):
+            fk_map = load_foreign_keys(csv_url, csv_file, fk_json, offline, max_age=max_age)
+    logger.info("FK definitions found for %d tables.", len(fk_map))
 
-    conn = sqlite3.connect(str(db_path))
+    journal_mode = "memory" if method == "copy" else "wal"
+    conn = sqlite_profiles.connect(db_path, profile, journal_mode, timeout=timeout, isolation_level=None)
     try:
         # Build a case-insensitive lookup from uppercase name → actual DB name.
         db_table_lookup: Dict[str, str] = {
@@ -191,7 +536,8 @@ def add_foreign_keys(db_path: str | Path, csv_url: str = CSV_URL) -> None:
             ).fetchall()
         }
 
-        updated = skipped = missing = 0
+        plans: List[Tuple[str, List[FKDef]]] = []
+        skipped = missing = 0
         for upper_name, fk_defs in fk_map.items():
             actual = db_table_lookup.get(upper_name)
             if actual is None:
@@ -201,15 +547,25 @@ def add_foreign_keys(db_path: str | Path, csv_url: str = CSV_URL) -> None:
             if _has_foreign_keys(conn, actual):
                 skipped += 1
                 continue
-            if _recreate_with_fks(conn, actual, fk_defs):
-                updated += 1
+            plans.append((actual, fk_defs))
+
+        with sql_profiler.stage(f"apply_{method}"):
+            if method == "schema":
+                updated = _apply_by_schema(conn, plans)
+                # The editing connection keeps its cached schema; check with a fresh one.
+                conn.close()
+                conn = sqlite_profiles.connect(db_path, "default", timeout=timeout, isolation_level=None)
+            else:
+                updated = _apply_by_copy(conn, plans)
 
         logger.info(
             "Finished: %d tables updated, %d already had FKs, %d not in database.",
-            updated,
+            len(updated),
             skipped,
             missing,
         )
+        with sql_profiler.stage("foreign_key_check"):
+            report_foreign_key_check(conn, updated)
     finally:
         conn.close()
 
@@ -230,5 +586,77 @@ if __name__ == "__main__":
         metavar="URL",
         help="URL of foreign_keys_regen.csv (default: main branch on GitHub).",
     )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--csv-file",
+        type=Path,
+        metavar="PATH",
+        help="Read foreign_keys_regen.csv from a local file instead of --csv-url.",
+    )
+    source.add_argument(
+        "--fk-json",
+        type=Path,
+        nargs="?",
+        const=FK_JSON,
+        metavar="PATH",
+        help=f"Read the FK map from a JSON export (default path: {FK_JSON.name}).",
+    )
+    freshness = parser.add_mutually_exclusive_group()
+    freshness.add_argument(
+        "--offline",
+        action="store_true",
+        help=f"Use the cached copy of --csv-url without revalidating it (cache: {CACHE_DIR}).",
+    )
+    freshness.add_argument(
+        "--max-age",
+        type=float,
+        default=CACHE_MAX_AGE,
+        metavar="SECONDS",
+        help="Use a cached copy of --csv-url checked less than SECONDS ago without any request "
+        f"(default: {CACHE_MAX_AGE}; 0 always revalidates).",
+    )
+    parser.add_argument(
+        "--export-fk-json",
+        type=Path,
+        nargs="?",
+        const=FK_JSON,
+        metavar="PATH",
+        help=f"Only write the parsed FK map as JSON (default path: {FK_JSON.name}) and exit.",
+    )
+    parser.add_argument(
+        "--profile",
+        choices=sqlite_profiles.PROFILES,
+        default="bulk",
+        help="Connection settings: 'bulk' (synchronous=OFF, large cache; restored on exit, default) "
+        "or SQLite's 'default'.",
+    )
+    parser.add_argument(
+        "--method",
+        choices=METHODS,
+        default="schema",
+        help="'schema' rewrites sqlite_master in place (default); "
+        "'copy' rebuilds every table in one transaction.",
+    )
+    parser.add_argument(
+        "--sql-profile",
+        type=Path,
+        metavar="PATH",
+        help="Record per-stage SQL statistics and write them to PATH (JSON) and to a .folded "
+        "flame graph file next to it.",
+    )
     args = parser.parse_args()
-    add_foreign_keys(args.db, args.csv_url)
+    if args.export_fk_json:
+        fk_map = load_foreign_keys(args.csv_url, args.csv_file, args.fk_json, args.offline, max_age=args.max_age)
+        save_fk_json(fk_map, args.export_fk_json, str(args.csv_file or args.fk_json or args.csv_url))
+    else:
+        with sql_profiler.profiling(args.sql_profile):
+            add_foreign_keys(
+                args.db,
+                args.csv_url,
+                args.method,
+                args.csv_file,
+                args.fk_json,
+                args.offline,
+                profile=args.profile,
+                max_age=args.max_age,
+            )
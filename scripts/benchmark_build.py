@@ -0,0 +1,605 @@
+#!/usr/bin/env python3
+"""
+Time the post-processing steps on a synthetic CBDB database.
+
+A database is generated with make_synthetic_db.py (no network access
+needed), then every benchmark runs --repeat times on a fresh copy of it:
+
+    generate               make_synthetic_db.generate
+    fks:schema, fks:copy   add_foreign_keys with each method
+    views                  create_views
+    view:<name>            fetch every row of each of the 18 views
+    addresses              AddressHierarchyBuilder.run
+    addresses:sql          the same with engine="sql"
+    addresses:incremental  run(incremental=True) after one place changed
+    spatial                spatial_index.build_spatial_index
+    spatial:bbox, spatial:nearest  1000 viewport / 10-nearest queries in one year
+    names                  create_name_search.build_name_search
+    names:refresh          refresh_name_search after a few names changed
+    names:autocomplete     1000 name prefixes, Chinese and romanised, via NameSearch
+    names:like             the Chinese ones as LIKE '%...%' scans of the source tables
+    export:csv             every view written to CSV with the csv module, for comparison
+    export:parquet         export_parquet.export of every view (if pyarrow is installed)
+    dossier                1000 person dossiers from dossier_service.DossierService, cache disabled
+    dossier:cached         the same lookups over 100 people, with the dossier cache
+    dossier:naive          the 1000 dossiers with a new connection and sequential queries each
+    dossier:http           the 1000 dossiers through the HTTP front end, cache disabled
+    dossiers               person_dossier.build_dossiers, every person
+    dossiers:incremental   the same after a few people changed
+    dossiers:fetch         the 1000 dossiers read back from PERSON_DOSSIER via DossierStore
+    graph                  person_graph.build_graph (if numpy is installed)
+    graph:khop             100 two-hop neighbourhoods from PersonGraph, and 100 egos and degrees
+    graph:khop_sql         the same neighbourhoods as recursive SQL queries
+    compare, compare:hashes  compare_db_tables.main / main_hashes
+    patch:make, patch:apply  release_patch.make_patch / apply_patch for the same change
+    pipeline               cbdb_build.BuildPipeline.run
+
+The results (min / median / all runs per benchmark, plus the Python and
+SQLite versions and the git commit) are written as JSON.  With --baseline
+the medians are compared against an earlier result file and the script
+exits with status 1 if any benchmark got slower than --threshold times its
+baseline, and by more than --min-delta seconds, so it can guard against
+performance regressions.  BASELINE_FILE is the committed baseline that CI
+compares against.
+
+Usage:
+    python benchmark_build.py [--people N] [--repeat N] [--only REGEX]
+                              [--output PATH] [--baseline PATH] [--threshold X] [--min-delta S]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import csv
+import functools
+import io
+import json
+import logging
+import platform
+import re
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import add_foreign_keys
+import compare_db_tables
+import create_name_search
+import create_views
+import dossier_service
+import export_parquet
+import make_synthetic_db
+import person_dossier
+import person_graph
+import release_patch
+import spatial_index
+from cbdb_build import BuildPipeline
+from create_addresses_table import AddressHierarchyBuilder
+
+RESULTS_VERSION = 1
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 1.25
+RESULTS_DIR = Path(__file__).with_name("benchmark_results")
+BASELINE_FILE = Path(__file__).with_name("benchmark_baseline.json")
+# Queries per run of the spatial:* and names:* benchmarks.
+SPATIAL_QUERIES = 1000
+NAME_QUERIES = 1000
+# Queries per run of the graph:khop* benchmarks.
+GRAPH_QUERIES = 100
+# Lookups per run of the dossier:* benchmarks.
+DOSSIER_QUERIES = 1000
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class Benchmarks:
+    """Prepares the databases each benchmark needs and times the benchmarks on copies of them."""
+
+    def __init__(self, workdir: Path, people: int, addresses: Optional[int], seed: int, workers: int):
+        self.workdir = workdir
+        self.people = people
+        self.addresses = addresses
+        self.seed = seed
+        self.workers = workers
+        self.fk_map = make_synthetic_db.foreign_keys()
+        self.fk_json = workdir / "foreign_keys.json"
+        add_foreign_keys.save_fk_json(self.fk_map, self.fk_json, "make_synthetic_db.py")
+        self.base = workdir / "base.db"
+        self._prepared: Dict[str, Path] = {}
+
+    def copy(self, source: Path, name: str) -> Path:
+        target = self.workdir / name
+        target.unlink(missing_ok=True)
+        shutil.copyfile(source, target)
+        return target
+
+    def prepared(self, name: str) -> Path:
+        """The base database after a setup step; built once and reused by every run."""
+        if name not in self._prepared:
+            path = self.copy(self.base, f"{name}.db")
+            if name == "with_views":
+                add_foreign_keys.add_foreign_keys(path, fk_map=self.fk_map)
+                create_views.create_views(path)
+            elif name == "with_addresses":
+                # Leaves the fingerprints and ADDR_CLOSURE that addresses:incremental patches.
+                with AddressHierarchyBuilder(str(path), workers=self.workers) as builder:
+                    builder.run(incremental=True, closure=True)
+            elif name == "with_spatial":
+                path = self.copy(self.prepared("with_addresses"), f"{name}.db")
+                spatial_index.build_spatial_index(path)
+            elif name == "with_dossiers":
+                path = self.copy(self.prepared("with_views"), f"{name}.db")
+                person_dossier.build_dossiers(path, workers=self.workers)
+            elif name == "with_graph":
+                person_graph.build_graph(path)
+            elif name == "with_names":
+                create_name_search.build_name_search(path)
+            elif name == "changed":
+                # One renamed person and one moved place: a small diff for compare_db_tables.
+                conn = sqlite3.connect(str(path))
+                with conn:
+                    conn.execute("UPDATE BIOG_MAIN SET c_name = c_name || ' II' WHERE c_personid = 1")
+                    conn.execute(
+                        "DELETE FROM ADDR_BELONGS_DATA WHERE rowid = (SELECT MAX(rowid) FROM ADDR_BELONGS_DATA)"
+                    )
+                conn.close()
+            self._prepared[name] = path
+        return self._prepared[name]
+
+    def generate(self) -> None:
+        self.base.unlink(missing_ok=True)
+        make_synthetic_db.generate(self.base, self.people, self.addresses, self.seed)
+
+    def cases(self) -> Dict[str, Callable[[], Callable[[], None]]]:
+        """
+        {benchmark name: setup}; each setup prepares one run and returns the
+        function whose duration is measured.
+        """
+        cases: Dict[str, Callable[[], Callable[[], None]]] = {"generate": lambda: self.generate}
+
+        for method in add_foreign_keys.METHODS:
+            def fks(method: str = method) -> Callable[[], None]:
+                path = self.copy(self.base, "run.db")
+                return lambda: add_foreign_keys.add_foreign_keys(path, method=method, fk_map=self.fk_map)
+            cases[f"fks:{method}"] = fks
+
+        def views() -> Callable[[], None]:
+            path = self.copy(self.base, "run.db")
+            return lambda: create_views.create_views(path)
+        cases["views"] = views
+
+        for view in create_views.load_view_definitions():
+            def view_query(view: str = view) -> Callable[[], None]:
+                path = self.prepared("with_views")
+
+                def fetch() -> None:
+                    conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+                    try:
+                        for _ in conn.execute(f'SELECT * FROM "{view}"'):
+                            pass
+                    finally:
+                        conn.close()
+                return fetch
+            cases[f"view:{view}"] = view_query
+
+        for engine in ("memory", "sql"):
+            def addresses(engine: str = engine) -> Callable[[], None]:
+                path = self.copy(self.base, "run.db")
+                workers = self.workers if engine == "memory" else 1
+
+                def build() -> None:
+                    with AddressHierarchyBuilder(str(path), engine=engine, workers=workers) as builder:
+                        builder.run()
+                return build
+            cases["addresses" if engine == "memory" else f"addresses:{engine}"] = addresses
+
+        def addresses_incremental() -> Callable[[], None]:
+            path = self.copy(self.prepared("with_addresses"), "run.db")
+            conn = sqlite3.connect(str(path))
+            with conn:
+                conn.execute(
+                    "UPDATE ADDR_BELONGS_DATA SET c_lastyear = c_lastyear + 1 "
+                    "WHERE rowid = (SELECT MIN(rowid) FROM ADDR_BELONGS_DATA WHERE c_lastyear IS NOT NULL)"
+                )
+            conn.close()
+
+            def build() -> None:
+                with AddressHierarchyBuilder(str(path), workers=self.workers) as builder:
+                    builder.run(incremental=True)
+            return build
+        cases["addresses:incremental"] = addresses_incremental
+
+        def spatial() -> Callable[[], None]:
+            path = self.copy(self.prepared("with_addresses"), "run.db")
+            return lambda: spatial_index.build_spatial_index(path)
+        cases["spatial"] = spatial
+
+        for query in ("bbox", "nearest"):
+            def spatial_query(query: str = query) -> Callable[[], None]:
+                path = self.prepared("with_spatial")
+                # Fixed points spread over the extent of the synthetic coordinates.
+                points = [
+                    (100 + (i * 7919) % 2000 / 100, 22 + (i * 104729) % 1800 / 100) for i in range(SPATIAL_QUERIES)
+                ]
+
+                def run() -> None:
+                    with spatial_index.SpatialIndex(path) as index:
+                        for x, y in points:
+                            if query == "bbox":
+                                index.bbox(x, y, x + 2, y + 1.5, year=1100)
+                            else:
+                                index.nearest(x, y, k=10, year=1100)
+                return run
+            cases[f"spatial:{query}"] = spatial_query
+
+        def names() -> Callable[[], None]:
+            path = self.copy(self.base, "run.db")
+            return lambda: create_name_search.build_name_search(path)
+        cases["names"] = names
+
+        def names_refresh() -> Callable[[], None]:
+            path = self.copy(self.prepared("with_names"), "run.db")
+            conn = sqlite3.connect(str(path))
+            with conn:
+                conn.execute("UPDATE BIOG_MAIN SET c_name_chn = c_name_chn || '之' WHERE c_personid % 1000 = 1")
+                conn.execute("DELETE FROM ALTNAME_DATA WHERE rowid % 1000 = 1")
+            conn.close()
+            return lambda: create_name_search.refresh_name_search(path)
+        cases["names:refresh"] = names_refresh
+
+        def name_queries() -> List[str]:
+            """Prefixes of 1 to 3 characters of Chinese names, and of 3 to 8 letters of romanised ones."""
+            conn = sqlite3.connect(f"file:{self.base}?mode=ro", uri=True)
+            try:
+                rows = conn.execute(
+                    "SELECT c_name_chn, c_name FROM BIOG_MAIN ORDER BY c_personid LIMIT ?", (NAME_QUERIES // 2,)
+                ).fetchall()
+            finally:
+                conn.close()
+            queries = []
+            for i, (name_chn, name) in enumerate(rows):
+                queries.append(name_chn[: 1 + i % 3])
+                queries.append(name[: 3 + i % 6])
+            return queries
+
+        def names_autocomplete() -> Callable[[], None]:
+            path = self.prepared("with_names")
+            queries = name_queries()
+
+            def run() -> None:
+                with create_name_search.NameSearch(path) as index:
+                    for query in queries:
+                        index.search(query, limit=10)
+            return run
+        cases["names:autocomplete"] = names_autocomplete
+
+        def names_like() -> Callable[[], None]:
+            path = self.prepared("with_names")
+            queries = name_queries()[::2]
+
+            def run() -> None:
+                conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+                try:
+                    for query in queries:
+                        conn.execute(
+                            "SELECT c_personid FROM BIOG_MAIN WHERE c_name_chn LIKE ? "
+                            "UNION SELECT c_personid FROM ALTNAME_DATA WHERE c_alt_name_chn LIKE ? LIMIT 10",
+                            (f"%{query}%", f"%{query}%"),
+                        ).fetchall()
+                finally:
+                    conn.close()
+            return run
+        cases["names:like"] = names_like
+
+        views = list(create_views.load_view_definitions())
+
+        def export_csv() -> Callable[[], None]:
+            path = self.prepared("with_views")
+            output_dir = self.workdir / "export_csv"
+            output_dir.mkdir(exist_ok=True)
+
+            def run() -> None:
+                conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+                try:
+                    for view in views:
+                        cursor = conn.execute(f'SELECT * FROM "{view}"')
+                        with (output_dir / f"{view}.csv").open("w", newline="", encoding="utf-8") as handle:
+                            writer = csv.writer(handle)
+                            writer.writerow(column[0] for column in cursor.description)
+                            writer.writerows(cursor)
+                finally:
+                    conn.close()
+            return run
+        cases["export:csv"] = export_csv
+
+        # pyarrow is optional; without it the Parquet export is not benchmarked.
+        if export_parquet.pa is not None:
+            def export_views() -> Callable[[], None]:
+                path = self.prepared("with_views")
+                return lambda: export_parquet.export(path, views, self.workdir / "export", workers=self.workers)
+            cases["export:parquet"] = export_views
+
+        for mode in ("pooled", "cached", "naive", "http"):
+            def dossiers(mode: str = mode) -> Callable[[], None]:
+                path = self.prepared("with_views")
+                distinct = DOSSIER_QUERIES // 10 if mode == "cached" else DOSSIER_QUERIES
+                person_ids = [1 + (i * 7919) % min(self.people, distinct) for i in range(DOSSIER_QUERIES)]
+
+                def run() -> None:
+                    if mode == "naive":
+                        for person_id in person_ids:
+                            dossier_service.naive_dossier(path, person_id)
+                        return
+                    cache_size = dossier_service.DEFAULT_CACHE_SIZE if mode == "cached" else 0
+                    with dossier_service.DossierService(path, cache_size=cache_size) as service:
+                        with contextlib.ExitStack() as stack:
+                            lookup = service.dossier
+                            if mode == "http":
+                                base_url = stack.enter_context(dossier_service.serving(service))
+                                lookup = functools.partial(dossier_service.http_dossier, base_url)
+                            with ThreadPoolExecutor(max_workers=8) as clients:
+                                list(clients.map(lookup, person_ids))
+                return run
+            cases["dossier" if mode == "pooled" else f"dossier:{mode}"] = dossiers
+
+        def dossiers() -> Callable[[], None]:
+            path = self.copy(self.prepared("with_views"), "run.db")
+            return lambda: person_dossier.build_dossiers(path, workers=self.workers)
+        cases["dossiers"] = dossiers
+
+        def dossiers_incremental() -> Callable[[], None]:
+            path = self.copy(self.prepared("with_dossiers"), "run.db")
+            conn = sqlite3.connect(str(path))
+            with conn:
+                conn.execute(
+                    "UPDATE BIOG_MAIN SET c_name = c_name || ' II', c_modified_date = '20991231' "
+                    "WHERE c_personid % 1000 = 1"
+                )
+            conn.close()
+            return lambda: person_dossier.build_dossiers(path, workers=self.workers)
+        cases["dossiers:incremental"] = dossiers_incremental
+
+        def dossiers_fetch() -> Callable[[], None]:
+            path = self.prepared("with_dossiers")
+            person_ids = [1 + (i * 7919) % min(self.people, DOSSIER_QUERIES) for i in range(DOSSIER_QUERIES)]
+
+            def run() -> None:
+                with person_dossier.DossierStore(path) as store:
+                    for person_id in person_ids:
+                        store.get(person_id)
+            return run
+        cases["dossiers:fetch"] = dossiers_fetch
+
+        graph_people = [1 + (i * 7919) % self.people for i in range(GRAPH_QUERIES)]
+
+        # numpy is optional; without it only the SQL version is benchmarked.
+        if person_graph.np is not None:
+            def graph() -> Callable[[], None]:
+                path = self.copy(self.base, "run.db")
+                return lambda: person_graph.build_graph(path)
+            cases["graph"] = graph
+
+            def graph_khop() -> Callable[[], None]:
+                path = self.prepared("with_graph")
+
+                def run() -> None:
+                    network = person_graph.PersonGraph(path)
+                    for person_id in graph_people:
+                        network.k_hop(person_id, 2)
+                        network.ego(person_id, 1)
+                    network.degree(graph_people)
+                return run
+            cases["graph:khop"] = graph_khop
+
+        def graph_khop_sql() -> Callable[[], None]:
+            def run() -> None:
+                conn = sqlite3.connect(f"file:{self.base}?mode=ro", uri=True)
+                try:
+                    for person_id in graph_people:
+                        person_graph.k_hop_sql(conn, person_id, 2)
+                finally:
+                    conn.close()
+            return run
+        cases["graph:khop_sql"] = graph_khop_sql
+
+        def compare() -> Callable[[], None]:
+            changed = self.prepared("changed")
+            return lambda: compare_db_tables.main(self.base, changed)
+        cases["compare"] = compare
+
+        def compare_hashes() -> Callable[[], None]:
+            changed = self.prepared("changed")
+            return lambda: compare_db_tables.main_hashes(self.base, changed)
+        cases["compare:hashes"] = compare_hashes
+
+        def patch_make() -> Callable[[], None]:
+            changed = self.prepared("changed")
+            return lambda: release_patch.make_patch(self.base, changed, self.workdir / "run.patch")
+        cases["patch:make"] = patch_make
+
+        def patch_apply() -> Callable[[], None]:
+            patch = self.workdir / "changed.patch"
+            if not patch.exists():
+                release_patch.make_patch(self.base, self.prepared("changed"), patch)
+            path = self.copy(self.base, "run.db")
+            return lambda: release_patch.apply_patch(patch, path)
+        cases["patch:apply"] = patch_apply
+
+        def pipeline() -> Callable[[], None]:
+            path = self.copy(self.base, "run.db")
+            for suffix in ("-wal", "-shm", ".addresses.tmp"):
+                Path(f"{path}{suffix}").unlink(missing_ok=True)
+            return BuildPipeline(path, workers=self.workers, fk_options={"fk_json": self.fk_json}).run
+        cases["pipeline"] = pipeline
+        return cases
+
+
+def time_case(setup: Callable[[], Callable[[], None]], repeat: int) -> List[float]:
+    runs = []
+    for _ in range(repeat):
+        measured = setup()
+        # The steps print their reports; only the timings matter here.
+        with contextlib.redirect_stdout(io.StringIO()):
+            started = time.perf_counter()
+            measured()
+            runs.append(time.perf_counter() - started)
+    return runs
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).parent, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(
+    people: int = make_synthetic_db.DEFAULT_PEOPLE,
+    addresses: Optional[int] = None,
+    seed: int = make_synthetic_db.DEFAULT_SEED,
+    repeat: int = DEFAULT_REPEAT,
+    only: Optional[str] = None,
+    workers: int = 1,
+    workdir: Optional[Path] = None,
+) -> Dict[str, object]:
+    """Run the selected benchmarks and return the result document that is written as JSON."""
+    results: Dict[str, Dict[str, object]] = {}
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp:
+        benchmarks = Benchmarks(Path(tmp), people, addresses, seed, workers)
+        benchmarks.generate()
+        for name, setup in benchmarks.cases().items():
+            if only and not re.search(only, name):
+                continue
+            runs = time_case(setup, repeat)
+            results[name] = {"min": min(runs), "median": statistics.median(runs), "runs": runs}
+            logger.info("  %-34s  median %8.3f s  (min %.3f s)", name, statistics.median(runs), min(runs))
+
+    return {
+        "version": RESULTS_VERSION,
+        "created_at_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "git_commit": _git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "platform": platform.platform(),
+        "parameters": {"people": people, "addresses": addresses, "seed": seed, "repeat": repeat, "workers": workers},
+        "benchmarks": results,
+    }
+
+
+def compare_results(
+    current: Dict[str, object], baseline: Dict[str, object], threshold: float, min_delta: float = 0.0
+) -> List[str]:
+    """
+    Print each median next to its baseline and return the benchmarks slower than
+    *threshold* times it and by more than *min_delta* seconds.
+    """
+    # Only the database and the worker count change what is measured.
+    sizes = [{k: v for k, v in doc["parameters"].items() if k != "repeat"} for doc in (current, baseline)]
+    if sizes[0] != sizes[1]:
+        logger.warning("Baseline was run with different parameters: %s", baseline["parameters"])
+    regressions = []
+    print(f"{'Benchmark':34}  {'Baseline s':>10}  {'Current s':>10}  {'Ratio':>6}")
+    print("-" * 66)
+    for name, result in current["benchmarks"].items():
+        before = baseline["benchmarks"].get(name)
+        if before is None:
+            print(f"{name:34}  {'-':>10}  {result['median']:>10.3f}  {'new':>6}")
+            continue
+        ratio = result["median"] / before["median"] if before["median"] else float("inf")
+        flag = ""
+        if ratio > threshold and result["median"] - before["median"] > min_delta:
+            regressions.append(name)
+            flag = "  ← slower"
+        print(f"{name:34}  {before['median']:>10.3f}  {result['median']:>10.3f}  {ratio:>6.2f}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Benchmark the CBDB post-processing steps on a synthetic database."
+    )
+    parser.add_argument(
+        "--people",
+        type=int,
+        default=make_synthetic_db.DEFAULT_PEOPLE,
+        help=f"Size of the synthetic database in BIOG_MAIN rows (default: {make_synthetic_db.DEFAULT_PEOPLE}).",
+    )
+    parser.add_argument("--addresses", type=int, help="Rows in ADDR_CODES (default: see make_synthetic_db.py).")
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=make_synthetic_db.DEFAULT_SEED,
+        help=f"Seed of the synthetic database (default: {make_synthetic_db.DEFAULT_SEED}).",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=DEFAULT_REPEAT,
+        help=f"Runs per benchmark (default: {DEFAULT_REPEAT}).",
+    )
+    parser.add_argument("--only", metavar="REGEX", help="Only run benchmarks whose name matches REGEX.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes walking the address hierarchy (default: 1).",
+    )
+    parser.add_argument("--workdir", type=Path, help="Directory for the temporary databases (default: system temp).")
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help=f"Result file (default: {RESULTS_DIR.name}/<UTC timestamp>.json next to this script).",
+    )
+    parser.add_argument("--baseline", type=Path, help="Earlier result file to compare the medians against.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Ratio to the baseline median that counts as a regression (default: {DEFAULT_THRESHOLD}).",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.0,
+        metavar="SECONDS",
+        help="Ignore slowdowns of at most this many seconds, e.g. timer noise on millisecond benchmarks "
+        "(default: 0).",
+    )
+    parser.add_argument("--verbose", action="store_true", help="Keep the log output of the benchmarked steps.")
+    args = parser.parse_args()
+    if args.baseline and not args.baseline.is_file():
+        parser.error(f"baseline file '{args.baseline}' does not exist.")
+
+    if not args.verbose:
+        # The steps log every table and dirty row; keep only this script's progress lines.
+        logging.getLogger().setLevel(logging.ERROR)
+
+    current = run_benchmarks(
+        args.people, args.addresses, args.seed, args.repeat, args.only, args.workers, args.workdir
+    )
+    output = args.output or RESULTS_DIR / (current["created_at_utc"].replace(":", "") + ".json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(current, indent=2) + "\n", encoding="utf-8")
+    logger.info("Wrote %s", output)
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        slower = compare_results(current, baseline, args.threshold, args.min_delta)
+        if slower:
+            logger.error(
+                "%d benchmark(s) slower than %.2fx the baseline: %s", len(slower), args.threshold, ", ".join(slower)
+            )
+            sys.exit(1)
@@ -0,0 +1,542 @@
+#!/usr/bin/env python3
+"""
+Run the CBDB post-processing steps as one pipeline.
+
+The steps are modelled as a small dependency graph:
+
+    fks ──> views            (both rewrite the schema, so they run in order)
+    fks ──> names            (optional, see create_name_search.py)
+    views ──> dossiers       (optional, see person_dossier.py)
+    addresses ──> spatial    (optional, see spatial_index.py)
+
+Stages whose dependencies are met run concurrently.  The database is switched
+to WAL for the duration of the build so readers never wait for the writer,
+and the addresses stage builds into a scratch database next to the target:
+it copies ADDR_CODES / ADDR_BELONGS_DATA (and a previous ADDRESSES, for an
+incremental build) into the scratch file, works there, and copies the result
+back in one short transaction.  Its builds are always incremental, so the
+database keeps ADDRESSES_FINGERPRINTS; ADDR_CLOSURE is added with --closure.
+SQLite allows one writer at a time, so every stage takes the write lock when
+its transaction starts (BEGIN IMMEDIATE) and waits up to BUSY_TIMEOUT seconds
+for the stage holding it.  The optional stages only run when asked for with
+--stages.
+
+Each stage stores a signature of its inputs and outputs in BUILD_STAGES and
+is skipped when that signature is unchanged, along with its wall time and the
+bytes its thread read and wrote.  If any stage ran, the build finishes with a
+single VACUUM and ANALYZE.  --sql-profile records the statements each stage
+ran (see sql_profiler.py).
+
+Usage:
+    python cbdb_build.py [--db DB_PATH] [--stages fks,views,addresses[,names,spatial,dossiers]] [--force]
+                         [--closure] [--workers N] [--csv-file PATH | --fk-json [PATH]]
+                         [--offline | --max-age SECONDS] [--no-vacuum] [--sql-profile PATH]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import logging
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import add_foreign_keys
+import create_name_search
+import create_views
+import person_dossier
+import spatial_index
+import sql_profiler
+import sqlite_profiles
+from create_addresses_table import CLOSURE_TABLE, FINGERPRINT_TABLE, AddressHierarchyBuilder
+from materialize_views import source_tables, table_signature
+
+STATE_TABLE = "BUILD_STAGES"
+DEFAULT_STAGES = ("fks", "views", "addresses")
+ADDRESS_INPUTS = ("ADDR_CODES", "ADDR_BELONGS_DATA")
+ADDRESS_OUTPUTS = ("ADDRESSES", FINGERPRINT_TABLE, CLOSURE_TABLE)
+# How long a stage waits for another stage's write transaction, in seconds.
+BUSY_TIMEOUT = 600
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Stage:
+    name: str
+    depends: Tuple[str, ...]
+    # Digest of everything the stage reads and writes; unchanged means skip.
+    signature: Callable[[], str]
+    run: Callable[[], None]
+
+
+@dataclass
+class StageResult:
+    name: str
+    ran: bool
+    seconds: float = 0.0
+    read_bytes: Optional[int] = None
+    write_bytes: Optional[int] = None
+
+
+def _thread_io() -> Optional[Tuple[int, int]]:
+    """Bytes read and written by the calling thread so far, or None off Linux."""
+    try:
+        with open("/proc/thread-self/io") as handle:
+            fields = dict(line.split(": ") for line in handle.read().splitlines())
+        return int(fields["rchar"]), int(fields["wchar"])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+def _digest(parts: Iterable[object]) -> str:
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(repr(part).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def copy_table(conn: sqlite3.Connection, source_schema: str, table: str) -> None:
+    """Replace main.<table> by <source_schema>.<table>: schema, rows and indexes."""
+    create_sql = conn.execute(
+        f"SELECT sql FROM {source_schema}.sqlite_master WHERE type='table' AND name=?", (table,)
+    ).fetchone()[0]
+    index_sql = [
+        row[0]
+        for row in conn.execute(
+            f"SELECT sql FROM {source_schema}.sqlite_master "
+            f"WHERE type='index' AND tbl_name=? AND sql IS NOT NULL",
+            (table,),
+        )
+    ]
+    conn.execute(f'DROP TABLE IF EXISTS main."{table}"')
+    conn.execute(create_sql)
+    conn.execute(f'INSERT INTO main."{table}" SELECT * FROM {source_schema}."{table}"')
+    for sql in index_sql:
+        conn.execute(sql)
+
+
+class BuildPipeline:
+    """Runs the fks, views, addresses, names, spatial and dossiers stages on one database."""
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        workers: int = 1,
+        force: bool = False,
+        fk_options: Optional[Dict[str, object]] = None,
+        closure: bool = False,
+    ):
+        self.db_path = Path(db_path)
+        self.workers = workers
+        self.force = force
+        self.closure = closure
+        self.fk_options = fk_options or {}
+        self._fk_map: Optional[Dict[str, List[add_foreign_keys.FKDef]]] = None
+        self.stages: Dict[str, Stage] = {
+            stage.name: stage
+            for stage in (
+                Stage("fks", (), self._fks_signature, self._run_fks),
+                Stage("views", ("fks",), self._views_signature, self._run_views),
+                Stage("addresses", (), self._addresses_signature, self._run_addresses),
+                Stage("names", ("fks",), self._names_signature, self._run_names),
+                Stage("spatial", ("addresses",), self._spatial_signature, self._run_spatial),
+                Stage("dossiers", ("views",), self._dossiers_signature, self._run_dossiers),
+            )
+        }
+
+    def connect(self) -> sqlite3.Connection:
+        return sqlite_profiles.connect(self.db_path, "default", timeout=BUSY_TIMEOUT, isolation_level=None)
+
+    def _schema_rows(self, conn: sqlite3.Connection, kind: str) -> List[Tuple[str, str]]:
+        return conn.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = ? ORDER BY name", (kind,)
+        ).fetchall()
+
+    # -- fks -----------------------------------------------------------------
+
+    @property
+    def fk_map(self) -> Dict[str, List[add_foreign_keys.FKDef]]:
+        if self._fk_map is None:
+            self._fk_map = add_foreign_keys.load_foreign_keys(**self.fk_options)
+        return self._fk_map
+
+    def _fks_signature(self) -> str:
+        conn = self.connect()
+        try:
+            tables = [row for row in self._schema_rows(conn, "table") if row[0].upper() in self.fk_map]
+        finally:
+            conn.close()
+        return _digest([sorted(self.fk_map.items()), tables])
+
+    def _run_fks(self) -> None:
+        add_foreign_keys.add_foreign_keys(self.db_path, method="schema", fk_map=self.fk_map, timeout=BUSY_TIMEOUT)
+
+    # -- views ---------------------------------------------------------------
+
+    def _views_signature(self) -> str:
+        definitions = create_views.load_view_definitions()
+        conn = self.connect()
+        try:
+            tables = self._schema_rows(conn, "table")
+            # Only the tables the views read, so other stages' tables do not count.
+            read = {table for view in definitions for table in source_tables(view, definitions, {n for n, _ in tables})}
+            schema = [row for row in tables if row[0] in read] + self._schema_rows(conn, "view")
+        finally:
+            conn.close()
+        return _digest([sorted(definitions.items()), schema])
+
+    def _run_views(self) -> None:
+        create_views.create_views(self.db_path, timeout=BUSY_TIMEOUT)
+
+    # -- addresses -----------------------------------------------------------
+
+    def _addresses_signature(self) -> str:
+        conn = self.connect()
+        try:
+            existing = {name for name, _ in self._schema_rows(conn, "table")}
+            inputs = [table_signature(conn, table) for table in ADDRESS_INPUTS]
+            outputs = [
+                conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] if table in existing else None
+                for table in ADDRESS_OUTPUTS
+            ]
+        finally:
+            conn.close()
+        return _digest([inputs, outputs, self.closure])
+
+    def _run_addresses(self) -> None:
+        scratch = self.db_path.with_name(self.db_path.name + ".addresses.tmp")
+        scratch.unlink(missing_ok=True)
+        try:
+            conn = sqlite_profiles.connect(scratch, "default", timeout=BUSY_TIMEOUT, isolation_level=None)
+            try:
+                conn.execute("ATTACH DATABASE ? AS target", (str(self.db_path),))
+                existing = {
+                    row[0] for row in conn.execute("SELECT name FROM target.sqlite_master WHERE type='table'")
+                }
+                conn.execute("BEGIN")
+                for table in ADDRESS_INPUTS + ADDRESS_OUTPUTS:
+                    if table in existing:
+                        copy_table(conn, "target", table)
+                conn.execute("COMMIT")
+            finally:
+                conn.close()
+
+            # The scratch file is deleted on failure, so it needs no journal.
+            with AddressHierarchyBuilder(str(scratch), workers=self.workers, journal_mode="off") as builder:
+                builder.run(incremental=True, closure=self.closure)
+
+            conn = self.connect()
+            try:
+                conn.execute("ATTACH DATABASE ? AS build", (str(scratch),))
+                built = {row[0] for row in conn.execute("SELECT name FROM build.sqlite_master WHERE type='table'")}
+                conn.execute("BEGIN IMMEDIATE")
+                for table in ADDRESS_OUTPUTS:
+                    if table in built:
+                        copy_table(conn, "build", table)
+                conn.execute("COMMIT")
+                conn.execute("DETACH DATABASE build")
+            finally:
+                conn.close()
+        finally:
+            scratch.unlink(missing_ok=True)
+
+    # -- names ---------------------------------------------------------------
+
+    def _names_signature(self) -> str:
+        conn = self.connect()
+        try:
+            existing = {name for name, _ in self._schema_rows(conn, "table")}
+            inputs = [table_signature(conn, table) for table in create_name_search.SOURCES if table in existing]
+            output = (
+                conn.execute(f"SELECT COUNT(*) FROM {create_name_search.CONTENT_TABLE}").fetchone()[0]
+                if create_name_search.CONTENT_TABLE in existing
+                else None
+            )
+        finally:
+            conn.close()
+        return _digest([inputs, output])
+
+    def _run_names(self) -> None:
+        create_name_search.refresh_name_search(self.db_path, timeout=BUSY_TIMEOUT)
+
+    # -- spatial -------------------------------------------------------------
+
+    def _spatial_signature(self) -> str:
+        conn = self.connect()
+        try:
+            existing = {name for name, _ in self._schema_rows(conn, "table")}
+            inputs = [table_signature(conn, table) for table in ("ADDR_CODES", "ADDRESSES") if table in existing]
+            output = (
+                conn.execute(f"SELECT COUNT(*) FROM {spatial_index.RTREE_TABLE}").fetchone()[0]
+                if spatial_index.RTREE_TABLE in existing
+                else None
+            )
+        finally:
+            conn.close()
+        return _digest([inputs, output])
+
+    def _run_spatial(self) -> None:
+        spatial_index.build_spatial_index(self.db_path, timeout=BUSY_TIMEOUT)
+
+    # -- dossiers ------------------------------------------------------------
+
+    def _dossiers_signature(self) -> str:
+        definitions = create_views.load_view_definitions()
+        conn = self.connect()
+        try:
+            existing = {name for name, _ in self._schema_rows(conn, "table")}
+            inputs = [
+                table_signature(conn, table)
+                for table in sorted(
+                    {t for view in person_dossier.DOSSIER_VIEWS for t in source_tables(view, definitions, existing)}
+                )
+            ]
+            output = (
+                conn.execute(f"SELECT COUNT(*) FROM {person_dossier.DOSSIER_TABLE}").fetchone()[0]
+                if person_dossier.DOSSIER_TABLE in existing
+                else None
+            )
+        finally:
+            conn.close()
+        return _digest([[definitions[view] for view in person_dossier.DOSSIER_VIEWS], inputs, output])
+
+    def _run_dossiers(self) -> None:
+        # --force also rebuilds the dossiers an incremental build cannot tell are stale.
+        person_dossier.build_dossiers(self.db_path, full=self.force, workers=self.workers, timeout=BUSY_TIMEOUT)
+
+    # -- state ---------------------------------------------------------------
+
+    def _ensure_state_table(self) -> None:
+        conn = self.connect()
+        try:
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {STATE_TABLE} (
+                    c_stage TEXT PRIMARY KEY,
+                    c_signature TEXT NOT NULL,
+                    c_finished_at_utc TEXT NOT NULL,
+                    c_seconds REAL,
+                    c_read_bytes INTEGER,
+                    c_write_bytes INTEGER
+                )
+                """
+            )
+        finally:
+            conn.close()
+
+    def _stored_signature(self, stage: str) -> Optional[str]:
+        conn = self.connect()
+        try:
+            row = conn.execute(f"SELECT c_signature FROM {STATE_TABLE} WHERE c_stage = ?", (stage,)).fetchone()
+        finally:
+            conn.close()
+        return row[0] if row else None
+
+    def _record(self, result: StageResult, signature: str) -> None:
+        conn = self.connect()
+        try:
+            conn.execute(
+                f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    result.name,
+                    signature,
+                    datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    result.seconds,
+                    result.read_bytes,
+                    result.write_bytes,
+                ),
+            )
+        finally:
+            conn.close()
+
+    # -- scheduling ----------------------------------------------------------
+
+    def run_stage(self, stage: Stage) -> StageResult:
+        with sql_profiler.stage(stage.name):
+            with sql_profiler.stage("signature"):
+                unchanged = not self.force and stage.signature() == self._stored_signature(stage.name)
+            if unchanged:
+                logger.info("[%s] inputs unchanged, skipping.", stage.name)
+                return StageResult(stage.name, ran=False)
+
+            logger.info("[%s] starting", stage.name)
+            io_before = _thread_io()
+            started = time.perf_counter()
+            stage.run()
+            result = StageResult(stage.name, ran=True, seconds=time.perf_counter() - started)
+            io_after = _thread_io()
+            if io_before and io_after:
+                result.read_bytes = io_after[0] - io_before[0]
+                result.write_bytes = io_after[1] - io_before[1]
+            with sql_profiler.stage("signature"):
+                self._record(result, stage.signature())
+        logger.info("[%s] finished in %.2f s", stage.name, result.seconds)
+        return result
+
+    def run(self, selected: Optional[Iterable[str]] = None, vacuum: bool = True) -> List[StageResult]:
+        """Run the *selected* stages (default: DEFAULT_STAGES) in dependency order, concurrently where possible."""
+        names = list(selected or DEFAULT_STAGES)
+        unknown = [name for name in names if name not in self.stages]
+        if unknown:
+            raise ValueError(f"Unknown stage(s): {', '.join(unknown)}")
+
+        conn = self.connect()
+        try:
+            journal_mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+            conn.execute("PRAGMA journal_mode = WAL")
+        finally:
+            conn.close()
+
+        results: Dict[str, StageResult] = {}
+        try:
+            self._ensure_state_table()
+            pending = {name: self.stages[name] for name in names}
+            with ThreadPoolExecutor(max_workers=len(pending) or 1) as pool:
+                running = {}
+                while pending or running:
+                    for name, stage in list(pending.items()):
+                        # Dependencies outside the selection count as satisfied.
+                        if all(dep in results or dep not in names for dep in stage.depends):
+                            running[pool.submit(self.run_stage, stage)] = name
+                            del pending[name]
+                    finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in finished:
+                        results[running.pop(future)] = future.result()
+        finally:
+            conn = self.connect()
+            try:
+                conn.execute(f"PRAGMA journal_mode = {journal_mode}")
+            finally:
+                conn.close()
+
+        ordered = [results[name] for name in names]
+        if vacuum and any(result.ran for result in ordered):
+            ordered.append(self.finalize())
+        return ordered
+
+    def finalize(self) -> StageResult:
+        logger.info("[finalize] VACUUM and ANALYZE")
+        io_before = _thread_io()
+        started = time.perf_counter()
+        conn = self.connect()
+        try:
+            with sql_profiler.stage("finalize"):
+                conn.execute("VACUUM")
+                conn.execute("ANALYZE")
+        finally:
+            conn.close()
+        result = StageResult("finalize", ran=True, seconds=time.perf_counter() - started)
+        io_after = _thread_io()
+        if io_before and io_after:
+            result.read_bytes = io_after[0] - io_before[0]
+            result.write_bytes = io_after[1] - io_before[1]
+        return result
+
+
+def print_results(results: List[StageResult], total_seconds: float) -> None:
+    header = f"{'Stage':10}  {'Status':8}  {'Seconds':>9}  {'Read MB':>9}  {'Written MB':>10}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        status = "ran" if result.ran else "skipped"
+        read = f"{result.read_bytes / 1e6:.1f}" if result.read_bytes is not None else "-"
+        written = f"{result.write_bytes / 1e6:.1f}" if result.write_bytes is not None else "-"
+        print(f"{result.name:10}  {status:8}  {result.seconds:>9.2f}  {read:>9}  {written:>10}")
+    print(f"{'total':10}  {'':8}  {total_seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Add foreign keys, views and ADDRESSES to a CBDB database in one pipeline."
+    )
+    parser.add_argument(
+        "--db",
+        default="latest.db",
+        type=Path,
+        help="Path to the SQLite database (default: latest.db).",
+    )
+    parser.add_argument(
+        "--stages",
+        default=",".join(DEFAULT_STAGES),
+        help=f"Comma-separated stages to run: fks, views, addresses, names, spatial, dossiers (default: {','.join(DEFAULT_STAGES)}).",
+    )
+    parser.add_argument("--force", action="store_true", help="Run stages even if their inputs are unchanged.")
+    parser.add_argument(
+        "--closure",
+        action="store_true",
+        help="Have the addresses stage also build the ADDR_CLOSURE ancestor table.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes walking the address hierarchy and building dossiers (default: 1).",
+    )
+    parser.add_argument(
+        "--no-vacuum",
+        action="store_true",
+        help="Skip the final VACUUM and ANALYZE.",
+    )
+    parser.add_argument(
+        "--csv-url",
+        default=add_foreign_keys.CSV_URL,
+        metavar="URL",
+        help="URL of foreign_keys_regen.csv (default: main branch on GitHub).",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--csv-file", type=Path, metavar="PATH", help="Read foreign_keys_regen.csv from a file.")
+    source.add_argument(
+        "--fk-json",
+        type=Path,
+        nargs="?",
+        const=add_foreign_keys.FK_JSON,
+        metavar="PATH",
+        help=f"Read the FK map from a JSON export (default path: {add_foreign_keys.FK_JSON.name}).",
+    )
+    freshness = parser.add_mutually_exclusive_group()
+    freshness.add_argument("--offline", action="store_true", help="Use the cached FK CSV without revalidating it.")
+    freshness.add_argument(
+        "--max-age",
+        type=float,
+        default=add_foreign_keys.CACHE_MAX_AGE,
+        metavar="SECONDS",
+        help="Use a cached FK CSV checked less than SECONDS ago without any request "
+        f"(default: {add_foreign_keys.CACHE_MAX_AGE}; 0 always revalidates).",
+    )
+    parser.add_argument(
+        "--sql-profile",
+        type=Path,
+        metavar="PATH",
+        help="Record per-stage SQL statistics and write them to PATH (JSON) and to a .folded "
+        "flame graph file next to it.",
+    )
+    args = parser.parse_args()
+    if not args.db.is_file():
+        parser.error(f"database file '{args.db}' does not exist.")
+
+    pipeline = BuildPipeline(
+        args.db,
+        workers=args.workers,
+        force=args.force,
+        closure=args.closure,
+        fk_options={
+            "csv_url": args.csv_url,
+            "csv_file": args.csv_file,
+            "fk_json": args.fk_json,
+            "offline": args.offline,
+            "max_age": args.max_age,
+        },
+    )
+    started = time.perf_counter()
+    with sql_profiler.profiling(args.sql_profile):
+        stage_results = pipeline.run(
+            [name.strip() for name in args.stages.split(",") if name.strip()], not args.no_vacuum
+        )
+    print_results(stage_results, time.perf_counter() - started)
@@ -3,19 +3,47 @@
 Compare table row counts between two CBDB SQLite databases.
 
 Usage:
-    python compare_db_tables.py path/to/old_cbdb.db path/to/new_cbdb.db
+    python compare_db_tables.py [--approximate] [--workers N] path/to/old_cbdb.db path/to/new_cbdb.db
+    python compare_db_tables.py --hashes [--workers N] [--limit N] old.db new.db
 
 The script prints a table with the row counts for every table found in either
 database, plus the difference (new - old). Tables that exist only in one
-database are annotated accordingly.
+database are annotated accordingly, and column and index differences of the
+remaining tables are listed after it.  Both databases are opened read-only and
+all tables are counted concurrently on a thread pool; --approximate uses the
+row estimates of sqlite_stat1 instead of COUNT(*) where available.
+
+With --hashes, every table present in both databases is read once per
+database and summarised as content hashes per primary-key bucket: fixed-width
+key ranges for a single key whose values are all integers, hash buckets
+otherwise (the whole row is the key for tables without a primary key).
+Tables are hashed in parallel processes.  Only buckets whose hashes differ are
+read again, from both databases at once in key order, and merge-joined to
+count the inserted, deleted and updated keys; memory stays bounded by --limit
+sample keys per table however many rows changed.
 """
 
 from __future__ import annotations
 
 import argparse
+import hashlib
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+# Width of the key ranges used for single integer primary keys.
+RANGE_WIDTH = 1024
+# Number of hash buckets used for every other key.
+HASH_BUCKETS = 1024
+
+# (kind, number): (0, key // RANGE_WIDTH) or (1, hash % HASH_BUCKETS)
+Bucket = Tuple[int, int]
+# SQL function computing the hash bucket of its arguments, for drilling into hash buckets.
+BUCKET_FUNCTION = "cbdb_hash_bucket"
+# (row count, sum of row hashes mod 2**128); the sum does not depend on row order.
+BucketDigest = Tuple[int, int]
 
 
 def quote_identifier(identifier: str) -> str:
@@ -23,32 +51,493 @@ def quote_identifier(identifier: str) -> str:
     return '"' + identifier.replace('"', '""') + '"'
 
 
+def load_table_names(database: Path) -> Set[str]:
+    conn = _connect_readonly(database)
+    try:
+        return {
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+            )
+        }
+    finally:
+        conn.close()
+
+
+def count_rows(database: Path, table: str) -> int:
+    conn = _connect_readonly(database)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def approximate_counts(database: Path) -> Dict[str, int]:
+    """
+    Row counts from sqlite_stat1, written by ANALYZE.  Tables it does not cover
+    are left out and counted exactly; sources such as dbstat have to read every
+    page of a table, which costs as much as COUNT(*).
+    """
+    conn = _connect_readonly(database)
+    try:
+        counts: Dict[str, int] = {}
+        try:
+            for table, stat in conn.execute("SELECT tbl, stat FROM sqlite_stat1"):
+                counts[table] = max(counts.get(table, 0), int(stat.split()[0]))
+        except sqlite3.Error:
+            pass  # never analyzed
+        return counts
+    finally:
+        conn.close()
+
+
+def count_tables(
+    databases: List[Path], approximate: bool = False, workers: Optional[int] = None
+) -> List[Tuple[Dict[str, int], Set[str]]]:
+    """
+    Count the rows of every table of every database concurrently, one read-only
+    connection per task.  Returns (counts, approximated tables) per database.
+    """
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        names = list(pool.map(load_table_names, databases))
+        estimates = list(pool.map(approximate_counts, databases)) if approximate else [{} for _ in databases]
+        results = []
+        for database, tables, estimate in zip(databases, names, estimates):
+            approximated = {table for table in tables if table in estimate}
+            exact = {
+                table: pool.submit(count_rows, database, table)
+                for table in sorted(tables - approximated)
+            }
+            results.append((estimate, approximated, exact))
+        return [
+            (
+                {
+                    table: estimate[table] if table in approximated else exact[table].result()
+                    for table in sorted(approximated | set(exact))
+                },
+                approximated,
+            )
+            for estimate, approximated, exact in results
+        ]
+
+
 def load_table_counts(database: Path) -> Dict[str, int]:
     if not database.exists():
         raise FileNotFoundError(f"Database file not found: {database}")
+    return count_tables([database])[0][0]
+
+
+# {table: ({column: (declared type, not null, pk position)}, {index: (unique, columns)})}
+Schema = Dict[str, Tuple[Dict[str, Tuple[str, int, int]], Dict[str, Tuple[int, Tuple[str, ...]]]]]
+
 
-    conn = sqlite3.connect(str(database))
+def load_schema(database: Path) -> Schema:
+    conn = _connect_readonly(database)
     try:
-        cursor = conn.execute(
-            "SELECT name FROM sqlite_master "
-            "WHERE type='table' AND name NOT LIKE 'sqlite_%' "
-            "ORDER BY name"
+        schema: Schema = {}
+        for table in sorted(load_table_names(database)):
+            quoted = quote_identifier(table)
+            columns = {
+                row[1]: ((row[2] or "").upper(), row[3], row[5])
+                for row in conn.execute(f"PRAGMA table_info({quoted})")
+            }
+            indexes = {}
+            for row in conn.execute(f"PRAGMA index_list({quoted})"):
+                index_columns = tuple(
+                    info[2] for info in conn.execute(f"PRAGMA index_info({quote_identifier(row[1])})")
+                )
+                indexes[row[1]] = (row[2], index_columns)
+            schema[table] = (columns, indexes)
+        return schema
+    finally:
+        conn.close()
+
+
+def schema_differences(old: Schema, new: Schema) -> Dict[str, List[str]]:
+    """Describe column and index differences of the tables present in both schemas."""
+    differences: Dict[str, List[str]] = {}
+    for table in sorted(old.keys() & new.keys()):
+        (old_columns, old_indexes), (new_columns, new_indexes) = old[table], new[table]
+        notes = []
+        for column in old_columns.keys() - new_columns.keys():
+            notes.append(f"column removed: {column} {old_columns[column][0]}".rstrip())
+        for column in new_columns.keys() - old_columns.keys():
+            notes.append(f"column added: {column} {new_columns[column][0]}".rstrip())
+        for column in old_columns.keys() & new_columns.keys():
+            (old_type, old_notnull, old_pk), (new_type, new_notnull, new_pk) = (
+                old_columns[column],
+                new_columns[column],
+            )
+            if old_type != new_type:
+                notes.append(f"column type changed: {column} {old_type or '(none)'} -> {new_type or '(none)'}")
+            if old_notnull != new_notnull:
+                notes.append(f"column NOT NULL changed: {column} {bool(old_notnull)} -> {bool(new_notnull)}")
+            if old_pk != new_pk:
+                notes.append(f"primary key position changed: {column} {old_pk} -> {new_pk}")
+
+        def describe(index: Tuple[int, Tuple[str, ...]]) -> str:
+            return ("UNIQUE " if index[0] else "") + "(" + ", ".join(index[1]) + ")"
+
+        for index in old_indexes.keys() - new_indexes.keys():
+            notes.append(f"index removed: {index} {describe(old_indexes[index])}")
+        for index in new_indexes.keys() - old_indexes.keys():
+            notes.append(f"index added: {index} {describe(new_indexes[index])}")
+        for index in old_indexes.keys() & new_indexes.keys():
+            if old_indexes[index] != new_indexes[index]:
+                notes.append(
+                    f"index changed: {index} {describe(old_indexes[index])} -> {describe(new_indexes[index])}"
+                )
+        if notes:
+            differences[table] = sorted(notes)
+    return differences
+
+
+def _connect_readonly(database: Path) -> sqlite3.Connection:
+    if not database.exists():
+        raise FileNotFoundError(f"Database file not found: {database}")
+    return sqlite3.connect(f"{database.resolve().as_uri()}?mode=ro", uri=True)
+
+
+@dataclass(frozen=True)
+class TablePlan:
+    """How a table present in both databases is hashed and keyed."""
+
+    table: str
+    # Columns present in both databases, in the old database's order.
+    columns: Tuple[str, ...]
+    # Positions of the key columns within *columns*; every column if there is no usable PK.
+    key_positions: Tuple[int, ...]
+    has_primary_key: bool
+    # True when the key is a single column holding only integers, bucketed by value range.
+    by_range: bool
+    columns_only_old: Tuple[str, ...] = ()
+    columns_only_new: Tuple[str, ...] = ()
+
+    def select_sql(self, where: str = "") -> str:
+        columns = ", ".join(quote_identifier(col) for col in self.columns)
+        return f"SELECT {columns} FROM {quote_identifier(self.table)}{where}"
+
+    def key_of(self, row: tuple) -> tuple:
+        return tuple(row[i] for i in self.key_positions)
+
+    def key_sql(self) -> str:
+        return ", ".join(quote_identifier(self.columns[i]) for i in self.key_positions)
+
+    def order_by_sql(self) -> str:
+        # BINARY is what sort_key() mirrors, whatever the columns' declared collation.
+        return " ORDER BY " + ", ".join(
+            f"{quote_identifier(self.columns[i])} COLLATE BINARY" for i in self.key_positions
         )
-        tables = [row[0] for row in cursor.fetchall()]
 
-        counts: Dict[str, int] = {}
-        for table in tables:
-            quoted = quote_identifier(table)
-            cursor = conn.execute(f"SELECT COUNT(*) FROM {quoted}")
-            counts[table] = cursor.fetchone()[0]
-        return counts
+    def sort_key(self, row: tuple) -> tuple:
+        return tuple(_sqlite_order(row[i]) for i in self.key_positions)
+
+
+def _table_info(conn: sqlite3.Connection, table: str) -> List[Tuple[str, str, int]]:
+    """Return (name, declared type, pk position) for every column of *table*."""
+    return [
+        (row[1], (row[2] or "").upper(), row[5])
+        for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")
+    ]
+
+
+def _primary_key(info: List[Tuple[str, str, int]]) -> List[Tuple[str, str]]:
+    return [(name, type_) for name, type_, pk in sorted(info, key=lambda col: col[2]) if pk]
+
+
+def _only_integers(conn: sqlite3.Connection, table: str, column: str) -> bool:
+    """True if typeof() is 'integer' for every value of *column* (stops at the first other one)."""
+    return bool(
+        conn.execute(
+            f"SELECT NOT EXISTS (SELECT 1 FROM {quote_identifier(table)} "
+            f"WHERE typeof({quote_identifier(column)}) != 'integer')"
+        ).fetchone()[0]
+    )
+
+
+def _sqlite_order(value: object) -> tuple:
+    """Sort key matching SQLite's order under BINARY collation: NULL, numbers, text, blobs."""
+    if value is None:
+        return (0, 0)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        # Code point order is UTF-8 byte order.
+        return (2, value)
+    return (3, bytes(value))
+
+
+def plan_tables(old_db: Path, new_db: Path) -> List[TablePlan]:
+    """Build a TablePlan for every table found in both databases."""
+    common = load_table_names(old_db) & load_table_names(new_db)
+    old_conn, new_conn = _connect_readonly(old_db), _connect_readonly(new_db)
+    try:
+        plans = []
+        for table in sorted(common):
+            old_info = _table_info(old_conn, table)
+            new_info = _table_info(new_conn, table)
+            new_names = {name for name, _, _ in new_info}
+            old_names = {name for name, _, _ in old_info}
+            columns = tuple(name for name, _, _ in old_info if name in new_names)
+            old_pk, new_pk = _primary_key(old_info), _primary_key(new_info)
+            has_primary_key = bool(old_pk) and old_pk == new_pk and all(
+                name in columns for name, _ in old_pk
+            )
+            if has_primary_key:
+                key_positions = tuple(columns.index(name) for name, _ in old_pk)
+            else:
+                key_positions = tuple(range(len(columns)))
+            by_range = (
+                has_primary_key
+                and len(old_pk) == 1
+                and _only_integers(old_conn, table, old_pk[0][0])
+                and _only_integers(new_conn, table, old_pk[0][0])
+            )
+            plans.append(
+                TablePlan(
+                    table=table,
+                    columns=columns,
+                    key_positions=key_positions,
+                    has_primary_key=has_primary_key,
+                    by_range=by_range,
+                    columns_only_old=tuple(n for n, _, _ in old_info if n not in new_names),
+                    columns_only_new=tuple(n for n, _, _ in new_info if n not in old_names),
+                )
+            )
+        return plans
+    finally:
+        old_conn.close()
+        new_conn.close()
+
+
+def _row_hash(row: tuple) -> int:
+    return int.from_bytes(hashlib.blake2b(repr(row).encode("utf-8"), digest_size=16).digest(), "big")
+
+
+def _hash_bucket(*values: object) -> int:
+    return _row_hash(values) % HASH_BUCKETS
+
+
+def _bucket_of(plan: TablePlan, row: tuple, row_hash: int) -> Bucket:
+    if not plan.has_primary_key:
+        return 1, row_hash % HASH_BUCKETS
+    key = plan.key_of(row)
+    if plan.by_range:
+        return 0, key[0] // RANGE_WIDTH
+    return 1, _hash_bucket(*key)
+
+
+def hash_table(database: Path, plan: TablePlan) -> Dict[Bucket, BucketDigest]:
+    """Stream *plan.table* once and return the digest of every non-empty bucket."""
+    digests: Dict[Bucket, List[int]] = {}
+    conn = _connect_readonly(database)
+    try:
+        for row in conn.execute(plan.select_sql()):
+            row_hash = _row_hash(row)
+            digest = digests.setdefault(_bucket_of(plan, row, row_hash), [0, 0])
+            digest[0] += 1
+            digest[1] = (digest[1] + row_hash) & ((1 << 128) - 1)
     finally:
         conn.close()
+    return {bucket: (count, total) for bucket, (count, total) in digests.items()}
+
+
+def _bucket_rows(conn: sqlite3.Connection, plan: TablePlan, buckets: Set[Bucket]) -> Iterator[tuple]:
+    """Yield the rows of *plan.table* that fall into *buckets*, ordered by key."""
+    order_by = plan.order_by_sql()
+    if plan.by_range:
+        key = plan.key_sql()
+        for number in sorted(number for kind, number in buckets if kind == 0):
+            yield from conn.execute(
+                plan.select_sql(f" WHERE {key} >= ? AND {key} < ?{order_by}"),
+                (number * RANGE_WIDTH, (number + 1) * RANGE_WIDTH),
+            )
+        return
+    # Hash buckets are spread over the whole table: filter them in SQLite, which
+    # walks the key index (or sorts on disk for tables without a primary key).
+    numbers = sorted(number for kind, number in buckets if kind == 1)
+    conn.create_function(BUCKET_FUNCTION, -1, _hash_bucket, deterministic=True)
+    placeholders = ", ".join("?" * len(numbers))
+    yield from conn.execute(
+        plan.select_sql(f" WHERE {BUCKET_FUNCTION}({plan.key_sql()}) IN ({placeholders}){order_by}"),
+        numbers,
+    )
+
+
+def _merge_join(
+    plan: TablePlan, old_rows: Iterator[tuple], new_rows: Iterator[tuple]
+) -> Iterator[Tuple[Optional[tuple], Optional[tuple]]]:
+    """
+    Pair two key-ordered row streams: (old, new) for a key in both, (old, None)
+    and (None, new) for a key in one.  Equal keys pair up one to one, so
+    duplicate rows of a table without a primary key are counted separately.
+    """
+    old_keyed = ((plan.sort_key(row), row) for row in old_rows)
+    new_keyed = ((plan.sort_key(row), row) for row in new_rows)
+    old, new = next(old_keyed, None), next(new_keyed, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield old[1], None
+            old = next(old_keyed, None)
+        elif old is None or new[0] < old[0]:
+            yield None, new[1]
+            new = next(new_keyed, None)
+        else:
+            yield old[1], new[1]
+            old, new = next(old_keyed, None), next(new_keyed, None)
+
+
+@dataclass
+class TableDiff:
+    plan: TablePlan
+    old_rows: int
+    new_rows: int
+    inserted: int = 0
+    deleted: int = 0
+    updated: int = 0
+    sample_inserted: Tuple[tuple, ...] = ()
+    sample_deleted: Tuple[tuple, ...] = ()
+    sample_updated: Tuple[tuple, ...] = ()
+
+
+def diff_buckets(
+    old_db: Path, new_db: Path, plan: TablePlan, buckets: Set[Bucket], limit: int
+) -> Tuple[int, int, int, List[tuple], List[tuple], List[tuple]]:
+    """
+    Compare the rows of *buckets* in both databases; return the inserted, deleted
+    and updated key counts followed by the first *limit* keys of each, in key
+    order.  Both sides are streamed in key order and merge-joined, so only the
+    sample keys are held in memory.
+    """
+    counts = [0, 0, 0]
+    samples: Tuple[List[tuple], List[tuple], List[tuple]] = ([], [], [])
+    old_conn, new_conn = _connect_readonly(old_db), _connect_readonly(new_db)
+    try:
+        pairs = _merge_join(plan, _bucket_rows(old_conn, plan, buckets), _bucket_rows(new_conn, plan, buckets))
+        for old, new in pairs:
+            if old is None:
+                kind, row = 0, new
+            elif new is None:
+                kind, row = 1, old
+            elif old != new:
+                kind, row = 2, new
+            else:
+                continue
+            counts[kind] += 1
+            if len(samples[kind]) < limit:
+                samples[kind].append(plan.key_of(row) if plan.has_primary_key else row)
+    finally:
+        old_conn.close()
+        new_conn.close()
+    return counts[0], counts[1], counts[2], samples[0], samples[1], samples[2]
+
+
+def hash_diff(
+    old_db: Path, new_db: Path, workers: Optional[int] = None, limit: int = 10
+) -> List[TableDiff]:
+    """Diff every table present in both databases by bucket hashes."""
+    plans = plan_tables(old_db, new_db)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        old_futures = [pool.submit(hash_table, old_db, plan) for plan in plans]
+        new_futures = [pool.submit(hash_table, new_db, plan) for plan in plans]
+        diffs: List[TableDiff] = []
+        drill = []
+        for plan, old_future, new_future in zip(plans, old_futures, new_futures):
+            old_digests, new_digests = old_future.result(), new_future.result()
+            diff = TableDiff(
+                plan,
+                sum(count for count, _ in old_digests.values()),
+                sum(count for count, _ in new_digests.values()),
+            )
+            diffs.append(diff)
+            changed = {
+                bucket
+                for bucket in old_digests.keys() | new_digests.keys()
+                if old_digests.get(bucket) != new_digests.get(bucket)
+            }
+            if changed:
+                drill.append((diff, pool.submit(diff_buckets, old_db, new_db, plan, changed, limit)))
+        for diff, future in drill:
+            (
+                diff.inserted,
+                diff.deleted,
+                diff.updated,
+                diff.sample_inserted,
+                diff.sample_deleted,
+                diff.sample_updated,
+            ) = future.result()
+    return diffs
+
+
+def _short_repr(value: object, width: int = 80) -> str:
+    text = repr(value)
+    return text if len(text) <= width else text[: width - 3] + "..."
 
 
-def main(old_db: Path, new_db: Path) -> None:
-    old_counts = load_table_counts(old_db)
-    new_counts = load_table_counts(new_db)
+def main_hashes(old_db: Path, new_db: Path, workers: Optional[int] = None, limit: int = 10) -> None:
+    diffs = hash_diff(old_db, new_db, workers, limit)
+
+    name_width = max((len(diff.plan.table) for diff in diffs), default=5)
+    header = (
+        f"{'Table':{name_width}}  "
+        f"{'Old Rows':>12}  "
+        f"{'New Rows':>12}  "
+        f"{'Inserted':>10}  "
+        f"{'Deleted':>10}  "
+        f"{'Updated':>10}"
+    )
+    print(header)
+    print("-" * len(header))
+    for diff in diffs:
+        print(
+            f"{diff.plan.table:{name_width}}  "
+            f"{diff.old_rows:>12}  "
+            f"{diff.new_rows:>12}  "
+            f"{diff.inserted:>10}  "
+            f"{diff.deleted:>10}  "
+            f"{diff.updated:>10}"
+        )
+
+    for diff in diffs:
+        plan = diff.plan
+        if not (diff.inserted or diff.deleted or diff.updated or plan.columns_only_old or plan.columns_only_new):
+            continue
+        print()
+        print(plan.table)
+        if plan.columns_only_old:
+            print(f"  columns only in old database: {', '.join(plan.columns_only_old)}")
+        if plan.columns_only_new:
+            print(f"  columns only in new database: {', '.join(plan.columns_only_new)}")
+        if not plan.has_primary_key:
+            print("  no common primary key; rows are compared as a whole")
+        for label, count, sample in (
+            ("inserted", diff.inserted, diff.sample_inserted),
+            ("deleted", diff.deleted, diff.sample_deleted),
+            ("updated", diff.updated, diff.sample_updated),
+        ):
+            if count:
+                shown = ", ".join(_short_repr(key[0] if len(key) == 1 else key) for key in sample)
+                more = f" (+{count - len(sample)} more)" if count > len(sample) else ""
+                print(f"  {label}: {shown}{more}")
+
+    _print_only_in(
+        load_table_names(old_db) - {diff.plan.table for diff in diffs},
+        load_table_names(new_db) - {diff.plan.table for diff in diffs},
+    )
+
+
+def main(
+    old_db: Path, new_db: Path, approximate: bool = False, workers: Optional[int] = None
+) -> None:
+    for database in (old_db, new_db):
+        if not database.exists():
+            raise FileNotFoundError(f"Database file not found: {database}")
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        schemas = pool.map(load_schema, (old_db, new_db))
+        (old_counts, old_approx), (new_counts, new_approx) = count_tables(
+            [old_db, new_db], approximate, workers
+        )
+        old_schema, new_schema = schemas
 
     all_tables = sorted(set(old_counts) | set(new_counts))
 
@@ -72,6 +561,13 @@ def main(old_db: Path, new_db: Path) -> None:
 
         old_display = str(old) if old is not None else "-"
         new_display = str(new) if new is not None else "-"
+        # Estimated counts are marked with a tilde.
+        if table in old_approx:
+            old_display = "~" + old_display
+        if table in new_approx:
+            new_display = "~" + new_display
+        if table in old_approx or table in new_approx:
+            diff_display = "~" + diff_display if diff_display != "-" else diff_display
 
         print(
             f"{table:{name_width}}  "
@@ -80,9 +576,24 @@ def main(old_db: Path, new_db: Path) -> None:
             f"{diff_display:>12}"
         )
 
+    only_old, only_new = set(old_counts) - set(new_counts), set(new_counts) - set(old_counts)
+    _print_only_in(only_old, only_new)
+
+    differences = schema_differences(old_schema, new_schema)
+    if differences:
+        if only_old or only_new:
+            print()
+        print("Schema differences:")
+        for table, notes in differences.items():
+            print(f"  {table}")
+            for note in notes:
+                print(f"    - {note}")
+
+
+def _print_only_in(only_old: Set[str], only_new: Set[str]) -> None:
     print()
-    only_old = sorted(set(old_counts) - set(new_counts))
-    only_new = sorted(set(new_counts) - set(old_counts))
+    only_old = sorted(only_old)
+    only_new = sorted(only_new)
 
     if only_old:
         print("Tables only in old database:")
@@ -104,5 +615,31 @@ if __name__ == "__main__":
     parser.add_argument(
         "new_db", type=Path, help="Path to the comparison (new) database."
     )
+    parser.add_argument(
+        "--approximate",
+        action="store_true",
+        help="Estimate row counts from sqlite_stat1 where ANALYZE has run (marked with ~); "
+        "other tables are counted exactly.",
+    )
+    parser.add_argument(
+        "--hashes",
+        action="store_true",
+        help="Compare table contents by per-key-range hashes and report changed keys.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Threads used for row counts, or processes used by --hashes (default: based on CPUs).",
+    )
+    parser.add_argument(
+        "--limit",
+        type=int,
+        default=10,
+        help="Sample keys shown per table and change type with --hashes (default: 10).",
+    )
     args = parser.parse_args()
-    main(args.old_db, args.new_db)
+    if args.hashes:
+        main_hashes(args.old_db, args.new_db, args.workers, args.limit)
+    else:
+        main(args.old_db, args.new_db, args.approximate, args.workers)
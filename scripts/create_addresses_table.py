@@ -1,13 +1,92 @@
 import argparse
+import hashlib
 import sqlite3
 import logging
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
 from typing import Optional, List, Tuple, Dict
 from dataclasses import dataclass
 from datetime import datetime
 
+import sql_profiler
+import sqlite_profiles
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Engines for resolving belongs lookups during the segment walk:
+#   memory - load CLEANED_BELONGS_DATA once into per-parent sorted interval lists
+#   query  - one SELECT against CLEANED_BELONGS_DATA per address and level (reference)
+#   sql    - clean and walk set-based in SQLite: a recursive CTE enumerates the chains,
+#            window functions place the gaps between them
+ENGINES = ("memory", "query", "sql")
+
+# (c_belongs_to, c_firstyear, c_lastyear)
+Interval = Tuple[int, int, int]
+
+# Rows buffered per executemany call when writing CLEANED_BELONGS_DATA and TIME_SEGMENTS
+DEFAULT_BATCH_SIZE = 10000
+
+# Levels of belongs relationships resolved into ADDRESSES (belongs1..belongs5)
+MAX_DEPTH = 5
+
+# Per-address digests of the ADDR_CODES / ADDR_BELONGS_DATA rows behind the last build,
+# written by incremental builds only
+FINGERPRINT_TABLE = "ADDRESSES_FINGERPRINTS"
+
+# (c_addr_id, c_belongs_to, c_depth, c_firstyear, c_lastyear) for every ancestor of an address,
+# depth 0 being the address itself, so containment by year is one index range scan; built on request
+CLOSURE_TABLE = "ADDR_CLOSURE"
+CLOSURE_INDEXES = {
+    f"{CLOSURE_TABLE}_belongs_to": "c_belongs_to, c_firstyear, c_lastyear, c_addr_id",
+    f"{CLOSURE_TABLE}_addr_id": "c_addr_id, c_firstyear, c_lastyear, c_belongs_to",
+}
+
+LEVEL_KEYS = tuple(f'level{i}' for i in range(1, MAX_DEPTH + 1))
+LEVEL_COLUMNS = ", ".join(f"{key}_{part}" for key in LEVEL_KEYS for part in ("id", "start", "end"))
+# Rows shown per table when --verify finds differences
+VERIFY_SHOWN = 5
+_EMPTY_LEVEL = (None, None, None)
+
+
+class BatchWriter:
+    """
+    Buffers rows for a single INSERT statement and flushes them with executemany
+    in fixed-size batches. Rows are written inside the connection's open transaction,
+    which is committed once when the builder exits
+    """
+    
+    def __init__(self, cursor: sqlite3.Cursor, sql: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.cursor = cursor
+        self.sql = sql
+        self.batch_size = batch_size
+        self.rows: List[tuple] = []
+        self.count = 0
+        
+    def add(self, row):
+        """Queue a row, flushing the batch once it is full"""
+        self.rows.append(row)
+        if len(self.rows) >= self.batch_size:
+            self.flush()
+            
+    def extend(self, rows):
+        """Queue several rows, flushing full batches as they fill up"""
+        for row in rows:
+            self.add(row)
+            
+    def flush(self):
+        """Write all queued rows"""
+        if self.rows:
+            self.cursor.executemany(self.sql, self.rows)
+            self.count += len(self.rows)
+            self.rows = []
+
+
+class RowBuffer(list):
+    """Collects segment rows in memory; stands in for BatchWriter inside pool workers"""
+    add = list.append
+
+
 class AddressHierarchyBuilder:
     """
     Address hierarchy relationship builder - based on Prof. Michael Fuller's VB code logic
@@ -15,13 +94,31 @@ class AddressHierarchyBuilder:
     Preserves gaps in data to tell the most continuous story possible
     """
     
-    def __init__(self, db_path: str = "latest.db"):
+    def __init__(self, db_path: str = "latest.db", engine: str = "memory",
+                 batch_size: int = DEFAULT_BATCH_SIZE, workers: int = 1,
+                 profile: str = "bulk", journal_mode: str = "wal"):
+        if engine not in ENGINES:
+            raise ValueError(f"Unknown engine {engine!r}, expected one of {ENGINES}")
+        if batch_size < 1:
+            raise ValueError(f"batch_size must be positive, got {batch_size}")
+        if workers < 1:
+            raise ValueError(f"workers must be positive, got {workers}")
+        if workers > 1 and engine != "memory":
+            raise ValueError("Parallel builds require the 'memory' engine")
         self.db_path = db_path
+        self.engine = engine
+        self.batch_size = batch_size
+        self.workers = workers
+        # Connection tuning from sqlite_profiles; journal_mode "off" only suits scratch databases
+        self.profile = profile
+        self.journal_mode = journal_mode
         self.conn = None
         self.cursor = None
+        self.belongs_graph: Optional[Dict[int, List[Interval]]] = None
+        self._segment_writer: Optional[BatchWriter] = None
         
     def __enter__(self):
-        self.conn = sqlite3.connect(self.db_path)
+        self.conn = sqlite_profiles.connect(self.db_path, self.profile, self.journal_mode)
         self.conn.row_factory = sqlite3.Row
         self.cursor = self.conn.cursor()
         return self
@@ -67,6 +164,10 @@ class AddressHierarchyBuilder:
             )
         """)
         
+        if self.engine == "sql":
+            self._clean_belongs_data_sql()
+            return
+        
         # Get all belongs relationships
         self.cursor.execute("""
             SELECT abd.*, 
@@ -80,9 +181,14 @@ class AddressHierarchyBuilder:
         """)
         
         rows = self.cursor.fetchall()
-        valid_count = 0
         invalid_count = 0
         
+        writer = BatchWriter(self.conn.cursor(), """
+            INSERT INTO CLEANED_BELONGS_DATA 
+            (c_addr_id, c_belongs_to, c_firstyear, c_lastyear)
+            VALUES (?, ?, ?, ?)
+        """, self.batch_size)
+        
         for row in rows:
             # Rule 1: Exclude Unknown (c_belongs_to = 0 or NULL)
             if not row['c_belongs_to'] or row['c_belongs_to'] == 0:
@@ -114,21 +220,51 @@ class AddressHierarchyBuilder:
                 invalid_count += 1
                 continue
                 
-            # Insert cleaned data
-            self.execute("""
-                INSERT INTO CLEANED_BELONGS_DATA 
-                (c_addr_id, c_belongs_to, c_firstyear, c_lastyear)
-                VALUES (?, ?, ?, ?)
-            """, (row['c_addr_id'], row['c_belongs_to'], 
-                  effective_first, effective_last))
-            valid_count += 1
+            # Queue cleaned data
+            writer.add((row['c_addr_id'], row['c_belongs_to'], 
+                        effective_first, effective_last))
             
-        logger.info(f"Data cleaning completed: {valid_count} valid, {invalid_count} invalid")
+        writer.flush()
+        logger.info(f"Data cleaning completed: {writer.count} valid, {invalid_count} invalid")
+    
+    def _clean_belongs_data_sql(self):
+        """
+        clean_belongs_data as one INSERT ... SELECT: the same rules, the same join and
+        therefore the same row order, with NULL years ignored by the MAX / MIN as in
+        safe_max / safe_min (the belongs_to unit's years are never NULL here)
+        """
+        total = self.cursor.execute("""
+            SELECT COUNT(*)
+            FROM ADDR_BELONGS_DATA abd
+            JOIN ADDR_CODES ac1 ON abd.c_addr_id = ac1.c_addr_id
+        """).fetchone()[0]
+        valid = self.execute("""
+            INSERT INTO CLEANED_BELONGS_DATA (c_addr_id, c_belongs_to, c_firstyear, c_lastyear)
+            SELECT c_addr_id, c_belongs_to, effective_first, effective_last
+            FROM (
+                SELECT abd.c_addr_id,
+                       abd.c_belongs_to,
+                       MAX(COALESCE(abd.c_firstyear, ac1.c_firstyear, ac2.c_firstyear),
+                           COALESCE(ac1.c_firstyear, ac2.c_firstyear),
+                           ac2.c_firstyear) AS effective_first,
+                       MIN(COALESCE(abd.c_lastyear, ac1.c_lastyear, ac2.c_lastyear),
+                           COALESCE(ac1.c_lastyear, ac2.c_lastyear),
+                           ac2.c_lastyear) AS effective_last
+                FROM ADDR_BELONGS_DATA abd
+                JOIN ADDR_CODES ac1 ON abd.c_addr_id = ac1.c_addr_id
+                LEFT JOIN ADDR_CODES ac2 ON abd.c_belongs_to = ac2.c_addr_id
+                WHERE abd.c_belongs_to IS NOT NULL AND abd.c_belongs_to <> 0 AND abd.c_belongs_to <> ''
+                  AND ac2.c_firstyear IS NOT NULL AND ac2.c_lastyear IS NOT NULL
+            )
+            WHERE effective_first <= effective_last
+        """)
+        logger.info(f"Data cleaning completed: {valid} valid, {total - valid} invalid")
         
-    def build_time_segments_with_gaps(self):
+    def build_time_segments_with_gaps(self, addr_ids: Optional[set] = None):
         """
         Build time segments including gaps
         This preserves the gaps in data and tells the most continuous story
+        When addr_ids is given, only those addresses are processed
         """
         logger.info("Building time segments with gap filling...")
         
@@ -139,7 +275,6 @@ class AddressHierarchyBuilder:
                 c_addr_id INTEGER,
                 segment_start INTEGER,
                 segment_end INTEGER,
-                belongs_chain TEXT,
                 level1_id INTEGER,
                 level1_start INTEGER,
                 level1_end INTEGER,
@@ -158,6 +293,10 @@ class AddressHierarchyBuilder:
             )
         """)
         
+        if self.engine == "sql":
+            self._build_time_segments_sql(addr_ids)
+            return
+        
         # Get all addresses with valid year data
         self.cursor.execute("""
             SELECT c_addr_id, c_firstyear, c_lastyear 
@@ -165,67 +304,332 @@ class AddressHierarchyBuilder:
             WHERE c_firstyear IS NOT NULL AND c_lastyear IS NOT NULL
         """)
         addresses = self.cursor.fetchall()
+        if addr_ids is not None:
+            addresses = [row for row in addresses if row['c_addr_id'] in addr_ids]
+        
+        if self.engine == "memory":
+            self.load_belongs_graph()
         
         logger.info(f"Processing {len(addresses)} addresses with valid year data...")
         
-        for addr_row in addresses:
-            addr_id = addr_row['c_addr_id']
-            addr_first = addr_row['c_firstyear']
-            addr_last = addr_row['c_lastyear']
+        self._segment_writer = BatchWriter(
+            self.conn.cursor(),
+            f"INSERT INTO TIME_SEGMENTS VALUES ({','.join('?' * 18)})",
+            self.batch_size
+        )
+        if self.workers > 1:
+            self._walk_addresses_parallel(addresses)
+        else:
+            for addr_row in addresses:
+                self._process_address(addr_row['c_addr_id'], addr_row['c_firstyear'], addr_row['c_lastyear'])
+        self._segment_writer.flush()
+        logger.info(f"Wrote {self._segment_writer.count} time segments")
+    
+    def _build_time_segments_sql(self, addr_ids: Optional[set] = None):
+        """
+        Write the TIME_SEGMENTS rows of the Python walk, in the same order, with set-based SQL
+        
+        SEGMENT_NODES holds every node of the walk, from a recursive CTE: the address itself
+        (depth 0) and each chain of belongs intervals below it, an interval at depth 2+ being
+        clipped to its parent's period. A node's path, ordinal by ordinal in the walk's
+        interval order, sorts the way the walk visits it; gap segments are keyed 'a' before
+        a child and 'z' after the last one. Each node then yields
+          - one segment for its whole period if it has no children (or is at MAX_DEPTH),
+          - a gap segment before a child that starts after the previous child's end + 1
+            (LAG over the siblings), and one after the last child if the period goes on;
+            gaps under the address carry the adjacent level 1 unit, gaps under levels 1
+            and 2 narrow that level to the gap, deeper gaps keep the parent chain
+        """
+        addresses_filter = ""
+        if addr_ids is not None:
+            self.execute("DROP TABLE IF EXISTS SEGMENT_ADDRESSES")
+            self.execute("CREATE TEMP TABLE SEGMENT_ADDRESSES (c_addr_id INTEGER PRIMARY KEY)")
+            self.cursor.executemany("INSERT INTO SEGMENT_ADDRESSES VALUES (?)", ((addr_id,) for addr_id in addr_ids))
+            addresses_filter = "AND c_addr_id IN (SELECT c_addr_id FROM SEGMENT_ADDRESSES)"
+        
+        with sql_profiler.stage("nodes"):
+            # The walk's interval order: distinct intervals by first year, ties in row order
+            self.execute("DROP TABLE IF EXISTS SEGMENT_BELONGS")
+            self.execute("""
+                CREATE TEMP TABLE SEGMENT_BELONGS AS
+                SELECT c_addr_id, c_belongs_to, c_firstyear, c_lastyear,
+                       ROW_NUMBER() OVER (PARTITION BY c_addr_id ORDER BY c_firstyear, first_row) AS seq
+                FROM (
+                    SELECT c_addr_id, c_belongs_to, c_firstyear, c_lastyear, MIN(rowid) AS first_row
+                    FROM CLEANED_BELONGS_DATA
+                    GROUP BY c_addr_id, c_belongs_to, c_firstyear, c_lastyear
+                )
+            """)
+            self.execute("CREATE INDEX temp.SEGMENT_BELONGS_addr ON SEGMENT_BELONGS (c_addr_id, c_firstyear)")
             
-            # Skip if years are invalid
-            if addr_first is None or addr_last is None or addr_first > addr_last:
-                logger.warning(f"Skipping address {addr_id} with invalid years: {addr_first}-{addr_last}")
-                continue
+            skipped = self.cursor.execute(f"""
+                SELECT c_addr_id, c_firstyear, c_lastyear FROM ADDR_CODES
+                WHERE c_firstyear > c_lastyear {addresses_filter}
+            """).fetchall()
+            for row in skipped:
+                logger.warning(f"Skipping address {row[0]} with invalid years: {row[1]}-{row[2]}")
             
-            # Get all level 1 belongs relationships for this address
-            self.cursor.execute("""
-                SELECT DISTINCT c_belongs_to, c_firstyear, c_lastyear
-                FROM CLEANED_BELONGS_DATA
-                WHERE c_addr_id = ?
-                ORDER BY c_firstyear
-            """, (addr_id,))
+            # Columns of a child node: its own level takes the clipped interval, the others are inherited
+            start = "CASE WHEN n.depth = 0 THEN b.c_firstyear ELSE MAX(b.c_firstyear, n.node_start) END"
+            end = "CASE WHEN n.depth = 0 THEN b.c_lastyear ELSE MIN(b.c_lastyear, n.node_end) END"
+            child_levels = ",\n".join(
+                f"CASE WHEN n.depth = {depth - 1} THEN {value} ELSE n.level{depth}_{part} END"
+                for depth in range(1, MAX_DEPTH + 1)
+                for part, value in (("id", "b.c_belongs_to"), ("start", start), ("end", end))
+            )
+            self.execute("DROP TABLE IF EXISTS SEGMENT_NODES")
+            self.execute(f"""
+                CREATE TEMP TABLE SEGMENT_NODES AS
+                WITH RECURSIVE node(root, c_addr_id, depth, parent_path, path, node_id,
+                                    node_start, node_end, {LEVEL_COLUMNS}) AS (
+                    SELECT rowid, c_addr_id, 0, NULL, '', c_addr_id, c_firstyear, c_lastyear,
+                           {', '.join(['NULL'] * 3 * MAX_DEPTH)}
+                    FROM ADDR_CODES
+                    WHERE c_firstyear IS NOT NULL AND c_lastyear IS NOT NULL
+                      AND c_firstyear <= c_lastyear {addresses_filter}
+                    UNION ALL
+                    SELECT n.root, n.c_addr_id, n.depth + 1, n.path,
+                           n.path || printf('%06d', b.seq) || 'b',
+                           b.c_belongs_to, {start}, {end},
+                           {child_levels}
+                    FROM node n
+                    JOIN SEGMENT_BELONGS b ON b.c_addr_id = n.node_id
+                    WHERE n.depth < {MAX_DEPTH}
+                      AND (n.depth = 0 OR (b.c_firstyear <= n.node_end AND b.c_lastyear >= n.node_start))
+                )
+                SELECT * FROM node
+            """)
+            self.execute("CREATE INDEX temp.SEGMENT_NODES_parent ON SEGMENT_NODES (root, parent_path)")
+        
+        with sql_profiler.stage("segments"):
+            def gap_levels(gap_start: str, gap_end: str, unit: str) -> str:
+                """Level columns of a gap segment under parent p, next to child node *unit*"""
+                columns = []
+                for depth in range(1, MAX_DEPTH + 1):
+                    key = f"level{depth}"
+                    narrowed = depth in (1, 2)
+                    columns.append(f"""
+                        CASE WHEN p.depth = 0 THEN {f"{unit}.node_id" if depth == 1 else "NULL"}
+                             ELSE p.{key}_id END""")
+                    for part, gap_value in (("start", gap_start), ("end", gap_end)):
+                        at_root = gap_value if depth == 1 else "NULL"
+                        own = f"WHEN p.depth = {depth} THEN {gap_value}" if narrowed else ""
+                        columns.append(f"""
+                        CASE WHEN p.depth = 0 THEN {at_root} {own} ELSE p.{key}_{part} END""")
+                return ",".join(columns)
             
-            level1_belongs = self.cursor.fetchall()
+            self.execute(f"""
+                INSERT INTO TIME_SEGMENTS
+                WITH children AS (
+                    SELECT c.*,
+                           COALESCE(LAG(c.node_end) OVER siblings + 1, p.node_start) AS gap_start,
+                           ROW_NUMBER() OVER (PARTITION BY c.root, c.parent_path ORDER BY c.path DESC) AS from_last
+                    FROM SEGMENT_NODES c
+                    JOIN SEGMENT_NODES p ON p.root = c.root AND p.path = c.parent_path
+                    WINDOW siblings AS (PARTITION BY c.root, c.parent_path ORDER BY c.path)
+                ),
+                segments AS (
+                    -- Nodes without children
+                    SELECT n.root, n.path AS sort_key, n.c_addr_id, n.node_start, n.node_end, {LEVEL_COLUMNS}
+                    FROM SEGMENT_NODES n
+                    WHERE n.depth = {MAX_DEPTH}
+                       OR NOT EXISTS (SELECT 1 FROM SEGMENT_NODES c WHERE c.root = n.root AND c.parent_path = n.path)
+                    UNION ALL
+                    -- Gaps before a child
+                    SELECT c.root, substr(c.path, 1, length(c.path) - 1) || 'a', c.c_addr_id,
+                           c.gap_start, c.node_start - 1,
+                           {gap_levels("c.gap_start", "c.node_start - 1", "c")}
+                    FROM children c
+                    JOIN SEGMENT_NODES p ON p.root = c.root AND p.path = c.parent_path
+                    WHERE c.gap_start < c.node_start
+                    UNION ALL
+                    -- Gaps after the last child
+                    SELECT c.root, c.parent_path || 'z', c.c_addr_id,
+                           c.node_end + 1, p.node_end,
+                           {gap_levels("c.node_end + 1", "p.node_end", "c")}
+                    FROM children c
+                    JOIN SEGMENT_NODES p ON p.root = c.root AND p.path = c.parent_path
+                    WHERE c.from_last = 1 AND c.node_end + 1 <= p.node_end
+                )
+                SELECT c_addr_id, node_start, node_end, {LEVEL_COLUMNS}
+                FROM segments
+                ORDER BY root, sort_key
+            """)
+            count = self.cursor.rowcount
+        
+        for table in ("SEGMENT_BELONGS", "SEGMENT_NODES", "SEGMENT_ADDRESSES"):
+            self.execute(f"DROP TABLE IF EXISTS temp.{table}")
+        logger.info(f"Wrote {count} time segments")
+    
+    def verify_sql_engine(self) -> bool:
+        """
+        Differential check of the sql engine: clean and walk the whole database with the
+        memory engine and with the sql engine and compare CLEANED_BELONGS_DATA and
+        TIME_SEGMENTS row for row, in order. Leaves the sql engine's tables behind
+        Returns True when both engines agree
+        """
+        original = self.engine
+        results = {}
+        try:
+            for engine in ("memory", "sql"):
+                self.engine = engine
+                logger.info(f"Building with the {engine} engine...")
+                self.belongs_graph = None
+                self.clean_belongs_data()
+                self.build_time_segments_with_gaps()
+                results[engine] = {
+                    table: self.cursor.execute(f"SELECT * FROM {table} ORDER BY rowid").fetchall()
+                    for table in ("CLEANED_BELONGS_DATA", "TIME_SEGMENTS")
+                }
+        finally:
+            self.engine = original
+        
+        identical = True
+        for table, expected in results["memory"].items():
+            expected = [tuple(row) for row in expected]
+            actual = [tuple(row) for row in results["sql"][table]]
+            mismatches = [i for i in range(max(len(expected), len(actual)))
+                          if i >= len(expected) or i >= len(actual) or expected[i] != actual[i]]
+            if not mismatches:
+                logger.info(f"{table}: {len(expected)} rows, identical")
+                continue
+            identical = False
+            logger.error(f"{table}: {len(expected)} rows from the memory engine, {len(actual)} from the sql "
+                         f"engine, {len(mismatches)} differing positions")
+            for i in mismatches[:VERIFY_SHOWN]:
+                logger.error(f"  row {i + 1}: memory {expected[i] if i < len(expected) else '-'}")
+                logger.error(f"  {' ' * len(str(i + 1))}       sql    {actual[i] if i < len(actual) else '-'}")
+        return identical
+    
+    def _walk_addresses_parallel(self, addresses: List[sqlite3.Row]):
+        """
+        Walk the hierarchy in a process pool. The address list is split into contiguous
+        shards; each worker receives the belongs graph once and returns the segment rows
+        of a shard, which are written back in shard order so TIME_SEGMENTS (and therefore
+        ADDRESSES) matches a single-process build row for row
+        """
+        addresses = [tuple(row) for row in addresses]
+        # Several shards per worker keep the pool busy when shard costs are uneven
+        shard_size = max(1, -(-len(addresses) // (self.workers * 4)))
+        shards = [addresses[i:i + shard_size] for i in range(0, len(addresses), shard_size)]
+        
+        logger.info(f"Walking {len(shards)} shards with {self.workers} worker processes...")
+        with ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker,
+                                 initargs=(self.belongs_graph,)) as pool:
+            for rows in pool.map(_walk_shard, shards):
+                self._segment_writer.extend(rows)
+    
+    def load_belongs_graph(self):
+        """
+        Load CLEANED_BELONGS_DATA into memory as {c_addr_id: [(c_belongs_to, c_firstyear, c_lastyear), ...]}
+        Each list is deduplicated in row order and stably sorted by c_firstyear, which
+        reproduces the row order of the SELECT DISTINCT ... ORDER BY c_firstyear lookups
+        """
+        graph: Dict[int, List[Interval]] = {}
+        seen = set()
+        
+        self.cursor.execute("""
+            SELECT c_addr_id, c_belongs_to, c_firstyear, c_lastyear
+            FROM CLEANED_BELONGS_DATA
+            ORDER BY rowid
+        """)
+        for addr_id, belongs_to, first, last in self.cursor:
+            key = (addr_id, belongs_to, first, last)
+            if key in seen:
+                continue
+            seen.add(key)
+            graph.setdefault(addr_id, []).append((belongs_to, first, last))
+        
+        for intervals in graph.values():
+            intervals.sort(key=itemgetter(1))
+        
+        self.belongs_graph = graph
+        logger.info(f"Loaded belongs graph: {len(seen)} intervals for {len(graph)} addresses")
+    
+    def _lookup_belongs(self, addr_id: int, start: Optional[int] = None,
+                        end: Optional[int] = None, level: int = 1) -> List[Interval]:
+        """
+        Return the belongs intervals of addr_id ordered by c_firstyear,
+        restricted to those overlapping start-end when a period is given
+        level (1-5) only names the profiling stage of the query engine's lookups
+        """
+        if self.belongs_graph is None:
+            with sql_profiler.stage(f"level{level}"):
+                if start is None:
+                    self.cursor.execute("""
+                        SELECT DISTINCT c_belongs_to, c_firstyear, c_lastyear
+                        FROM CLEANED_BELONGS_DATA
+                        WHERE c_addr_id = ?
+                        ORDER BY c_firstyear
+                    """, (addr_id,))
+                else:
+                    self.cursor.execute("""
+                        SELECT DISTINCT c_belongs_to, c_firstyear, c_lastyear
+                        FROM CLEANED_BELONGS_DATA
+                        WHERE c_addr_id = ? 
+                          AND c_firstyear <= ?
+                          AND c_lastyear >= ?
+                        ORDER BY c_firstyear
+                    """, (addr_id, end, start))
+                return self.cursor.fetchall()
+        
+        intervals = self.belongs_graph.get(addr_id, [])
+        if start is None:
+            return intervals
+        
+        # Intervals are sorted by first year, so stop at the first one starting after the period
+        overlapping = []
+        for interval in intervals:
+            if interval[1] > end:
+                break
+            if interval[2] >= start:
+                overlapping.append(interval)
+        return overlapping
+    
+    def _process_address(self, addr_id: int, addr_first: int, addr_last: int):
+        """
+        Build all time segments of a single address, filling gaps at level 1
+        """
+        # Skip if years are invalid
+        if addr_first is None or addr_last is None or addr_first > addr_last:
+            logger.warning(f"Skipping address {addr_id} with invalid years: {addr_first}-{addr_last}")
+            return
+        
+        # Get all level 1 belongs relationships for this address
+        level1_belongs = self._lookup_belongs(addr_id)
+        
+        if not level1_belongs:
+            # No belongs relationship for entire period
+            self._insert_segment(addr_id, addr_first, addr_last, {})
+        else:
+            # Process each L1 relationship and fill gaps
+            current_year = addr_first
             
-            if not level1_belongs:
-                # No belongs relationship for entire period
-                self._insert_segment(addr_id, addr_first, addr_last, {})
-            else:
-                # Process each L1 relationship and fill gaps
-                current_year = addr_first
+            for l1_id, l1_start, l1_end in level1_belongs:
+                # If there's a gap before this L1 relationship
+                if current_year < l1_start:
+                    # Insert gap record with only L1 (no deeper levels)
+                    gap_chain = {'level1': {
+                        'id': l1_id,
+                        'start': current_year,
+                        'end': l1_start - 1
+                    }}
+                    self._insert_segment(addr_id, current_year, l1_start - 1, gap_chain)
                 
-                for l1 in level1_belongs:
-                    l1_start = l1['c_firstyear']
-                    l1_end = l1['c_lastyear']
-                    l1_id = l1['c_belongs_to']
-                    
-                    # If there's a gap before this L1 relationship
-                    if current_year < l1_start:
-                        # Insert gap record with only L1 (no deeper levels)
-                        gap_chain = {'level1': {
-                            'id': l1_id,
-                            'start': current_year,
-                            'end': l1_start - 1
-                        }}
-                        self._insert_segment(addr_id, current_year, l1_start - 1, gap_chain)
-                    
-                    # Process the actual L1 period with its nested relationships
-                    self._process_level1_with_gaps(addr_id, l1_id, l1_start, l1_end)
-                    
-                    current_year = l1_end + 1
+                # Process the actual L1 period with its nested relationships
+                self._process_level1_with_gaps(addr_id, l1_id, l1_start, l1_end)
                 
-                # Fill gap at the end if needed
-                if addr_last is not None and current_year <= addr_last:
-                    # Use the last L1 belongs for the gap
-                    if level1_belongs:
-                        last_l1 = level1_belongs[-1]
-                        gap_chain = {'level1': {
-                            'id': last_l1['c_belongs_to'],
-                            'start': current_year,
-                            'end': addr_last
-                        }}
-                        self._insert_segment(addr_id, current_year, addr_last, gap_chain)
+                current_year = l1_end + 1
+            
+            # Fill gap at the end if needed
+            if addr_last is not None and current_year <= addr_last:
+                # Use the last L1 belongs for the gap
+                gap_chain = {'level1': {
+                    'id': level1_belongs[-1][0],
+                    'start': current_year,
+                    'end': addr_last
+                }}
+                self._insert_segment(addr_id, current_year, addr_last, gap_chain)
     
     def _process_level1_with_gaps(self, addr_id: int, l1_id: int, l1_start: int, l1_end: int):
         """
@@ -235,16 +639,7 @@ class AddressHierarchyBuilder:
             return
             
         # Get Level 2 relationships for this L1
-        self.cursor.execute("""
-            SELECT DISTINCT c_belongs_to, c_firstyear, c_lastyear
-            FROM CLEANED_BELONGS_DATA
-            WHERE c_addr_id = ? 
-              AND c_firstyear <= ?
-              AND c_lastyear >= ?
-            ORDER BY c_firstyear
-        """, (l1_id, l1_end, l1_start))
-        
-        level2_belongs = self.cursor.fetchall()
+        level2_belongs = self._lookup_belongs(l1_id, l1_start, l1_end, level=2)
         
         if not level2_belongs:
             # No Level 2 for entire L1 period
@@ -254,10 +649,10 @@ class AddressHierarchyBuilder:
             # Process L2 relationships and fill gaps
             current_year = l1_start
             
-            for l2 in level2_belongs:
+            for l2_id, l2_first, l2_last in level2_belongs:
                 # Calculate intersection with L1 period
-                l2_effective_start = max(l2['c_firstyear'], l1_start)
-                l2_effective_end = min(l2['c_lastyear'], l1_end)
+                l2_effective_start = max(l2_first, l1_start)
+                l2_effective_end = min(l2_last, l1_end)
                 
                 if l2_effective_start > l2_effective_end:
                     continue
@@ -271,7 +666,7 @@ class AddressHierarchyBuilder:
                 
                 # Process the actual L2 period with deeper levels
                 self._process_level2_with_gaps(addr_id, l1_id, l1_start, l1_end,
-                                              l2['c_belongs_to'], l2_effective_start, l2_effective_end)
+                                              l2_id, l2_effective_start, l2_effective_end)
                 
                 current_year = l2_effective_end + 1
             
@@ -291,16 +686,7 @@ class AddressHierarchyBuilder:
             return
             
         # Get Level 3 relationships
-        self.cursor.execute("""
-            SELECT DISTINCT c_belongs_to, c_firstyear, c_lastyear
-            FROM CLEANED_BELONGS_DATA
-            WHERE c_addr_id = ? 
-              AND c_firstyear <= ?
-              AND c_lastyear >= ?
-            ORDER BY c_firstyear
-        """, (l2_id, l2_end, l2_start))
-        
-        level3_belongs = self.cursor.fetchall()
+        level3_belongs = self._lookup_belongs(l2_id, l2_start, l2_end, level=3)
         
         if not level3_belongs:
             # No Level 3 for entire L2 period
@@ -313,10 +699,10 @@ class AddressHierarchyBuilder:
             # Process L3 relationships and fill gaps
             current_year = l2_start
             
-            for l3 in level3_belongs:
+            for l3_id, l3_first, l3_last in level3_belongs:
                 # Calculate intersection
-                l3_effective_start = max(l3['c_firstyear'], l2_start)
-                l3_effective_end = min(l3['c_lastyear'], l2_end)
+                l3_effective_start = max(l3_first, l2_start)
+                l3_effective_end = min(l3_last, l2_end)
                 
                 if l3_effective_start > l3_effective_end:
                     continue
@@ -333,11 +719,11 @@ class AddressHierarchyBuilder:
                 chain = {
                     'level1': {'id': l1_id, 'start': l1_start, 'end': l1_end},
                     'level2': {'id': l2_id, 'start': l2_start, 'end': l2_end},
-                    'level3': {'id': l3['c_belongs_to'], 'start': l3_effective_start, 'end': l3_effective_end}
+                    'level3': {'id': l3_id, 'start': l3_effective_start, 'end': l3_effective_end}
                 }
                 
                 # Continue to L4 and L5 if needed
-                self._process_deeper_levels(addr_id, chain, l3['c_belongs_to'], 
+                self._process_deeper_levels(addr_id, chain, l3_id, 
                                            l3_effective_start, l3_effective_end, 3)
                 
                 current_year = l3_effective_end + 1
@@ -366,16 +752,7 @@ class AddressHierarchyBuilder:
         next_level = current_level + 1
         
         # Get next level relationships
-        self.cursor.execute("""
-            SELECT DISTINCT c_belongs_to, c_firstyear, c_lastyear
-            FROM CLEANED_BELONGS_DATA
-            WHERE c_addr_id = ? 
-              AND c_firstyear <= ?
-              AND c_lastyear >= ?
-            ORDER BY c_firstyear
-        """, (parent_id, end, start))
-        
-        next_belongs = self.cursor.fetchall()
+        next_belongs = self._lookup_belongs(parent_id, start, end, level=next_level)
         
         if not next_belongs:
             # No deeper level, save current chain
@@ -384,9 +761,9 @@ class AddressHierarchyBuilder:
             # Process with gaps
             current_year = start
             
-            for nb in next_belongs:
-                nb_start = max(nb['c_firstyear'], start)
-                nb_end = min(nb['c_lastyear'], end)
+            for nb_id, nb_first, nb_last in next_belongs:
+                nb_start = max(nb_first, start)
+                nb_end = min(nb_last, end)
                 
                 if nb_start > nb_end:
                     continue
@@ -398,13 +775,13 @@ class AddressHierarchyBuilder:
                 # Create new chain with next level
                 new_chain = chain.copy()
                 new_chain[f'level{next_level}'] = {
-                    'id': nb['c_belongs_to'],
+                    'id': nb_id,
                     'start': nb_start,
                     'end': nb_end
                 }
                 
                 # Continue deeper
-                self._process_deeper_levels(addr_id, new_chain, nb['c_belongs_to'],
+                self._process_deeper_levels(addr_id, new_chain, nb_id,
                                           nb_start, nb_end, next_level)
                 
                 current_year = nb_end + 1
@@ -414,27 +791,21 @@ class AddressHierarchyBuilder:
                 self._insert_segment(addr_id, current_year, end, chain)
                                                
     def _insert_segment(self, addr_id: int, start: int, end: int, chain: Dict):
-        """Insert a time segment record"""
+        """Queue a time segment record for the batched TIME_SEGMENTS insert"""
         if start is None or end is None:
             return
             
-        values = [addr_id, start, end, str(chain)]
+        values = [addr_id, start, end]
         
         # Add level information
-        for i in range(1, 6):
-            if f'level{i}' in chain:
-                values.extend([
-                    chain[f'level{i}']['id'],
-                    chain[f'level{i}'].get('start', start),
-                    chain[f'level{i}'].get('end', end)
-                ])
+        for key in LEVEL_KEYS:
+            level = chain.get(key)
+            if level is None:
+                values.extend(_EMPTY_LEVEL)
             else:
-                values.extend([None, None, None])
+                values.extend((level['id'], level.get('start', start), level.get('end', end)))
         
-        placeholders = ','.join(['?' for _ in values])
-        self.execute(f"""
-            INSERT INTO TIME_SEGMENTS VALUES ({placeholders})
-        """, tuple(values))
+        self._segment_writer.add(values)
             
     def build_final_addresses_table(self):
         """Build final ADDRESSES table"""
@@ -474,7 +845,14 @@ class AddressHierarchyBuilder:
             )
         """)
         
-        # Build final data from TIME_SEGMENTS
+        count = self._insert_addresses_from_segments()
+        logger.info(f"ADDRESSES table created with {count} records")
+        
+        # Verify example cases
+        self._verify_example_cases()
+        
+    def _insert_addresses_from_segments(self) -> int:
+        """Resolve names for every row of TIME_SEGMENTS and append them to ADDRESSES"""
         self.execute("""
             INSERT INTO ADDRESSES
             SELECT 
@@ -512,13 +890,181 @@ class AddressHierarchyBuilder:
             LEFT JOIN ADDR_CODES a5 ON ts.level5_id = a5.c_addr_id
             ORDER BY ts.c_addr_id, ts.segment_start
         """)
+        return self.cursor.rowcount
+    
+    def build_closure_table(self):
+        """Build ADDR_CLOSURE from TIME_SEGMENTS, indexing it once all rows are in"""
+        logger.info(f"Building {CLOSURE_TABLE} table...")
+        self.execute(f"DROP TABLE IF EXISTS {CLOSURE_TABLE}")
+        self.execute(f"""
+            CREATE TABLE {CLOSURE_TABLE} (
+                c_addr_id INTEGER,
+                c_belongs_to INTEGER,
+                c_depth INTEGER,
+                c_firstyear INTEGER,
+                c_lastyear INTEGER
+            )
+        """)
+        count = self._insert_closure_from_segments()
+        for name, columns in CLOSURE_INDEXES.items():
+            self.execute(f"CREATE INDEX {name} ON {CLOSURE_TABLE} ({columns})")
+        logger.info(f"{CLOSURE_TABLE} table created with {count} records")
+    
+    def _insert_closure_from_segments(self, affected_only: bool = False) -> int:
+        """
+        Append a depth 0 row for every address and one row per ancestor, depth and
+        period: the TIME_SEGMENTS periods an ancestor spans are merged where they touch,
+        so a gap in the hierarchy stays a gap
+        With affected_only, self rows are only added for the addresses in AFFECTED_ADDRESSES
+        """
+        where = "WHERE c_addr_id IN (SELECT c_addr_id FROM AFFECTED_ADDRESSES)" if affected_only else ""
+        count = self.execute(f"""
+            INSERT INTO {CLOSURE_TABLE}
+            SELECT c_addr_id, c_addr_id, 0, c_firstyear, c_lastyear
+            FROM ADDR_CODES
+            {where}
+        """)
         
-        count = self.cursor.rowcount
-        logger.info(f"ADDRESSES table created with {count} records")
+        writer = BatchWriter(self.conn.cursor(), f"INSERT INTO {CLOSURE_TABLE} VALUES (?, ?, ?, ?, ?)",
+                             self.batch_size)
+        
+        def flush(addr_id, periods):
+            for (depth, ancestor), spans in sorted(periods.items()):
+                spans.sort()
+                first, last = spans[0]
+                for start, end in spans[1:]:
+                    if start > last + 1:
+                        writer.add((addr_id, ancestor, depth, first, last))
+                        first = start
+                    last = max(last, end)
+                writer.add((addr_id, ancestor, depth, first, last))
+        
+        current_addr = None
+        periods: Dict[Tuple[int, int], List[Tuple[int, int]]] = {}
+        segments = self.conn.execute(f"""
+            SELECT c_addr_id, segment_start, segment_end, {', '.join(f'{key}_id' for key in LEVEL_KEYS)}
+            FROM TIME_SEGMENTS
+            ORDER BY c_addr_id
+        """)
+        for addr_id, start, end, *ancestors in segments:
+            if addr_id != current_addr:
+                flush(current_addr, periods)
+                current_addr, periods = addr_id, {}
+            for depth, ancestor in enumerate(ancestors, 1):
+                if ancestor is not None:
+                    periods.setdefault((depth, ancestor), []).append((start, end))
+        flush(current_addr, periods)
+        writer.flush()
+        return count + writer.count
+    
+    def patch_addresses_table(self, addr_ids: set, closure: bool = False):
+        """
+        Replace the ADDRESSES rows (and with closure, the ADDR_CLOSURE rows) of addr_ids
+        with the freshly built TIME_SEGMENTS
+        Patched rows are appended, so physical row order differs from a full rebuild
+        """
+        logger.info(f"Patching ADDRESSES for {len(addr_ids)} addresses...")
+        
+        self.execute("DROP TABLE IF EXISTS AFFECTED_ADDRESSES")
+        self.execute("CREATE TEMP TABLE AFFECTED_ADDRESSES (c_addr_id INTEGER PRIMARY KEY)")
+        self.cursor.executemany("INSERT INTO AFFECTED_ADDRESSES VALUES (?)",
+                                ((addr_id,) for addr_id in addr_ids))
+        
+        deleted = self.execute("""
+            DELETE FROM ADDRESSES
+            WHERE c_addr_id IN (SELECT c_addr_id FROM AFFECTED_ADDRESSES)
+        """)
+        inserted = self._insert_addresses_from_segments()
+        logger.info(f"ADDRESSES patched: {deleted} records removed, {inserted} records inserted")
+        
+        if closure:
+            deleted = self.execute(f"""
+                DELETE FROM {CLOSURE_TABLE}
+                WHERE c_addr_id IN (SELECT c_addr_id FROM AFFECTED_ADDRESSES)
+            """)
+            inserted = self._insert_closure_from_segments(affected_only=True)
+            logger.info(f"{CLOSURE_TABLE} patched: {deleted} records removed, {inserted} records inserted")
         
-        # Verify example cases
         self._verify_example_cases()
         
+    def compute_address_fingerprints(self) -> Dict[int, str]:
+        """
+        Digest, per c_addr_id, its ADDR_CODES row and its ADDR_BELONGS_DATA rows in row order
+        Row order is included because it decides the order of overlapping belongs periods
+        """
+        hashers = {}
+        
+        def update(addr_id, row):
+            hasher = hashers.get(addr_id)
+            if hasher is None:
+                hasher = hashers[addr_id] = hashlib.blake2b(digest_size=16)
+            hasher.update(repr(tuple(row)).encode("utf-8"))
+        
+        self.cursor.execute("SELECT * FROM ADDR_CODES ORDER BY rowid")
+        for row in self.cursor:
+            update(row['c_addr_id'], row)
+        self.cursor.execute("SELECT * FROM ADDR_BELONGS_DATA ORDER BY rowid")
+        for row in self.cursor:
+            update(row['c_addr_id'], row)
+        
+        return {addr_id: hasher.hexdigest() for addr_id, hasher in hashers.items()}
+    
+    def store_address_fingerprints(self, fingerprints: Dict[int, str]):
+        """Replace the stored fingerprints with those of the data ADDRESSES was just built from"""
+        self.execute(f"DROP TABLE IF EXISTS {FINGERPRINT_TABLE}")
+        self.execute(f"""
+            CREATE TABLE {FINGERPRINT_TABLE} (
+                c_addr_id INTEGER PRIMARY KEY,
+                c_fingerprint TEXT
+            )
+        """)
+        writer = BatchWriter(self.conn.cursor(), f"INSERT INTO {FINGERPRINT_TABLE} VALUES (?, ?)",
+                             self.batch_size)
+        writer.extend(fingerprints.items())
+        writer.flush()
+        
+    def _list_tables(self) -> set:
+        return {row[0] for row in self.cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        
+    def find_affected_addresses(self, fingerprints: Dict[int, str], closure: bool = False) -> Optional[set]:
+        """
+        Compare fingerprints with those stored by the previous build and return the
+        addresses whose ADDRESSES rows must be regenerated: every changed, added or
+        removed address plus every descendant whose chain can pass through one
+        Returns None when there is no previous build to patch, or no ADDR_CLOSURE with closure
+        """
+        required = {"ADDRESSES", FINGERPRINT_TABLE} | ({CLOSURE_TABLE} if closure else set())
+        if not required <= self._list_tables():
+            logger.info("No previous build state found, falling back to a full rebuild")
+            return None
+        
+        stored = dict(self.cursor.execute(
+            f"SELECT c_addr_id, c_fingerprint FROM {FINGERPRINT_TABLE}"
+        ).fetchall())
+        changed = {addr_id for addr_id in stored.keys() | fingerprints.keys()
+                   if stored.get(addr_id) != fingerprints.get(addr_id)}
+        if not changed:
+            return set()
+        
+        # Reverse belongs graph: parent -> children
+        children: Dict[int, set] = {}
+        for addr_id, belongs_to in self.cursor.execute(
+            "SELECT c_addr_id, c_belongs_to FROM ADDR_BELONGS_DATA"
+        ):
+            children.setdefault(belongs_to, set()).add(addr_id)
+        
+        # A change reaches descendants at most MAX_DEPTH levels down, the deepest belongs column
+        affected = set(changed)
+        frontier = changed
+        for _ in range(MAX_DEPTH):
+            frontier = {child for parent in frontier for child in children.get(parent, ())} - affected
+            if not frontier:
+                break
+            affected |= frontier
+        
+        logger.info(f"{len(changed)} addresses changed, {len(affected)} addresses affected")
+        return affected
+        
     def _verify_example_cases(self):
         """Verify the specific cases mentioned in Michael's emails"""
         # Check Jiangle (100149)
@@ -557,21 +1103,54 @@ class AddressHierarchyBuilder:
                            f"{row['belongs1_Name_chn']} -> {row['belongs2_Name_chn'] or ''} -> "
                            f"{row['belongs3_Name_chn'] or ''} -> {row['belongs4_Name_chn'] or ''}")
                        
-    def run(self):
-        """Execute complete build process"""
+    def run(self, incremental: bool = False, closure: bool = False):
+        """
+        Execute complete build process
+        With incremental=True only addresses affected by changes since the previous
+        build are regenerated, using the fingerprints it stored; without a previous
+        build this is a full rebuild. With closure=True ADDR_CLOSURE is built as well
+        Once they exist, ADDRESSES_FINGERPRINTS and ADDR_CLOSURE are kept up to date
+        by every later build, so neither goes stale
+        """
         try:
             logger.info("="*60)
             logger.info("Starting address hierarchy build with gap preservation...")
             logger.info("="*60)
             
-            # 1. Clean data
-            self.clean_belongs_data()
+            tables = self._list_tables()
+            fingerprinted = incremental or FINGERPRINT_TABLE in tables
+            closure = closure or CLOSURE_TABLE in tables
+            
+            fingerprints = affected = None
+            if fingerprinted:
+                with sql_profiler.stage("fingerprints"):
+                    fingerprints = self.compute_address_fingerprints()
+                    if incremental:
+                        affected = self.find_affected_addresses(fingerprints, closure)
             
-            # 2. Build time segments with gaps
-            self.build_time_segments_with_gaps()
+            if affected is not None and not affected:
+                logger.info("No address changes since the previous build, ADDRESSES is up to date")
+            else:
+                # 1. Clean data
+                with sql_profiler.stage("clean_belongs_data"):
+                    self.clean_belongs_data()
+                
+                # 2. Build time segments with gaps
+                with sql_profiler.stage("time_segments"):
+                    self.build_time_segments_with_gaps(affected)
+                
+                # 3. Generate final table
+                with sql_profiler.stage("addresses_table"):
+                    if affected is None:
+                        self.build_final_addresses_table()
+                        if closure:
+                            self.build_closure_table()
+                    else:
+                        self.patch_addresses_table(affected, closure)
             
-            # 3. Generate final table
-            self.build_final_addresses_table()
+            if fingerprints is not None:
+                with sql_profiler.stage("fingerprints"):
+                    self.store_address_fingerprints(fingerprints)
             
             logger.info("="*60)
             logger.info("Build completed!")
@@ -583,11 +1162,59 @@ class AddressHierarchyBuilder:
             traceback.print_exc()
             raise
 
+# Per-process builder used by pool workers; set up once by _init_worker
+_worker_builder: Optional[AddressHierarchyBuilder] = None
+
+
+def _init_worker(belongs_graph: Dict[int, List[Interval]]):
+    """Pool initializer: keep a connection-less builder around the parent's belongs graph"""
+    global _worker_builder
+    _worker_builder = AddressHierarchyBuilder()
+    _worker_builder.belongs_graph = belongs_graph
+
+
+def _walk_shard(addresses: List[Tuple[int, int, int]]) -> List[list]:
+    """Walk one shard of (c_addr_id, c_firstyear, c_lastyear) rows and return its segment rows"""
+    rows = RowBuffer()
+    _worker_builder._segment_writer = rows
+    for addr_id, addr_first, addr_last in addresses:
+        _worker_builder._process_address(addr_id, addr_first, addr_last)
+    return rows
+
 # Usage
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Build the ADDRESSES table from the CBDB SQLite database.")
     parser.add_argument("--db", default="latest.db", help="Path to the SQLite database file to process")
+    parser.add_argument("--engine", choices=ENGINES, default="memory",
+                        help="How belongs lookups are resolved: 'memory' loads the cleaned belongs graph once "
+                             "(default), 'query' issues one SQL query per address and level, 'sql' builds "
+                             "the segments set-based with a recursive CTE and window functions")
+    parser.add_argument("--verify", action="store_true",
+                        help="Build the time segments with both the memory and the sql engine, compare them "
+                             "and exit with status 1 if they differ; ADDRESSES is left untouched")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Rows per executemany batch when writing intermediate tables "
+                             f"(default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Number of processes walking the address hierarchy (default: 1)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only regenerate addresses affected by ADDR_CODES / ADDR_BELONGS_DATA changes "
+                             "since the previous build, tracked in ADDRESSES_FINGERPRINTS")
+    parser.add_argument("--closure", action="store_true",
+                        help="Also build the ADDR_CLOSURE ancestor table for containment queries")
+    parser.add_argument("--profile", choices=sqlite_profiles.PROFILES, default="bulk",
+                        help="Connection settings: 'bulk' (WAL, synchronous=OFF, large cache; restored "
+                             "on exit, default) or SQLite's 'default'")
+    parser.add_argument("--sql-profile", metavar="PATH",
+                        help="Record per-stage SQL statistics and write them to PATH (JSON) and to a .folded "
+                             "flame graph file next to it")
     args = parser.parse_args()
 
-    with AddressHierarchyBuilder(args.db) as builder:
-        builder.run()
+    with sql_profiler.profiling(args.sql_profile):
+        with AddressHierarchyBuilder(args.db, engine=args.engine, batch_size=args.batch_size,
+                                     workers=args.workers, profile=args.profile) as builder:
+            if args.verify:
+                if not builder.verify_sql_engine():
+                    raise SystemExit(1)
+            else:
+                builder.run(incremental=args.incremental, closure=args.closure)
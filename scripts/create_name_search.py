@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Build full-text indexes over the names of people, places and texts.
+
+NAME_SEARCH holds one row per distinct name of an entity, taken from
+
+    BIOG_MAIN     c_name_chn / c_name          -> person (c_personid)
+    ALTNAME_DATA  c_alt_name_chn / c_alt_name  -> person (c_personid)
+    ADDR_CODES    c_name_chn / c_name          -> place  (c_addr_id)
+    TEXT_CODES    c_title_chn / c_title        -> text   (c_textid)
+
+and two FTS5 indexes read it as external content: NAME_SEARCH_CJK with the
+trigram tokenizer over the Chinese names (substring matches for queries of
+three or more characters) and NAME_SEARCH_PINYIN with unicode61 over the
+romanised names (word and word-prefix matches).  Triggers keep both in step
+with NAME_SEARCH, so ``refresh`` only deletes and inserts the names that
+changed in the source tables since the last build.  Chinese queries shorter
+than three characters, which trigrams cannot match, are answered as name
+prefixes from an index on NAME_SEARCH.c_name_chn.
+
+Usage:
+    python create_name_search.py [--db DB_PATH] build
+    python create_name_search.py [--db DB_PATH] refresh
+    python create_name_search.py [--db DB_PATH] search TEXT [--entity person|place|text] [--limit N]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import sqlite_profiles
+
+CONTENT_TABLE = "NAME_SEARCH"
+CJK_TABLE = "NAME_SEARCH_CJK"
+PINYIN_TABLE = "NAME_SEARCH_PINYIN"
+
+# {source table: (entity, id column, Chinese name column, romanised name column)}
+SOURCES: Dict[str, Tuple[str, str, str, str]] = {
+    "BIOG_MAIN": ("person", "c_personid", "c_name_chn", "c_name"),
+    "ALTNAME_DATA": ("person", "c_personid", "c_alt_name_chn", "c_alt_name"),
+    "ADDR_CODES": ("place", "c_addr_id", "c_name_chn", "c_name"),
+    "TEXT_CODES": ("text", "c_textid", "c_title_chn", "c_title"),
+}
+ENTITIES = ("person", "place", "text")
+COLUMNS = "c_entity, c_entity_id, c_source, c_name_chn, c_name"
+
+# Trigram queries need at least this many characters.
+TRIGRAM_MIN_CHARS = 3
+DEFAULT_LIMIT = 20
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+_CJK_RE = re.compile("[⺀-鿿豈-﫿\U00020000-\U0003ffff]")
+_WORD_RE = re.compile(r"\w+")
+# What SQLite says when it was built without FTS5 or with an FTS5 lacking the trigram tokenizer (< 3.34).
+_NO_FTS5_RE = re.compile(r"no such module: fts5|no such tokenizer|error in tokenizer constructor")
+
+SCHEMA = (
+    f"""
+    CREATE TABLE {CONTENT_TABLE} (
+        id INTEGER PRIMARY KEY,
+        c_entity TEXT NOT NULL,
+        c_entity_id INTEGER NOT NULL,
+        c_source TEXT NOT NULL,
+        c_name_chn TEXT NOT NULL,
+        c_name TEXT NOT NULL
+    )
+    """,
+    f"CREATE INDEX {CONTENT_TABLE}_name_chn ON {CONTENT_TABLE} (c_name_chn)",
+    f"CREATE INDEX {CONTENT_TABLE}_entity ON {CONTENT_TABLE} (c_entity, c_entity_id)",
+    f"""
+    CREATE VIRTUAL TABLE {CJK_TABLE} USING fts5(
+        c_name_chn, content='{CONTENT_TABLE}', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE VIRTUAL TABLE {PINYIN_TABLE} USING fts5(
+        c_name, content='{CONTENT_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3'
+    )
+    """,
+)
+
+# Created after the initial load, which fills the indexes with 'rebuild' instead.
+# NAME_SEARCH rows are only ever inserted and deleted, never updated.
+TRIGGERS = (
+    f"""
+    CREATE TRIGGER {CONTENT_TABLE}_ai AFTER INSERT ON {CONTENT_TABLE} BEGIN
+        INSERT INTO {CJK_TABLE}(rowid, c_name_chn) VALUES (new.id, new.c_name_chn);
+        INSERT INTO {PINYIN_TABLE}(rowid, c_name) VALUES (new.id, new.c_name);
+    END
+    """,
+    f"""
+    CREATE TRIGGER {CONTENT_TABLE}_ad AFTER DELETE ON {CONTENT_TABLE} BEGIN
+        INSERT INTO {CJK_TABLE}({CJK_TABLE}, rowid, c_name_chn) VALUES ('delete', old.id, old.c_name_chn);
+        INSERT INTO {PINYIN_TABLE}({PINYIN_TABLE}, rowid, c_name) VALUES ('delete', old.id, old.c_name);
+    END
+    """,
+)
+
+
+@dataclass(frozen=True)
+class Match:
+    c_entity: str
+    c_entity_id: int
+    c_source: str
+    c_name_chn: str
+    c_name: str
+
+
+def _list_tables(conn: sqlite3.Connection) -> Set[str]:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def names_select(tables: Set[str]) -> str:
+    """SELECT of every distinct (entity, id, source, Chinese name, romanised name) in the sources."""
+    parts = []
+    for table, (entity, id_column, chn_column, name_column) in SOURCES.items():
+        if table not in tables:
+            logger.warning("%s not found, its names are not indexed", table)
+            continue
+        chn = f"TRIM(COALESCE({chn_column}, ''))"
+        name = f"TRIM(COALESCE({name_column}, ''))"
+        parts.append(
+            f"SELECT '{entity}', {id_column}, '{table}', {chn}, {name} FROM {table} "
+            f"WHERE {id_column} IS NOT NULL AND ({chn} <> '' OR {name} <> '')"
+        )
+    if not parts:
+        raise LookupError(f"None of {', '.join(SOURCES)} found")
+    return "\nUNION\n".join(parts)
+
+
+def build_name_search(db_path: str | Path, timeout: float = 5.0) -> int:
+    """
+    (Re)build NAME_SEARCH and its FTS5 indexes from scratch, waiting up to
+    *timeout* seconds for another writer; return the number of names.
+    """
+    started = time.perf_counter()
+    conn = sqlite_profiles.connect(db_path, timeout=timeout, isolation_level=None)
+    try:
+        tables = _list_tables(conn)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for table in (CJK_TABLE, PINYIN_TABLE, CONTENT_TABLE):
+                conn.execute(f"DROP TABLE IF EXISTS {table}")
+            try:
+                for sql in SCHEMA:
+                    conn.execute(sql)
+            except sqlite3.OperationalError as exc:
+                if not _NO_FTS5_RE.search(str(exc)):
+                    raise
+                raise RuntimeError(f"SQLite {sqlite3.sqlite_version} cannot create the FTS5 indexes: {exc}") from exc
+            conn.execute(
+                f"INSERT INTO {CONTENT_TABLE} ({COLUMNS}) "
+                f"SELECT * FROM ({names_select(tables)}) ORDER BY 1, 2, 3, 4, 5"
+            )
+            for table in (CJK_TABLE, PINYIN_TABLE):
+                conn.execute(f"INSERT INTO {table}({table}) VALUES ('rebuild')")
+            for sql in TRIGGERS:
+                conn.execute(sql)
+            count = conn.execute(f"SELECT COUNT(*) FROM {CONTENT_TABLE}").fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    logger.info("%s built with %d names in %.2f s", CONTENT_TABLE, count, time.perf_counter() - started)
+    return count
+
+
+def refresh_name_search(db_path: str | Path, timeout: float = 5.0) -> Tuple[int, int]:
+    """
+    Bring NAME_SEARCH up to date with the source tables by deleting the names
+    that disappeared and inserting the new ones; the triggers update the FTS5
+    indexes.  Builds from scratch if there is no index yet.  Waits up to
+    *timeout* seconds for another writer.  Returns (deleted, inserted).
+    """
+    started = time.perf_counter()
+    conn = sqlite_profiles.connect(db_path, timeout=timeout, isolation_level=None)
+    try:
+        tables = _list_tables(conn)
+        if not {CONTENT_TABLE, CJK_TABLE, PINYIN_TABLE} <= tables:
+            logger.info("No previous %s found, building it from scratch", CONTENT_TABLE)
+            return 0, build_name_search(db_path, timeout)
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"CREATE TEMP TABLE current_names AS {names_select(tables)}")
+            conn.execute(
+                f"CREATE TEMP TABLE stale_names AS "
+                f"SELECT {COLUMNS} FROM main.{CONTENT_TABLE} EXCEPT SELECT * FROM current_names"
+            )
+            conn.execute(
+                f"CREATE TEMP TABLE new_names AS "
+                f"SELECT * FROM current_names EXCEPT SELECT {COLUMNS} FROM main.{CONTENT_TABLE}"
+            )
+            deleted = conn.execute(
+                f"DELETE FROM main.{CONTENT_TABLE} WHERE ({COLUMNS}) IN (SELECT * FROM stale_names)"
+            ).rowcount
+            inserted = conn.execute(
+                f"INSERT INTO main.{CONTENT_TABLE} ({COLUMNS}) SELECT * FROM new_names ORDER BY 1, 2, 3, 4, 5"
+            ).rowcount
+            for table in ("current_names", "stale_names", "new_names"):
+                conn.execute(f"DROP TABLE temp.{table}")
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        if deleted or inserted:
+            # Merge the b-trees the incremental changes added.
+            for table in (CJK_TABLE, PINYIN_TABLE):
+                conn.execute(f"INSERT INTO {table}({table}) VALUES ('optimize')")
+    finally:
+        conn.close()
+    logger.info(
+        "%s refreshed: %d names removed, %d names added in %.2f s",
+        CONTENT_TABLE, deleted, inserted, time.perf_counter() - started,
+    )
+    return deleted, inserted
+
+
+def _phrase(text: str) -> str:
+    return '"' + text.replace('"', '""') + '"'
+
+
+class NameSearch:
+    """
+    Read-only name lookups for search boxes and autocomplete.  Keep one
+    instance per thread and reuse it: the connection caches its prepared
+    statements.
+
+    Text containing Chinese characters is matched against the Chinese names:
+    as a substring from three characters on, as a name prefix below that.
+    Other text is matched against the romanised names word by word, the last
+    word as a prefix, so "wang ans" finds "Wang Anshi".  Exact matches come
+    first, then prefix matches, then shorter names.
+    """
+
+    def __init__(self, db_path: str | Path):
+        db_path = Path(db_path)
+        if not db_path.exists():
+            raise FileNotFoundError(f"Database file not found: {db_path}")
+        self.conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+        if CONTENT_TABLE not in _list_tables(self.conn):
+            self.conn.close()
+            raise LookupError(f"{CONTENT_TABLE} not found in {db_path}, run `create_name_search.py build` first")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "NameSearch":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def search(self, text: str, entity: Optional[str] = None, limit: int = DEFAULT_LIMIT) -> List[Match]:
+        text = text.strip()
+        if entity is not None and entity not in ENTITIES:
+            raise ValueError(f"Unknown entity {entity!r}, expected one of {ENTITIES}")
+        entity_filter = "" if entity is None else "AND n.c_entity = :entity"
+        params = {"text": text, "entity": entity, "limit": limit}
+
+        if _CJK_RE.search(text):
+            column = "c_name_chn"
+            if len(text) >= TRIGRAM_MIN_CHARS:
+                source = f"{CJK_TABLE} f JOIN {CONTENT_TABLE} n ON n.id = f.rowid"
+                where = f"{CJK_TABLE} MATCH :query"
+                params["query"] = _phrase(text)
+            else:
+                # U+10FFFF sorts after every other character, bounding the prefix range.
+                source = f"{CONTENT_TABLE} n"
+                where = "n.c_name_chn >= :text AND n.c_name_chn < :text || char(1114111)"
+        else:
+            words = _WORD_RE.findall(text.lower())
+            if not words:
+                return []
+            column = "c_name"
+            source = f"{PINYIN_TABLE} f JOIN {CONTENT_TABLE} n ON n.id = f.rowid"
+            where = f"{PINYIN_TABLE} MATCH :query"
+            params["query"] = " ".join(_phrase(word) for word in words) + "*"
+
+        rows = self.conn.execute(
+            f"""
+            SELECT n.c_entity, n.c_entity_id, n.c_source, n.c_name_chn, n.c_name
+            FROM {source}
+            WHERE {where} {entity_filter}
+            ORDER BY n.{column} = :text COLLATE NOCASE DESC,
+                     substr(n.{column}, 1, length(:text)) = :text COLLATE NOCASE DESC,
+                     length(n.{column}), n.id
+            LIMIT :limit
+            """,
+            params,
+        )
+        return [Match(*row) for row in rows]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the FTS5 name indexes of a CBDB database.")
+    parser.add_argument(
+        "--db",
+        default="latest.db",
+        type=Path,
+        help="Path to the SQLite database (default: latest.db).",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help=f"(Re)build {CONTENT_TABLE} and its FTS5 indexes from scratch.")
+    subparsers.add_parser("refresh", help="Apply the name changes of the source tables since the last build.")
+    search = subparsers.add_parser("search", help="Look up people, places and texts by name.")
+    search.add_argument("text", help="Chinese characters or romanised words; the last word may be incomplete.")
+    search.add_argument("--entity", choices=ENTITIES, help="Only return this kind of entity.")
+    search.add_argument("--limit", type=int, default=DEFAULT_LIMIT, help=f"Maximum results (default: {DEFAULT_LIMIT}).")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_name_search(args.db)
+    elif args.command == "refresh":
+        refresh_name_search(args.db)
+    else:
+        with NameSearch(args.db) as index:
+            matches = index.search(args.text, args.entity, args.limit)
+        print(f"{'entity':7}  {'id':>9}  {'source':13}  name")
+        for match in matches:
+            print(f"{match.c_entity:7}  {match.c_entity_id:>9}  {match.c_source:13}  {match.c_name_chn}  {match.c_name}")
+        print(f"{len(matches)} match(es)")
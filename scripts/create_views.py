@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Create the CBDB convenience views in a single connection and transaction.
+
+The view definitions are read from the heredocs in create_views.sh, which stays
+the single source of truth, so the sqlite3 CLI is not required.  All views are
+created inside one transaction; every view is then compiled with EXPLAIN and
+the transaction is rolled back if any of them fails, leaving the database
+unchanged.
+
+Usage:
+    python create_views.py [--db DB_PATH] [--count]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import sqlite_profiles
+
+VIEWS_SCRIPT = Path(__file__).with_name("create_views.sh")
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+_HEREDOC_RE = re.compile(r"<<'SQL'\n(.*?)\nSQL\n", re.DOTALL)
+_CREATE_VIEW_RE = re.compile(
+    r'(?i)^\s*CREATE\s+VIEW\s+(?:IF\s+NOT\s+EXISTS\s+)?["`\[]?(\w+)["`\]]?\s+AS\b'
+)
+
+
+def split_statements(sql: str) -> List[str]:
+    """Split an SQL script into complete statements."""
+    statements = []
+    pending = ""
+    for line in sql.splitlines(keepends=True):
+        pending += line
+        if sqlite3.complete_statement(pending):
+            statements.append(pending.strip())
+            pending = ""
+    if pending.strip():
+        statements.append(pending.strip())
+    return statements
+
+
+def load_view_definitions(script: str | Path = VIEWS_SCRIPT) -> Dict[str, str]:
+    """
+    Return {view_name: "CREATE VIEW ..." statement} in the order create_views.sh
+    creates them.  The DROP VIEW statements of the heredocs are not included.
+    """
+    content = Path(script).read_text(encoding="utf-8")
+    views: Dict[str, str] = {}
+    for block in _HEREDOC_RE.findall(content):
+        for statement in split_statements(block):
+            match = _CREATE_VIEW_RE.match(statement)
+            if match:
+                views[match.group(1)] = statement
+    if not views:
+        raise ValueError(f"No CREATE VIEW statements found in {script}")
+    return views
+
+
+def _print_timings(title: str, timings: Dict[str, float]) -> None:
+    name_width = max(len(name) for name in timings)
+    logger.info(title)
+    for name, seconds in timings.items():
+        logger.info("  %-*s  %8.3f s", name_width, name, seconds)
+
+
+def create_views(
+    db_path: str | Path,
+    script: str | Path = VIEWS_SCRIPT,
+    count: bool = False,
+    profile: str = "bulk",
+    timeout: float = 5.0,
+) -> Dict[str, float]:
+    """
+    (Re)create every view of create_views.sh in *db_path* and return the
+    per-view creation time in seconds.  With *count*, also run the row-count
+    sanity check of create_views.sh on each view once committed.  *profile*
+    selects the sqlite_profiles connection settings; *timeout* is how long to
+    wait for another writer, in seconds.
+    """
+    views = load_view_definitions(script)
+    logger.info("Loaded %d view definitions from %s", len(views), script)
+
+    conn = sqlite_profiles.connect(db_path, profile, timeout=timeout, isolation_level=None)
+    try:
+        timings: Dict[str, float] = {}
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for name, create_sql in views.items():
+                started = time.perf_counter()
+                conn.execute(f'DROP VIEW IF EXISTS "{name}"')
+                conn.execute(create_sql)
+                timings[name] = time.perf_counter() - started
+
+            # Views may refer to views created after them, so compile each one
+            # only once all of them exist.
+            for name in views:
+                started = time.perf_counter()
+                try:
+                    conn.execute(f'EXPLAIN SELECT * FROM "{name}"').fetchall()
+                except sqlite3.Error as exc:
+                    raise sqlite3.Error(f"View {name} failed to compile: {exc}") from exc
+                timings[name] += time.perf_counter() - started
+        except Exception:
+            conn.execute("ROLLBACK")
+            logger.error("View creation rolled back; the database is unchanged.")
+            raise
+        conn.execute("COMMIT")
+        _print_timings(f"Created {len(views)} views:", timings)
+
+        if count:
+            # Mirrors the sanity check in create_views.sh.
+            conn.execute("PRAGMA mmap_size=0")
+            count_timings: Dict[str, float] = {}
+            for name in views:
+                started = time.perf_counter()
+                rows = conn.execute(f'SELECT COUNT(*) FROM "{name}"').fetchone()[0]
+                count_timings[name] = time.perf_counter() - started
+                logger.info("  ✓ %s: %d rows", name, rows)
+            _print_timings("Sanity counts:", count_timings)
+
+        return timings
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Create CBDB convenience views without the sqlite3 CLI."
+    )
+    parser.add_argument(
+        "--db",
+        default="latest.db",
+        type=Path,
+        help="Path to the SQLite database (default: latest.db).",
+    )
+    parser.add_argument(
+        "--script",
+        default=VIEWS_SCRIPT,
+        type=Path,
+        help="Shell script holding the view definitions (default: create_views.sh).",
+    )
+    parser.add_argument(
+        "--count",
+        action="store_true",
+        help="Run a COUNT(*) sanity check on every view after creating it.",
+    )
+    args = parser.parse_args()
+    if not args.db.is_file():
+        parser.error(f"database file '{args.db}' does not exist.")
+    create_views(args.db, args.script, args.count)
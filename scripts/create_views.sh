@@ -19,8 +19,8 @@ if [[ ! -f "$DB_PATH" ]]; then
 fi
 
 if ! command -v sqlite3 >/dev/null 2>&1; then
-    echo "Error: sqlite3 is required but not installed or not on PATH." >&2
-    exit 1
+    echo "sqlite3 not found on PATH; creating views with create_views.py instead." >&2
+    exec python3 "$(dirname "${BASH_SOURCE[0]}")/create_views.py" --db "$DB_PATH" --count
 fi
 
 # View_AltnameData: joins alternate names with their type code and source text
@@ -0,0 +1,625 @@
+#!/usr/bin/env python3
+"""
+Serve per-person dossiers from the CBDB convenience views.
+
+A dossier is the rows of
+
+    View_PeopleData, View_AltnameData, View_AssociationData,
+    View_BiogAddrData, View_EntryData, View_PostingOfficeData
+
+for one c_personid.  DossierService keeps a pool of read-only connections
+opened with ``mode=ro&immutable=1`` (no file locking or change detection),
+each caching the prepared statement of every view query, and runs the six
+queries of a dossier concurrently on the pool.  Assembled dossiers are kept
+in an LRU cache with a time-to-live.  The cache belongs to one release: it is
+emptied, and the pool reopened, when the sha256 published in latest.json or
+the database file itself changes.  A background thread looks for such changes,
+so lookups never wait on latest.json.
+
+Because of immutable=1 the database must not be modified in place while it
+is served: write updates to a new file (``release_patch.py apply --output``)
+and move it over the old one, which the service picks up on its next
+release check.
+
+Usage:
+    python dossier_service.py [--db DB_PATH] [--latest-json PATH_OR_URL] get PERSON_ID
+    python dossier_service.py [--db DB_PATH] [--latest-json PATH_OR_URL] serve [--host HOST] [--port PORT]
+    python dossier_service.py [--db DB_PATH] bench [--requests N] [--clients N] [--ids N] [--no-cache]
+                              [--naive | --http]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import queue
+import random
+import re
+import sqlite3
+import statistics
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from functools import partial
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.error import HTTPError
+from urllib.parse import urlsplit
+from urllib.request import urlopen
+
+from create_views import load_view_definitions
+from download_release import fetch_release_info
+from index_advisor import full_scan, plan_lookup, quote_identifier, sample_person_ids, view_aliases
+
+DOSSIER_VIEWS = (
+    "View_PeopleData",
+    "View_AltnameData",
+    "View_AssociationData",
+    "View_BiogAddrData",
+    "View_EntryData",
+    "View_PostingOfficeData",
+)
+LOOKUP_COLUMN = "c_personid"
+
+DEFAULT_POOL_SIZE = len(DOSSIER_VIEWS)
+DEFAULT_CACHE_SIZE = 1024
+DEFAULT_TTL = 300.0
+# Seconds between two looks at latest.json and the database file.
+DEFAULT_RELEASE_CHECK = 30.0
+# Seconds to wait for a latest.json URL before keeping the current release.
+RELEASE_FETCH_TIMEOUT = 10.0
+DEFAULT_PORT = 8023
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+Dossier = Dict[str, Any]
+
+_PERSON_PATH_RE = re.compile(r"^/person/(-?\d+)/?$")
+
+
+def view_query(view: str) -> str:
+    return f"SELECT * FROM {quote_identifier(view)} WHERE {LOOKUP_COLUMN} = ?"
+
+
+def fetch_rows(conn: sqlite3.Connection, view: str, person_id: int) -> List[Dict[str, Any]]:
+    cursor = conn.execute(view_query(view), (person_id,))
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor]
+
+
+def release_sha256(latest_json: str, timeout: float = RELEASE_FETCH_TIMEOUT) -> Optional[str]:
+    """The sha256 published in *latest_json*, a local path or a URL."""
+    if urlsplit(latest_json).scheme in ("http", "https", "file"):
+        info = fetch_release_info(latest_json, timeout)
+    else:
+        info = json.loads(Path(latest_json).read_text(encoding="utf-8"))
+    return info.get("sha256", "").lower() or None
+
+
+class ConnectionPool:
+    """
+    A fixed number of read-only connections to one database file, handed out
+    one at a time.  A request holds a lease on the pool for as long as it
+    uses it, so a retired pool is only closed once the last request is done.
+    """
+
+    def __init__(self, db_path: str | Path, size: int = DEFAULT_POOL_SIZE, views: Tuple[str, ...] = DOSSIER_VIEWS):
+        db_path = Path(db_path)
+        if not db_path.exists():
+            raise FileNotFoundError(f"Database file not found: {db_path}")
+        if size < 1:
+            raise ValueError("The pool needs at least one connection")
+        self.db_path = db_path
+        self.size = size
+        self._idle: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._leases = 0
+        self._retired = False
+        try:
+            for _ in range(size):
+                conn = sqlite3.connect(
+                    f"{db_path.resolve().as_uri()}?mode=ro&immutable=1", uri=True, check_same_thread=False
+                )
+                self._connections.append(conn)
+                # Running each query once prepares it into the connection's statement cache.
+                for view in views:
+                    try:
+                        conn.execute(view_query(view), (None,)).fetchall()
+                    except sqlite3.OperationalError as exc:
+                        raise LookupError(
+                            f"{view} is not usable in {db_path} ({exc}), run `create_views.py` first"
+                        ) from exc
+                self._idle.put(conn)
+        except BaseException:
+            self.close()
+            raise
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._idle.get()
+        try:
+            yield conn
+        finally:
+            self._idle.put(conn)
+
+    def lease(self) -> bool:
+        """Keep the pool open until release(); False if it has been retired."""
+        with self._lock:
+            if self._retired:
+                return False
+            self._leases += 1
+            return True
+
+    def release(self) -> None:
+        with self._lock:
+            self._leases -= 1
+            idle = self._retired and not self._leases
+        if idle:
+            self.close()
+
+    def retire(self) -> None:
+        """Take no new leases, and close the pool as soon as the current ones are released."""
+        with self._lock:
+            self._retired = True
+            idle = not self._leases
+        if idle:
+            self.close()
+
+    def close(self) -> None:
+        for conn in self._connections:
+            conn.close()
+        self._connections = []
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries also expire *ttl* seconds after they were stored."""
+
+    def __init__(self, size: int = DEFAULT_CACHE_SIZE, ttl: float = DEFAULT_TTL):
+        self.size = size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Any, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Any) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, key: Any, value: Any) -> None:
+        if self.size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "size": self.size, "hits": self.hits, "misses": self.misses}
+
+
+class DossierService:
+    """
+    Pooled, cached dossier lookups.  One instance is shared by all threads.
+
+    The release is identified by the sha256 of *latest_json* (a path or URL,
+    optional) together with the inode, size and mtime of the database file,
+    and is looked at again every *release_check* seconds by a daemon thread
+    (none if *release_check* is 0).  Lookups only read the current state.
+    """
+
+    def __init__(
+        self,
+        db_path: str | Path,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        cache_size: int = DEFAULT_CACHE_SIZE,
+        ttl: float = DEFAULT_TTL,
+        latest_json: Optional[str] = None,
+        release_check: float = DEFAULT_RELEASE_CHECK,
+        views: Tuple[str, ...] = DOSSIER_VIEWS,
+    ):
+        self.db_path = Path(db_path)
+        self.pool_size = pool_size
+        self.latest_json = latest_json
+        self.release_check = release_check
+        self.views = views
+        self.cache = TTLCache(cache_size, ttl)
+        self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="dossier")
+        self._release_lock = threading.Lock()
+        self.release: Optional[str] = None
+        self._file_id: Optional[Tuple[int, int, int]] = None
+        self.pool: Optional[ConnectionPool] = None
+        self.check_release()
+        self._warn_about_scans()
+        self._stopped = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        if release_check > 0:
+            self._watcher = threading.Thread(target=self._watch_release, name="dossier-release", daemon=True)
+            self._watcher.start()
+
+    def close(self) -> None:
+        self._stopped.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        self._executor.shutdown(wait=True)
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def __enter__(self) -> "DossierService":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _file_identity(self) -> Tuple[int, int, int]:
+        stat = self.db_path.stat()
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _watch_release(self) -> None:
+        while not self._stopped.wait(self.release_check):
+            try:
+                self.check_release()
+            except Exception:
+                # A missing or unreadable file now may be back by the next check.
+                logger.exception("Release check failed, keeping release %s", self.release)
+
+    def check_release(self) -> None:
+        """Reopen the pool and empty the cache if the release or the database file changed."""
+        release = self.release
+        if self.latest_json:
+            # Read outside the lock: a slow latest.json only delays the next check.
+            try:
+                release = release_sha256(self.latest_json)
+            except (OSError, ValueError) as exc:
+                logger.warning("Could not read %s, keeping release %s: %s", self.latest_json, release, exc)
+        with self._release_lock:
+            file_id = self._file_identity()
+            if self.pool is None or file_id != self._file_id:
+                old_pool = self.pool
+                self.pool = ConnectionPool(self.db_path, self.pool_size, self.views)
+                self._file_id = file_id
+                if old_pool is not None:
+                    logger.info("%s changed, reopened the connection pool", self.db_path)
+                    # Requests still running on the old pool finish there; the last one closes it.
+                    old_pool.retire()
+                self.cache.clear()
+            if release != self.release:
+                if self.release is not None:
+                    logger.info("Release changed from %s to %s, cache emptied", self.release, release)
+                self.release = release
+                self.cache.clear()
+
+    def _warn_about_scans(self) -> None:
+        definitions = load_view_definitions()
+        with self.pool.connection() as conn:
+            for view in self.views:
+                # The plan names a table by its alias in the view, when it has one.
+                aliases = view_aliases(view, definitions) if view in definitions else {}
+                scans = [
+                    aliases.get(alias or table, table)
+                    for table, alias in filter(None, map(full_scan, plan_lookup(conn, view)))
+                ]
+                if scans:
+                    logger.warning(
+                        "%s scans %s for every lookup; run `index_advisor.py --create` to index it",
+                        view,
+                        ", ".join(scans),
+                    )
+
+    def _fetch(self, pool: ConnectionPool, view: str, person_id: int) -> List[Dict[str, Any]]:
+        with pool.connection() as conn:
+            return fetch_rows(conn, view, person_id)
+
+    def dossier(self, person_id: int) -> Optional[Dossier]:
+        """The dossier of *person_id*, or None if View_PeopleData has no row for it."""
+        key = (self.release, self._file_id, person_id)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        pool = self.pool
+        while not pool.lease():
+            # Retired by check_release since it was read; self.pool is its successor.
+            pool = self.pool
+        try:
+            futures = {view: self._executor.submit(self._fetch, pool, view, person_id) for view in self.views}
+            rows = {view: future.result() for view, future in futures.items()}
+        finally:
+            pool.release()
+        if not rows[self.views[0]]:
+            return None
+        dossier = {LOOKUP_COLUMN: person_id, "release": self.release, "views": rows}
+        self.cache.put(key, dossier)
+        return dossier
+
+    def health(self) -> Dict[str, Any]:
+        return {
+            "db": str(self.db_path),
+            "release": self.release,
+            "pool_size": self.pool_size,
+            "cache": self.cache.stats(),
+        }
+
+
+def naive_dossier(db_path: str | Path, person_id: int, views: Tuple[str, ...] = DOSSIER_VIEWS) -> Optional[Dossier]:
+    """A dossier the plain way, for comparison: a new connection, one query after another."""
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        rows = {view: fetch_rows(conn, view, person_id) for view in views}
+    finally:
+        conn.close()
+    if not rows[views[0]]:
+        return None
+    return {LOOKUP_COLUMN: person_id, "release": None, "views": rows}
+
+
+def _to_json(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, default=str).encode("utf-8")
+
+
+def make_server(service: DossierService, host: str = "127.0.0.1", port: int = DEFAULT_PORT) -> ThreadingHTTPServer:
+    """HTTP front end: GET /person/<c_personid> and GET /health, both answering JSON."""
+
+    class DossierHandler(BaseHTTPRequestHandler):
+        def _send(self, status: HTTPStatus, body: bytes, etag: Optional[str] = None) -> None:
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            if etag is not None:
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            path = urlsplit(self.path).path
+            if path == "/health":
+                self._send(HTTPStatus.OK, _to_json(service.health()))
+                return
+            match = _PERSON_PATH_RE.match(path)
+            if match is None:
+                self._send(HTTPStatus.NOT_FOUND, _to_json({"error": "expected /person/<c_personid> or /health"}))
+                return
+            person_id = int(match.group(1))
+            try:
+                dossier = service.dossier(person_id)
+            except (sqlite3.Error, LookupError) as exc:
+                logger.error("Dossier %d failed: %s", person_id, exc)
+                self._send(HTTPStatus.INTERNAL_SERVER_ERROR, _to_json({"error": str(exc)}))
+                return
+            if dossier is None:
+                self._send(HTTPStatus.NOT_FOUND, _to_json({"error": f"no person {person_id}"}))
+                return
+            body = _to_json(dossier)
+            self._send(HTTPStatus.OK, body, etag='"' + hashlib.sha1(body).hexdigest() + '"')
+
+        def log_message(self, format: str, *args) -> None:
+            logger.debug("%s - " + format, self.address_string(), *args)
+
+    server = ThreadingHTTPServer((host, port), DossierHandler)
+    server.daemon_threads = True
+    return server
+
+
+@contextmanager
+def serving(service: DossierService, host: str = "127.0.0.1") -> Iterator[str]:
+    """Run make_server on an ephemeral port in a background thread and yield its base URL."""
+    server = make_server(service, host, 0)
+    thread = threading.Thread(target=server.serve_forever, name="dossier-http", daemon=True)
+    thread.start()
+    try:
+        yield f"http://{host}:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+
+def http_dossier(base_url: str, person_id: int) -> Optional[Dossier]:
+    """GET /person/<person_id> from a dossier server; None if it answers 404."""
+    try:
+        with urlopen(f"{base_url}/person/{person_id}") as response:
+            return json.loads(response.read())
+    except HTTPError as exc:
+        exc.close()
+        if exc.code == HTTPStatus.NOT_FOUND:
+            return None
+        raise
+
+
+def load_test(
+    db_path: str | Path,
+    requests: int = 5000,
+    clients: int = 8,
+    distinct_ids: int = 1000,
+    cache: bool = True,
+    naive: bool = False,
+    pool_size: int = DEFAULT_POOL_SIZE,
+    seed: int = 1,
+    http: bool = False,
+) -> Dict[str, float]:
+    """
+    Send *requests* dossier lookups from *clients* threads, drawn at random
+    from *distinct_ids* people, and return latency percentiles in
+    milliseconds together with the throughput.  With *http* the lookups go
+    through make_server on an ephemeral port, one connection per request.
+    """
+    if naive and http:
+        raise ValueError("The naive lookups have no HTTP front end")
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        ids = sample_person_ids(conn, distinct_ids)
+    finally:
+        conn.close()
+    if not ids:
+        raise ValueError(f"No people in {db_path}")
+    rng = random.Random(seed)
+    workload = [rng.choice(ids) for _ in range(requests)]
+    latencies: List[float] = []
+
+    service = None if naive else DossierService(db_path, pool_size, DEFAULT_CACHE_SIZE if cache else 0)
+
+    def client(lookup: Callable[[int], Optional[Dossier]], person_ids: List[int]) -> List[float]:
+        timings = []
+        for person_id in person_ids:
+            started = time.perf_counter()
+            lookup(person_id)
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    try:
+        with ExitStack() as stack:
+            if naive:
+                lookup = partial(naive_dossier, db_path)
+            elif http:
+                lookup = partial(http_dossier, stack.enter_context(serving(service)))
+            else:
+                lookup = service.dossier
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=clients) as executor:
+                shards = [workload[i::clients] for i in range(clients)]
+                for timings in executor.map(partial(client, lookup), shards):
+                    latencies.extend(timings)
+            elapsed = time.perf_counter() - started
+    finally:
+        if service is not None:
+            service.close()
+
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    return {
+        "requests": requests,
+        "clients": clients,
+        "p50_ms": percentiles[49] * 1000,
+        "p90_ms": percentiles[89] * 1000,
+        "p99_ms": percentiles[98] * 1000,
+        "max_ms": max(latencies) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+        "requests_per_s": requests / elapsed,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve and load-test per-person dossiers from the CBDB views.")
+    parser.add_argument(
+        "--db",
+        default="latest.db",
+        type=Path,
+        help="Path to the SQLite database (default: latest.db).",
+    )
+    parser.add_argument(
+        "--latest-json",
+        help="Path or URL of the latest.json whose sha256 identifies the release (default: the database file only).",
+    )
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=DEFAULT_POOL_SIZE,
+        help=f"Read-only connections, and concurrent view queries (default: {DEFAULT_POOL_SIZE}).",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        default=DEFAULT_CACHE_SIZE,
+        help=f"Dossiers kept in the cache, 0 to disable it (default: {DEFAULT_CACHE_SIZE}).",
+    )
+    parser.add_argument(
+        "--ttl",
+        type=float,
+        default=DEFAULT_TTL,
+        help=f"Seconds a cached dossier stays valid (default: {DEFAULT_TTL:g}).",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    get = subparsers.add_parser("get", help="Print the dossier of one person as JSON.")
+    get.add_argument("person_id", type=int, help="c_personid of the person.")
+    serve = subparsers.add_parser("serve", help="Answer GET /person/<c_personid> and GET /health over HTTP.")
+    serve.add_argument("--host", default="127.0.0.1", help="Address to listen on (default: 127.0.0.1).")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port to listen on (default: {DEFAULT_PORT}).")
+    serve.add_argument(
+        "--release-check",
+        type=float,
+        default=DEFAULT_RELEASE_CHECK,
+        help=f"Seconds between background checks of latest.json and the database file, 0 to never check again "
+        f"(default: {DEFAULT_RELEASE_CHECK:g}).",
+    )
+    bench = subparsers.add_parser("bench", help="Load-test dossier lookups and report p50/p90/p99 latencies.")
+    bench.add_argument("--requests", type=int, default=5000, help="Lookups in total (default: 5000).")
+    bench.add_argument("--clients", type=int, default=8, help="Concurrent client threads (default: 8).")
+    bench.add_argument("--ids", type=int, default=1000, help="Distinct people drawn from (default: 1000).")
+    bench.add_argument("--no-cache", action="store_true", help="Disable the dossier cache.")
+    lookups = bench.add_mutually_exclusive_group()
+    lookups.add_argument(
+        "--naive",
+        action="store_true",
+        help="Open a connection per lookup and run the view queries one after another, for comparison.",
+    )
+    lookups.add_argument(
+        "--http",
+        action="store_true",
+        help="Send the lookups through the HTTP front end on an ephemeral local port.",
+    )
+    args = parser.parse_args()
+    if not args.db.is_file():
+        parser.error(f"database file '{args.db}' does not exist.")
+
+    if args.command == "bench":
+        if args.requests < 2:
+            parser.error("--requests must be at least 2.")
+        result = load_test(
+            args.db, args.requests, args.clients, args.ids, not args.no_cache, args.naive, args.pool_size,
+            http=args.http,
+        )
+        mode = "naive" if args.naive else "pooled" + ("" if args.no_cache else " + cache")
+        if args.http:
+            mode += " over HTTP"
+        logger.info("%d requests, %d clients, %s:", result["requests"], result["clients"], mode)
+        for name in ("p50_ms", "p90_ms", "p99_ms", "max_ms", "mean_ms"):
+            logger.info("  %-8s %9.2f", name, result[name])
+        logger.info("  %-8s %9.1f", "req/s", result["requests_per_s"])
+    else:
+        service = DossierService(
+            args.db,
+            args.pool_size,
+            args.cache_size,
+            args.ttl,
+            args.latest_json,
+            getattr(args, "release_check", DEFAULT_RELEASE_CHECK),
+        )
+        try:
+            if args.command == "get":
+                dossier = service.dossier(args.person_id)
+                if dossier is None:
+                    parser.exit(1, f"No person with c_personid {args.person_id}.\n")
+                print(json.dumps(dossier, ensure_ascii=False, indent=2, default=str))
+            else:
+                server = make_server(service, args.host, args.port)
+                logger.info("Serving %s on http://%s:%d/person/<c_personid>", args.db, args.host, args.port)
+                try:
+                    server.serve_forever()
+                except KeyboardInterrupt:
+                    pass
+                finally:
+                    server.server_close()
+        finally:
+            service.close()
@@ -0,0 +1,362 @@
+#!/usr/bin/env python3
+"""
+Download the latest CBDB SQLite release and verify it against latest.json.
+
+The archive is streamed to disk and hashed while it downloads.  A dropped
+transfer, or a transient HTTP error (408, 429 or 5xx), resumes from where it
+stopped with an HTTP Range request instead of starting over, and an
+interrupted run leaves a .part file that the next run continues.  The database member is then streamed out of the zip straight to
+its target path, hashing it on the way, and the sha256 published in
+latest.json is checked against the archive or the extracted database.
+
+With --update, an existing database is brought up to date instead: if
+latest.json carries a "patch" entry made for it (see release_patch.py),
+only the patch is downloaded and applied; otherwise the full release is
+downloaded and replaces it.
+
+Usage:
+    python download_release.py [--db DB_PATH] [--latest-json URL] [--keep-archive]
+    python download_release.py --update [--db DB_PATH] [--latest-json URL]
+    python download_release.py --url URL --output PATH
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import http.client
+import json
+import logging
+import os
+import shutil
+import time
+import urllib.error
+import urllib.request
+import zipfile
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import release_patch
+
+LATEST_JSON_URL = "https://raw.githubusercontent.com/cbdb-project/cbdb_sqlite/master/latest.json"
+
+CHUNK_SIZE = 1 << 20
+DEFAULT_RETRIES = 10
+FETCH_TIMEOUT = 60.0
+# Client errors that a retry can cure; every 5xx is retried as well.
+TRANSIENT_STATUS = (408, 429)
+DATABASE_SUFFIXES = (".db", ".sqlite3", ".sqlite")
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def fetch_release_info(url: str = LATEST_JSON_URL, timeout: float = FETCH_TIMEOUT) -> Dict[str, str]:
+    logger.info("Fetching %s", url)
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return json.loads(response.read().decode("utf-8"))
+
+
+def _is_transient(exc: Exception) -> bool:
+    """True for connection errors and for HTTP statuses worth retrying."""
+    if isinstance(exc, urllib.error.HTTPError):
+        return exc.code in TRANSIENT_STATUS or exc.code >= 500
+    return True
+
+
+def _hash_file(path: Path, hasher) -> None:
+    with path.open("rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+
+
+def _open_range(url: str, offset: int, timeout: float) -> Tuple[http.client.HTTPResponse, int, Optional[int]]:
+    """
+    Request *url* from byte *offset*.  Returns the response, the offset the
+    body actually starts at (0 if the server ignored the Range header) and the
+    total size if known.
+    """
+    request = urllib.request.Request(url)
+    if offset:
+        request.add_header("Range", f"bytes={offset}-")
+    response = urllib.request.urlopen(request, timeout=timeout)
+    if response.status == 206:
+        # Content-Range: bytes <start>-<end>/<total>
+        span, _, total = response.headers.get("Content-Range", "").partition("/")
+        start = int(span.split()[-1].split("-")[0])
+        return response, start, int(total) if total.isdigit() else None
+    length = response.headers.get("Content-Length")
+    return response, 0, int(length) if length and length.isdigit() else None
+
+
+class _Progress:
+    def __init__(self, label: str):
+        self.label = label
+        self.next_report = 0.0
+
+    def update(self, done: int, total: Optional[int]) -> None:
+        if not total:
+            return
+        percent = done * 100 / total
+        if percent >= self.next_report or done == total:
+            logger.info("  %s: %5.1f%%  (%.1f / %.1f MB)", self.label, percent, done / 1e6, total / 1e6)
+            self.next_report = percent + 10
+
+
+def download(
+    url: str,
+    destination: str | Path,
+    retries: int = DEFAULT_RETRIES,
+    timeout: float = 60.0,
+) -> str:
+    """
+    Download *url* to *destination* and return its SHA-256.  Bytes are written to
+    <destination>.part and hashed as they arrive; on a dropped connection or a
+    transient HTTP error the transfer resumes from the current size, up to
+    *retries* times in a row.  Other HTTP errors are raised at once.
+    """
+    destination = Path(destination)
+    partial = destination.with_name(destination.name + ".part")
+    hasher = hashlib.sha256()
+    if partial.exists():
+        # Rehash what a previous run already fetched; only the rest is downloaded.
+        _hash_file(partial, hasher)
+        logger.info("Resuming %s at %.1f MB", destination.name, partial.stat().st_size / 1e6)
+
+    progress = _Progress(destination.name)
+    failures = 0
+    # Only a transfer that gets further than any before it resets the retry budget.
+    furthest = 0
+    while True:
+        offset = partial.stat().st_size if partial.exists() else 0
+        try:
+            try:
+                response, start, total = _open_range(url, offset, timeout)
+            except urllib.error.HTTPError as exc:
+                if exc.code == 416 and offset:
+                    # Nothing left to fetch: the partial file is already complete.
+                    break
+                raise
+            with response:
+                if start != offset:
+                    logger.info("  server ignored the Range request; restarting %s", destination.name)
+                    hasher = hashlib.sha256()
+                    offset = 0
+                with partial.open("r+b" if offset else "wb") as handle:
+                    handle.seek(offset)
+                    handle.truncate()
+                    done = offset
+                    for chunk in iter(lambda: response.read(CHUNK_SIZE), b""):
+                        handle.write(chunk)
+                        hasher.update(chunk)
+                        done += len(chunk)
+                        if done > furthest:
+                            furthest = done
+                            failures = 0
+                        progress.update(done, total)
+            if total is not None and done < total:
+                raise http.client.IncompleteRead(b"", total - done)
+            break
+        except (OSError, http.client.HTTPException) as exc:
+            if not _is_transient(exc):
+                raise
+            failures += 1
+            if failures > retries:
+                raise
+            delay = min(2 ** (failures - 1), 60)
+            logger.warning("  transfer interrupted (%s); resuming in %d s", exc, delay)
+            time.sleep(delay)
+
+    os.replace(partial, destination)
+    return hasher.hexdigest()
+
+
+def extract_database(archive: str | Path, target: str | Path, member: Optional[str] = None) -> str:
+    """
+    Stream the database member of the zip *archive* to *target* and return the
+    SHA-256 of the extracted file.  Without *member*, the first entry with a
+    database suffix is used.
+    """
+    target = Path(target)
+    partial = target.with_name(target.name + ".part")
+    with zipfile.ZipFile(archive) as zf:
+        names = zf.namelist()
+        if member is None or member not in names:
+            candidates = [name for name in names if name.lower().endswith(DATABASE_SUFFIXES)]
+            if member is not None:
+                # latest.json names the file, which may sit in a folder inside the zip.
+                candidates = [name for name in candidates if Path(name).name == member] or candidates
+            if not candidates:
+                raise FileNotFoundError(f"No database file found in {archive}")
+            member = candidates[0]
+        logger.info("Extracting %s -> %s", member, target)
+        hasher = hashlib.sha256()
+        with zf.open(member) as source, partial.open("wb") as handle:
+            for chunk in iter(lambda: source.read(CHUNK_SIZE), b""):
+                handle.write(chunk)
+                hasher.update(chunk)
+    os.replace(partial, target)
+    return hasher.hexdigest()
+
+
+def download_release(
+    target: str | Path,
+    latest_json_url: str = LATEST_JSON_URL,
+    workdir: Optional[str | Path] = None,
+    keep_archive: bool = False,
+) -> Path:
+    """
+    Download the release described by *latest_json_url*, extract its database to
+    *target* and verify the published sha256.  The archive is kept in *workdir*
+    (default: next to *target*) until the database has been verified, so an
+    interrupted run resumes the download.
+    """
+    target = Path(target)
+    info = fetch_release_info(latest_json_url)
+    url = info["huggingface_url"]
+    expected = info.get("sha256", "").lower()
+    logger.info("Release %s, generated %s", info.get("sqlite_filename"), info.get("generated_at_utc"))
+
+    archive = Path(workdir or target.parent) / url.rsplit("/", 1)[-1]
+    archive.parent.mkdir(parents=True, exist_ok=True)
+    started = time.perf_counter()
+    archive_sha = download(url, archive)
+    logger.info("Downloaded %s in %.1f s", archive.name, time.perf_counter() - started)
+
+    if zipfile.is_zipfile(archive):
+        database_sha = extract_database(archive, target, info.get("sqlite_filename"))
+    else:
+        shutil.copyfile(archive, target)
+        database_sha = archive_sha
+
+    if expected and expected not in (archive_sha, database_sha):
+        target.unlink()
+        archive.unlink()
+        raise ValueError(
+            f"sha256 mismatch: latest.json has {expected}, "
+            f"archive is {archive_sha}, database is {database_sha}"
+        )
+    if expected:
+        matched = "archive" if expected == archive_sha else "database"
+        logger.info("✓ sha256 matches the %s (%s)", matched, expected)
+    else:
+        logger.warning("latest.json has no sha256; the download was not verified.")
+
+    if not keep_archive:
+        archive.unlink()
+    size_mb = target.stat().st_size / 1024 / 1024
+    logger.info("Saved to %s  (%.1f MB)", target, size_mb)
+    return target
+
+
+def update_release(
+    target: str | Path,
+    latest_json_url: str = LATEST_JSON_URL,
+    workdir: Optional[str | Path] = None,
+) -> Path:
+    """
+    Bring the database at *target* up to the release described by
+    *latest_json_url*: apply the published patch if it was made for this
+    database, download the full release otherwise.
+    """
+    target = Path(target)
+    info = fetch_release_info(latest_json_url)
+    expected = info.get("sha256", "").lower()
+    hasher = hashlib.sha256()
+    _hash_file(target, hasher)
+    current = hasher.hexdigest()
+    if expected and current == expected:
+        logger.info("%s is already the latest release (%s)", target, info.get("sqlite_filename"))
+        return target
+
+    patch = info.get("patch")
+    applies = False
+    if patch:
+        applies = current == patch["from_sha256"]
+        if not applies:
+            # A database patched before differs from the release files, but its content can still match.
+            logger.info("Computing the logical digest of %s...", target)
+            digest = release_patch.database_digest(target)
+            if digest == patch["digest"]:
+                logger.info("%s already has the content of the latest release (%s)", target, digest)
+                return target
+            applies = digest == patch["from_digest"]
+    if not applies:
+        logger.info("No patch for %s in latest.json; downloading the full release", target)
+        replacement = target.with_name(target.name + ".new")
+        replacement.unlink(missing_ok=True)
+        download_release(replacement, latest_json_url, workdir)
+        os.replace(replacement, target)
+        return target
+
+    patch_file = Path(workdir or target.parent) / patch["url"].rsplit("/", 1)[-1]
+    patch_file.parent.mkdir(parents=True, exist_ok=True)
+    logger.info("Downloading the patch from %s (%.1f MB)", patch["from_sqlite_filename"], patch["size"] / 1e6)
+    patch_sha = download(patch["url"], patch_file)
+    if patch_sha != patch["sha256"]:
+        patch_file.unlink()
+        raise ValueError(f"sha256 mismatch: latest.json has {patch['sha256']} for the patch, download is {patch_sha}")
+    # Patch a copy and swap it in, so readers of *target* never see a half-applied patch.
+    replacement = target.with_name(target.name + ".new")
+    replacement.unlink(missing_ok=True)
+    try:
+        release_patch.apply_patch(patch_file, target, output=replacement, base_verified=True)
+    except BaseException:
+        replacement.unlink(missing_ok=True)
+        raise
+    os.replace(replacement, target)
+    patch_file.unlink()
+    return target
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Download the latest CBDB SQLite release with resume and checksum verification."
+    )
+    parser.add_argument(
+        "--db",
+        default="latest.db",
+        type=Path,
+        help="Where to write the extracted database (default: latest.db).",
+    )
+    parser.add_argument(
+        "--latest-json",
+        default=LATEST_JSON_URL,
+        metavar="URL",
+        help="URL of latest.json (default: master branch on GitHub).",
+    )
+    parser.add_argument(
+        "--workdir",
+        type=Path,
+        help="Directory for the archive while it downloads (default: next to --db).",
+    )
+    parser.add_argument(
+        "--keep-archive",
+        action="store_true",
+        help="Keep the downloaded archive after extraction.",
+    )
+    parser.add_argument(
+        "--update",
+        action="store_true",
+        help="Update an existing --db with the patch in latest.json, or replace it with the full release.",
+    )
+    parser.add_argument(
+        "--url",
+        help="Only download this URL (resumable) to --output and print its sha256.",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="Destination file for --url.",
+    )
+    args = parser.parse_args()
+    if args.url:
+        if not args.output:
+            parser.error("--url requires --output.")
+        print(download(args.url, args.output))
+    elif args.update and args.db.exists():
+        update_release(args.db, args.latest_json, args.workdir)
+    else:
+        if args.db.exists():
+            parser.error(f"'{args.db}' already exists. Move or remove it before downloading, or pass --update.")
+        download_release(args.db, args.latest_json, args.workdir, args.keep_archive)
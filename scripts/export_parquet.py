@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Export CBDB tables and views to Parquet or Arrow files.
+
+Every table, and every view of create_views.sh (created as a temporary view
+if the database does not have it), is streamed with ``fetchmany`` in record
+batches of --batch-rows rows, so memory stays bounded however large the
+result.  Column types follow the declared SQLite types: INTEGER -> int64,
+REAL -> float64, TEXT -> string, BLOB -> binary; values that do not fit their
+column's type (SQLite does not enforce it) are converted where possible and
+written as null otherwise, with a warning.  Code-description columns
+(--dictionary patterns, default ``*_desc`` and ``*_desc_chn``) are
+dictionary-encoded, so readers get them as categoricals.
+
+Several tables are exported in parallel processes, one file each, written to
+<name>.parquet.part (or .arrow.part) and renamed when complete.  The views
+exported this way replace the deprecated ZZZ denormalized tables.
+
+Requires pyarrow (``pip install pyarrow``).
+
+Usage:
+    python export_parquet.py [--db DB_PATH] [--output-dir DIR] [--format parquet|arrow]
+                             [--views] [--tables] [--workers N] [--batch-rows N]
+                             [--compression CODEC] [--dictionary [PATTERN ...]] [NAME ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import fnmatch
+import logging
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # only needed to export; the module can still be imported without it
+    pa = pc = pq = None
+
+from create_views import load_view_definitions
+
+FORMATS = ("parquet", "arrow")
+DEFAULT_BATCH_ROWS = 50000
+DEFAULT_COMPRESSION = "zstd"
+DICTIONARY_PATTERNS = ("*_desc", "*_desc_chn")
+
+_CREATE_VIEW_RE = re.compile(r"(?i)^\s*CREATE\s+VIEW\b")
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def quote_identifier(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("export_parquet.py needs pyarrow: pip install pyarrow")
+
+
+def arrow_type(declared: str) -> "pa.DataType":
+    """Arrow type for a declared SQLite column type, by SQLite's affinity rules."""
+    declared = (declared or "").upper()
+    if "INT" in declared:
+        return pa.int64()
+    if any(word in declared for word in ("CHAR", "CLOB", "TEXT")):
+        return pa.string()
+    if "BLOB" in declared:
+        return pa.binary()
+    if any(word in declared for word in ("REAL", "FLOA", "DOUB")):
+        return pa.float64()
+    # NUMERIC affinity, or an expression without a declared type.
+    return pa.string()
+
+
+def _open(db_path: str | Path) -> sqlite3.Connection:
+    db_path = Path(db_path)
+    if not db_path.exists():
+        raise FileNotFoundError(f"Database file not found: {db_path}")
+    return sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+
+
+def _prepare(conn: sqlite3.Connection, name: str) -> None:
+    """Make *name* selectable: a table or view of the database, else a temporary view of create_views.sh."""
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = ?1 AND type IN ('table', 'view') "
+        "UNION ALL SELECT 1 FROM sqlite_temp_master WHERE name = ?1",
+        (name,),
+    ).fetchone()
+    if exists:
+        return
+    definitions = load_view_definitions()
+    if name not in definitions:
+        raise LookupError(f"{name} is neither a table or view of the database nor a view of create_views.sh")
+    # Views built on other views of the script need those first.
+    for other in definitions:
+        if other != name and re.search(rf"\b{re.escape(other)}\b", definitions[name]):
+            _prepare(conn, other)
+    conn.execute(_CREATE_VIEW_RE.sub("CREATE TEMP VIEW", definitions[name], count=1))
+
+
+def arrow_schema(conn: sqlite3.Connection, name: str, dictionary_patterns: Sequence[str]) -> "pa.Schema":
+    fields = []
+    for _, column, declared, *_ in conn.execute(f"PRAGMA table_info({quote_identifier(name)})"):
+        type_ = arrow_type(declared)
+        if type_ == pa.string() and any(fnmatch.fnmatchcase(column, pattern) for pattern in dictionary_patterns):
+            type_ = pa.dictionary(pa.int32(), pa.string())
+        fields.append(pa.field(column, type_))
+    return pa.schema(fields)
+
+
+def _coerce(value: object, type_: "pa.DataType") -> object:
+    """*value* converted to *type_*; raises ValueError or TypeError if it cannot be."""
+    if pa.types.is_int64(type_):
+        if isinstance(value, int):
+            return value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        if isinstance(value, str):
+            return int(value.strip())
+    elif pa.types.is_float64(type_):
+        if isinstance(value, (int, str)):
+            return float(value)
+    elif pa.types.is_string(type_):
+        if isinstance(value, bytes):
+            return value.decode("utf-8")
+        return str(value)
+    elif pa.types.is_binary(type_):
+        if isinstance(value, str):
+            return value.encode("utf-8")
+        return str(value).encode("utf-8")
+    raise TypeError(f"{type(value).__name__} value {value!r} is not {type_}")
+
+
+class _ColumnBuilder:
+    """Converts one column's values batch by batch; dictionaries grow across batches."""
+
+    def __init__(self, name: str, field: "pa.Field"):
+        self.name = name
+        self.field = field
+        self.dictionary = pa.types.is_dictionary(field.type)
+        self.value_type = field.type.value_type if self.dictionary else field.type
+        self.index: Dict[str, int] = {}
+        self.values: List[str] = []
+        self.lost = 0
+
+    def _holds_text(self, values: Sequence[object]) -> Optional[str]:
+        """The first value of a numeric column that is text and not a number, if any."""
+        for value in values:
+            if value is None or isinstance(value, (int, float)):
+                continue
+            try:
+                _coerce(value, self.value_type)
+            except (ValueError, TypeError):
+                return value
+        return None
+
+    def _plain(self, values: Sequence[object], first: bool) -> "pa.Array":
+        """*values* as an array of the column's (value) type, unconvertible values as null."""
+        try:
+            return pa.array(values, type=self.value_type)
+        except (pa.ArrowInvalid, pa.ArrowTypeError, OverflowError):
+            pass
+        if first and (pa.types.is_int64(self.value_type) or pa.types.is_float64(self.value_type)):
+            # A numeric column holding text in its first batch is exported as text altogether.
+            text = self._holds_text(values)
+            if text is not None:
+                logger.info(
+                    "%s.%s is declared %s but holds %r; exported as string",
+                    self.name, self.field.name, self.value_type, text,
+                )
+                self.field = pa.field(self.field.name, pa.string())
+                self.value_type = pa.string()
+                return self._plain(values, first)
+        converted = []
+        for value in values:
+            if value is not None:
+                try:
+                    value = _coerce(value, self.value_type)
+                    pa.scalar(value, type=self.value_type)
+                except (ValueError, TypeError, UnicodeDecodeError, OverflowError, pa.ArrowInvalid):
+                    self.lost += 1
+                    value = None
+            converted.append(value)
+        return pa.array(converted, type=self.value_type)
+
+    def build(self, values: Sequence[object], first: bool = False) -> "pa.Array":
+        """The next batch of the column; on the *first*, the column's field may still change."""
+        array = self._plain(values, first)
+        if not self.dictionary:
+            return array
+        # Encode the batch, then map its dictionary onto the column's, which only ever grows,
+        # so Arrow files can store each batch's additions as a delta.
+        encoded = array.dictionary_encode()
+        mapping = []
+        for value in encoded.dictionary.to_pylist():
+            position = self.index.get(value)
+            if position is None:
+                position = self.index[value] = len(self.values)
+                self.values.append(value)
+            mapping.append(position)
+        indices = pc.take(pa.array(mapping, pa.int32()), encoded.indices)
+        return pa.DictionaryArray.from_arrays(indices, pa.array(self.values, pa.string()))
+
+
+def export_one(
+    db_path: str | Path,
+    name: str,
+    output_dir: str | Path,
+    fmt: str = "parquet",
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    compression: Optional[str] = DEFAULT_COMPRESSION,
+    dictionary_patterns: Sequence[str] = DICTIONARY_PATTERNS,
+) -> Tuple[str, int, int, float]:
+    """Export table or view *name*; return (name, rows, file bytes, seconds)."""
+    require_pyarrow()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format {fmt!r}, expected one of {FORMATS}")
+    started = time.perf_counter()
+    target = Path(output_dir) / f"{name}.{fmt}"
+    partial = target.with_name(target.name + ".part")
+    conn = _open(db_path)
+    try:
+        _prepare(conn, name)
+        schema = arrow_schema(conn, name, dictionary_patterns)
+        columns = ", ".join(quote_identifier(field.name) for field in schema)
+        cursor = conn.execute(f"SELECT {columns} FROM {quote_identifier(name)}")
+        batch = cursor.fetchmany(batch_rows)
+        builders = [_ColumnBuilder(name, field) for field in schema]
+        arrays = [builder.build(values, first=True) for builder, values in zip(builders, zip(*batch))]
+        schema = pa.schema([builder.field for builder in builders])
+        if fmt == "parquet":
+            writer = pq.ParquetWriter(partial, schema, compression=compression or "none")
+        else:
+            options = pa.ipc.IpcWriteOptions(compression=compression, emit_dictionary_deltas=True)
+            writer = pa.ipc.new_file(str(partial), schema, options=options)
+        rows = 0
+        try:
+            while batch:
+                writer.write_batch(pa.record_batch(arrays, schema=schema))
+                rows += len(batch)
+                batch = cursor.fetchmany(batch_rows)
+                arrays = [builder.build(values) for builder, values in zip(builders, zip(*batch))]
+        finally:
+            writer.close()
+    except BaseException:
+        partial.unlink(missing_ok=True)
+        raise
+    finally:
+        conn.close()
+    os.replace(partial, target)
+    for builder in builders:
+        if builder.lost:
+            logger.warning(
+                "%s.%s: %d value(s) not convertible to %s were written as null",
+                name, builder.field.name, builder.lost, builder.value_type,
+            )
+    return name, rows, target.stat().st_size, time.perf_counter() - started
+
+
+def list_tables(db_path: str | Path) -> List[str]:
+    conn = _open(db_path)
+    try:
+        return [
+            row[0]
+            for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' "
+                "AND sql NOT LIKE 'CREATE VIRTUAL TABLE%' ORDER BY name"
+            )
+        ]
+    finally:
+        conn.close()
+
+
+def export(
+    db_path: str | Path,
+    names: Iterable[str],
+    output_dir: str | Path,
+    fmt: str = "parquet",
+    workers: Optional[int] = None,
+    batch_rows: int = DEFAULT_BATCH_ROWS,
+    compression: Optional[str] = DEFAULT_COMPRESSION,
+    dictionary_patterns: Sequence[str] = DICTIONARY_PATTERNS,
+) -> List[Tuple[str, int, int, float]]:
+    """
+    Export every one of *names* to *output_dir*, up to *workers* at a time, and
+    return export_one's results.  An object that fails is logged and skipped.
+    """
+    require_pyarrow()
+    names = list(dict.fromkeys(names))
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    workers = workers or min(4, os.cpu_count() or 1, len(names)) or 1
+    arguments = (output_dir, fmt, batch_rows, compression, tuple(dictionary_patterns))
+    started = time.perf_counter()
+    results = []
+    with contextlib.ExitStack() as stack:
+        if workers == 1:
+            outcomes = ((name, lambda name=name: export_one(db_path, name, *arguments)) for name in names)
+        else:
+            pool = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+            futures = [(name, pool.submit(export_one, db_path, name, *arguments)) for name in names]
+            outcomes = ((name, future.result) for name, future in futures)
+        for name, result in outcomes:
+            try:
+                results.append(result())
+            except (sqlite3.Error, LookupError, OSError, pa.ArrowException) as exc:
+                logger.error("  %-36s failed: %s", name, exc)
+                continue
+            logger.info("  %-36s %10d rows", name, results[-1][1])
+    total_rows = sum(result[1] for result in results)
+    total_bytes = sum(result[2] for result in results)
+    logger.info(
+        "Exported %d object(s), %d rows, %.1f MB of %s to %s in %.1f s",
+        len(results), total_rows, total_bytes / 1e6, fmt, output_dir, time.perf_counter() - started,
+    )
+    return results
+
+
+def _print_results(results: List[Tuple[str, int, int, float]]) -> None:
+    print(f"{'name':<36} {'rows':>10} {'MB':>9} {'seconds':>8} {'rows/s':>10}")
+    for name, rows, size, seconds in results:
+        print(f"{name:<36} {rows:>10} {size / 1e6:>9.2f} {seconds:>8.2f} {rows / max(seconds, 1e-9):>10.0f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export CBDB tables and views to Parquet or Arrow files.")
+    parser.add_argument("names", nargs="*", metavar="NAME", help="Tables or views to export.")
+    parser.add_argument("--db", default="latest.db", type=Path, help="Path to the SQLite database (default: latest.db).")
+    parser.add_argument("--output-dir", default="export", type=Path, help="Directory for the files (default: export).")
+    parser.add_argument("--format", choices=FORMATS, default="parquet", help="File format (default: parquet).")
+    parser.add_argument("--views", action="store_true", help="Export every view of create_views.sh.")
+    parser.add_argument("--tables", action="store_true", help="Export every table of the database.")
+    parser.add_argument("--workers", type=int, help="Objects exported in parallel (default: up to 4, one per CPU).")
+    parser.add_argument("--batch-rows", type=int, default=DEFAULT_BATCH_ROWS,
+                        help=f"Rows per fetchmany and record batch (default: {DEFAULT_BATCH_ROWS}).")
+    parser.add_argument("--compression", default=DEFAULT_COMPRESSION,
+                        help=f"Compression codec, or 'none' (default: {DEFAULT_COMPRESSION}).")
+    parser.add_argument("--dictionary", nargs="*", default=list(DICTIONARY_PATTERNS), metavar="PATTERN",
+                        help="Dictionary-encode the text columns matching these patterns "
+                             f"(default: {' '.join(DICTIONARY_PATTERNS)}); no pattern turns it off.")
+    args = parser.parse_args()
+
+    names = list(args.names)
+    if args.views:
+        names += load_view_definitions()
+    if args.tables:
+        names += list_tables(args.db)
+    if not names:
+        parser.error("Name at least one table or view, or pass --views / --tables.")
+    if pa is None:
+        parser.error("pyarrow is required: pip install pyarrow")
+    compression = None if args.compression.lower() == "none" else args.compression
+    results = export(
+        args.db, names, args.output_dir, args.format, args.workers, args.batch_rows, compression, args.dictionary
+    )
+    _print_results(results)
+    if len(results) < len(set(names)):
+        raise SystemExit(1)
@@ -0,0 +1,442 @@
+#!/usr/bin/env python3
+"""
+Find and optionally create the indexes the CBDB convenience views rely on.
+
+Join keys are collected from the ON clauses of the views in create_views.sh
+and, unless --no-fks is given, from the FK map used by add_foreign_keys.py.
+Every view exposing c_personid is then planned for a representative
+per-person lookup (``SELECT * FROM view WHERE c_personid = ?``) with
+EXPLAIN QUERY PLAN.  Full-table scans and automatic (temporary) indexes are
+reported together with the index that would avoid them; --create adds the
+missing indexes and prints a before/after latency table.  A suggestion that
+is a left prefix of another one, or of an existing index, is dropped.
+
+The FK map is loaded like add_foreign_keys.py does: from --csv-url through the
+download cache, from --csv-file, or from a --fk-json export.
+
+Usage:
+    python index_advisor.py [--db DB_PATH] [--create] [--samples N]
+                            [--no-fks | --csv-file PATH | --fk-json [PATH]] [--offline]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import re
+import sqlite3
+import statistics
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from add_foreign_keys import CACHE_DIR, CSV_URL, FK_JSON, load_foreign_keys
+from create_views import load_view_definitions
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+LOOKUP_COLUMN = "c_personid"
+
+# (table, (column, ...))
+IndexKey = Tuple[str, Tuple[str, ...]]
+
+_TABLE_ALIAS_RE = re.compile(
+    r'(?i)\b(?:FROM|JOIN)\s*\(?\s*(\w+)(?:\s+(?:AS\s+)?(?!ON\b|LEFT\b|INNER\b|JOIN\b|WHERE\b)(\w+))?'
+)
+_EQUALITY_RE = re.compile(r"\b(\w+)\.(\w+)\s*=\s*(\w+)\.(\w+)")
+_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)(?: AS (\w+))?")
+_AUTOMATIC_RE = re.compile(r"^SEARCH (?:TABLE )?(\w+)(?: AS (\w+))? USING AUTOMATIC .*?INDEX \((.*?)\)")
+
+
+def quote_identifier(identifier: str) -> str:
+    """Return identifier quoted with double quotes for SQLite usage."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def view_aliases(view: str, definitions: Dict[str, str]) -> Dict[str, str]:
+    """Map every alias (and bare table name) used by *view* and the views it reads to its table."""
+    aliases: Dict[str, str] = {}
+    pending, seen = [view], set()
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        for table, alias in _TABLE_ALIAS_RE.findall(definitions[current]):
+            if table in definitions:
+                pending.append(table)
+                continue
+            aliases.setdefault(table, table)
+            if alias:
+                aliases.setdefault(alias, table)
+    return aliases
+
+
+def join_equalities(sql: str) -> List[Tuple[Tuple[str, str], Tuple[str, str]]]:
+    """((alias, column), (alias, column)) of every ``a.x = b.y`` comparison in *sql*."""
+    return [((left_alias, left_col), (right_alias, right_col))
+            for left_alias, left_col, right_alias, right_col in _EQUALITY_RE.findall(sql)]
+
+
+def full_scan(detail: str) -> Optional[Tuple[str, Optional[str]]]:
+    """(table, alias) if the EXPLAIN QUERY PLAN line *detail* scans a whole table, else None."""
+    scan = _SCAN_RE.match(detail)
+    if scan is None or "CONSTANT ROW" in detail:
+        return None
+    return scan.group(1), scan.group(2)
+
+
+def view_join_keys(
+    views: Dict[str, str], definitions: Optional[Dict[str, str]] = None
+) -> Set[Tuple[str, str]]:
+    """
+    Return every (table, column) compared for equality in the join conditions of
+    *views*; aliases are resolved against *definitions* (default: *views*).
+    """
+    definitions = definitions or views
+    keys: Set[Tuple[str, str]] = set()
+    for view, sql in views.items():
+        aliases = view_aliases(view, definitions)
+        for pair in join_equalities(sql):
+            for alias, column in pair:
+                table = aliases.get(alias)
+                if table is not None:
+                    keys.add((table, column))
+    return keys
+
+
+def fk_join_keys(
+    csv_url: str,
+    tables: Set[str],
+    csv_file: Optional[str | Path] = None,
+    fk_json: Optional[str | Path] = None,
+    offline: bool = False,
+) -> Set[Tuple[str, str]]:
+    """
+    Return the child and parent columns of the FK map, limited to *tables*; the
+    map is read as by add_foreign_keys.load_foreign_keys.
+    """
+    by_upper = {table.upper(): table for table in tables}
+    keys: Set[Tuple[str, str]] = set()
+    for table, fk_defs in load_foreign_keys(csv_url, csv_file, fk_json, offline).items():
+        for col, ref_table, ref_col in fk_defs:
+            for upper, column in ((table, col), (ref_table, ref_col)):
+                if upper in by_upper:
+                    keys.add((by_upper[upper], column))
+    return keys
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return [row[1] for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})")]
+
+
+def leading_index_columns(conn: sqlite3.Connection, table: str) -> Set[str]:
+    """Columns that can be searched through an existing index or the rowid alias."""
+    covered: Set[str] = set()
+    pk = [row for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})") if row[5]]
+    if len(pk) == 1 and pk[0][2].upper() == "INTEGER":
+        covered.add(pk[0][1])
+    for index in conn.execute(f"PRAGMA index_list({quote_identifier(table)})").fetchall():
+        info = conn.execute(f"PRAGMA index_info({quote_identifier(index[1])})").fetchall()
+        first = min(info, key=lambda row: row[0], default=None)
+        if first is not None and first[2] is not None:
+            covered.add(first[2])
+    return covered
+
+
+def index_columns(conn: sqlite3.Connection, table: str) -> List[Tuple[str, ...]]:
+    """Column lists of the existing indexes on *table*, and of the rowid alias."""
+    indexes = []
+    pk = [row for row in conn.execute(f"PRAGMA table_info({quote_identifier(table)})") if row[5]]
+    if len(pk) == 1 and pk[0][2].upper() == "INTEGER":
+        indexes.append((pk[0][1],))
+    for index in conn.execute(f"PRAGMA index_list({quote_identifier(table)})").fetchall():
+        info = sorted(conn.execute(f"PRAGMA index_info({quote_identifier(index[1])})").fetchall())
+        if info and all(row[2] is not None for row in info):
+            indexes.append(tuple(row[2] for row in info))
+    return indexes
+
+
+def drop_prefixes(suggestions: Iterable[IndexKey], existing: Dict[str, List[Tuple[str, ...]]]) -> List[IndexKey]:
+    """
+    Deduplicate *suggestions*, dropping any whose columns are a left prefix of
+    another suggestion or of an index in *existing* ({table: [columns, ...]}) on
+    the same table: the longer index serves its lookups too.
+    """
+    unique = list(dict.fromkeys(suggestions))
+    kept = []
+    for table, columns in unique:
+        others = [cols for tbl, cols in unique if tbl == table and cols != columns] + existing.get(table, [])
+        if not any(cols[:len(columns)] == columns for cols in others):
+            kept.append((table, columns))
+    return kept
+
+
+def plan_lookup(conn: sqlite3.Connection, view: str) -> List[str]:
+    return [
+        row[3]
+        for row in conn.execute(
+            f"EXPLAIN QUERY PLAN SELECT * FROM {quote_identifier(view)} WHERE {LOOKUP_COLUMN} = ?",
+            (0,),
+        )
+    ]
+
+
+def time_lookup(conn: sqlite3.Connection, view: str, person_ids: List[int]) -> float:
+    """Median wall time in milliseconds of the per-person lookup on *view*."""
+    sql = f"SELECT * FROM {quote_identifier(view)} WHERE {LOOKUP_COLUMN} = ?"
+    samples = []
+    for person_id in person_ids:
+        started = time.perf_counter()
+        conn.execute(sql, (person_id,)).fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples) if samples else 0.0
+
+
+def sample_person_ids(conn: sqlite3.Connection, count: int) -> List[int]:
+    ids = [row[0] for row in conn.execute(f"SELECT {LOOKUP_COLUMN} FROM BIOG_MAIN ORDER BY {LOOKUP_COLUMN}")]
+    if not ids:
+        return []
+    step = max(1, len(ids) // count)
+    return ids[step // 2::step][:count]
+
+
+class IndexAdvisor:
+    """Collects join keys, plans per-person lookups and suggests missing indexes."""
+
+    def __init__(self, conn: sqlite3.Connection, fk_keys: Iterable[Tuple[str, str]] = ()):
+        self.conn = conn
+        self.definitions = load_view_definitions()
+        existing = {
+            row[0]: row[1]
+            for row in conn.execute(
+                "SELECT name, type FROM sqlite_master WHERE type IN ('table', 'view')"
+            )
+        }
+        self.tables = {name for name, kind in existing.items() if kind == "table"}
+        self.views = [
+            view
+            for view in self.definitions
+            if existing.get(view) == "view" and LOOKUP_COLUMN in table_columns(conn, view)
+        ]
+        missing_views = [view for view in self.definitions if existing.get(view) != "view"]
+        if missing_views:
+            logger.warning("Views not in database (run create_views.py first): %s", ", ".join(missing_views))
+        self.join_keys = {
+            key for key in view_join_keys(self.definitions) | set(fk_keys) if key[0] in self.tables
+        }
+
+    def unindexed_join_keys(self) -> List[Tuple[str, str]]:
+        missing = []
+        for table in sorted({table for table, _ in self.join_keys}):
+            columns = set(table_columns(self.conn, table))
+            covered = leading_index_columns(self.conn, table)
+            for _, column in sorted(key for key in self.join_keys if key[0] == table):
+                if column in columns and column not in covered:
+                    missing.append((table, column))
+        return missing
+
+    def analyze_plans(self) -> Tuple[Dict[str, List[str]], List[IndexKey]]:
+        """
+        Return ({view: [problem plan lines]}, suggested indexes).  A full scan of a
+        table suggests indexing its unindexed join keys (and the lookup column);
+        an automatic index suggests a real index on the same columns.
+        """
+        problems: Dict[str, List[str]] = {}
+        suggestions: List[IndexKey] = []
+        for view in self.views:
+            aliases = view_aliases(view, self.definitions)
+            view_keys = view_join_keys({view: self.definitions[view]}, self.definitions)
+            for detail in plan_lookup(self.conn, view):
+                scan = full_scan(detail)
+                automatic = _AUTOMATIC_RE.match(detail)
+                if scan:
+                    table = aliases.get(scan[1] or scan[0], scan[0])
+                    if table not in self.tables:
+                        continue
+                    problems.setdefault(view, []).append(f"{detail}  [{table}]")
+                    covered = leading_index_columns(self.conn, table)
+                    columns = set(table_columns(self.conn, table))
+                    # A scanned table holding the lookup column only needs that column
+                    # indexed; otherwise index the keys this view joins it on.
+                    if LOOKUP_COLUMN in columns:
+                        wanted = {LOOKUP_COLUMN}
+                    else:
+                        wanted = {col for tbl, col in view_keys if tbl == table}
+                    for column in sorted(wanted & columns - covered):
+                        suggestions.append((table, (column,)))
+                elif automatic:
+                    table = aliases.get(automatic.group(2) or automatic.group(1), automatic.group(1))
+                    if table not in self.tables:
+                        continue
+                    problems.setdefault(view, []).append(f"{detail}  [{table}]")
+                    columns = tuple(re.findall(r"(\w+)=\?", automatic.group(3)))
+                    if columns and columns[0] not in leading_index_columns(self.conn, table):
+                        suggestions.append((table, columns))
+        existing = {table: index_columns(self.conn, table) for table in {table for table, _ in suggestions}}
+        return problems, drop_prefixes(suggestions, existing)
+
+    def create_indexes(self, indexes: Iterable[IndexKey]) -> List[str]:
+        created = []
+        with self.conn:
+            for table, columns in indexes:
+                name = "idx_" + "_".join((table,) + columns)
+                column_list = ", ".join(quote_identifier(col) for col in columns)
+                self.conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {quote_identifier(name)} "
+                    f"ON {quote_identifier(table)} ({column_list})"
+                )
+                created.append(name)
+        return created
+
+    def latencies(self, person_ids: List[int]) -> Dict[str, float]:
+        return {view: time_lookup(self.conn, view, person_ids) for view in self.views}
+
+
+def _print_latency_table(before: Dict[str, float], after: Optional[Dict[str, float]]) -> None:
+    name_width = max((len(name) for name in before), default=4)
+    if after is None:
+        header = f"{'View':{name_width}}  {'Median ms':>10}"
+    else:
+        header = f"{'View':{name_width}}  {'Before ms':>10}  {'After ms':>10}  {'Speedup':>8}"
+    print(header)
+    print("-" * len(header))
+    for view, ms in before.items():
+        if after is None:
+            print(f"{view:{name_width}}  {ms:>10.2f}")
+        else:
+            speedup = ms / after[view] if after[view] else float("inf")
+            print(f"{view:{name_width}}  {ms:>10.2f}  {after[view]:>10.2f}  {speedup:>7.1f}x")
+
+
+def main(
+    db_path: Path,
+    create: bool = False,
+    samples: int = 5,
+    csv_url: Optional[str] = CSV_URL,
+    csv_file: Optional[Path] = None,
+    fk_json: Optional[Path] = None,
+    offline: bool = False,
+) -> None:
+    conn = sqlite3.connect(str(db_path))
+    try:
+        tables = {
+            row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+        }
+        fk_keys: Set[Tuple[str, str]] = set()
+        if csv_url:
+            try:
+                fk_keys = fk_join_keys(csv_url, tables, csv_file, fk_json, offline)
+            except OSError as exc:
+                logger.warning("Could not load FK definitions (%s); using view joins only.", exc)
+
+        advisor = IndexAdvisor(conn, fk_keys)
+        logger.info(
+            "%d join keys collected, planning lookups on %d views.", len(advisor.join_keys), len(advisor.views)
+        )
+
+        problems, suggestions = advisor.analyze_plans()
+        print("Full scans and automatic indexes in per-person lookups:")
+        if not problems:
+            print("  none")
+        for view, details in problems.items():
+            print(f"  {view}")
+            for detail in details:
+                print(f"    {detail}")
+        print()
+
+        print("Join keys without an index:")
+        missing = advisor.unindexed_join_keys()
+        for table, column in missing:
+            print(f"  {table}.{column}")
+        if not missing:
+            print("  none")
+        print()
+
+        print("Suggested indexes:")
+        for table, columns in suggestions:
+            print(f"  {table} ({', '.join(columns)})")
+        if not suggestions:
+            print("  none")
+        print()
+
+        person_ids = sample_person_ids(conn, samples)
+        before = advisor.latencies(person_ids)
+        if not create or not suggestions:
+            _print_latency_table(before, None)
+            return
+
+        created = advisor.create_indexes(suggestions)
+        logger.info("Created %d indexes: %s", len(created), ", ".join(created))
+        remaining, _ = advisor.analyze_plans()
+        logger.info(
+            "%d views still scan a table or build an automatic index.", len(remaining)
+        )
+        _print_latency_table(before, advisor.latencies(person_ids))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Report and create indexes for the join keys of the CBDB views."
+    )
+    parser.add_argument(
+        "--db",
+        default="latest.db",
+        type=Path,
+        help="Path to the SQLite database (default: latest.db).",
+    )
+    parser.add_argument(
+        "--create",
+        action="store_true",
+        help="Create the suggested indexes and report before/after latencies.",
+    )
+    parser.add_argument(
+        "--samples",
+        type=int,
+        default=5,
+        help="Number of person ids timed per view (default: 5).",
+    )
+    parser.add_argument(
+        "--csv-url",
+        default=CSV_URL,
+        metavar="URL",
+        help="URL of foreign_keys_regen.csv (default: main branch on GitHub).",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument(
+        "--no-fks",
+        action="store_true",
+        help="Only use the views' join conditions, not the FK map.",
+    )
+    source.add_argument(
+        "--csv-file",
+        type=Path,
+        metavar="PATH",
+        help="Read foreign_keys_regen.csv from a local file instead of --csv-url.",
+    )
+    source.add_argument(
+        "--fk-json",
+        type=Path,
+        nargs="?",
+        const=FK_JSON,
+        metavar="PATH",
+        help=f"Read the FK map from a JSON export (default path: {FK_JSON.name}).",
+    )
+    parser.add_argument(
+        "--offline",
+        action="store_true",
+        help=f"Use the cached copy of --csv-url without revalidating it (cache: {CACHE_DIR}).",
+    )
+    args = parser.parse_args()
+    main(
+        args.db,
+        args.create,
+        args.samples,
+        None if args.no_fks else args.csv_url,
+        args.csv_file,
+        args.fk_json,
+        args.offline,
+    )
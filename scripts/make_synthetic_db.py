@@ -0,0 +1,607 @@
+#!/usr/bin/env python3
+"""
+Generate a synthetic SQLite database with the CBDB schema.
+
+The tables and columns are the ones the post-processing scripts and the
+views of create_views.sh read: BIOG_MAIN, ADDR_CODES, ADDR_BELONGS_DATA, the
+per-person data tables (ASSOC_DATA, KIN_DATA, POSTED_TO_OFFICE_DATA, ...) and
+their code tables.  Row counts scale with --people; the output is fully
+determined by --seed, so two runs with the same arguments produce the same
+rows.
+
+ADDR_CODES holds six tiers of places, so the deepest ones have the five
+levels of belongs relationships that ADDRESSES resolves.  Each place belongs
+to one or more parents over consecutive periods, sometimes with gaps between
+them, and a small share of ADDR_BELONGS_DATA rows is dirty the way the real
+data is (unknown or missing parents, NULL or inverted years, duplicates).
+
+Code columns reference their code tables and person columns reference
+BIOG_MAIN; --export-fk-json writes that FK map in the add_foreign_keys.py
+JSON format, so the foreign keys can be added without network access.
+
+Usage:
+    python make_synthetic_db.py [--db synthetic.db] [--people N] [--addresses N]
+                                [--seed N] [--export-fk-json PATH]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import random
+import re
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import sqlite_profiles
+from add_foreign_keys import FKDef, save_fk_json
+
+DEFAULT_PEOPLE = 10000
+DEFAULT_SEED = 42
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# {table: (primary key column or None, columns)}
+TABLES: Dict[str, Tuple[Optional[str], str]] = {
+    "BIOG_MAIN": ("c_personid", """
+        c_personid c_name c_name_chn c_index_year c_index_year_type_code c_index_year_source_id
+        c_index_addr_id c_index_addr_type_code c_female c_ethnicity_code c_household_status_code
+        c_tribe c_birthyear c_by_nh_code c_by_nh_year c_by_range c_deathyear c_dy_nh_code
+        c_dy_nh_year c_dy_range c_death_age c_death_age_range c_fl_earliest_year c_fl_ey_nh_code
+        c_fl_ey_nh_year c_fl_latest_year c_fl_ly_nh_code c_fl_ly_nh_year c_surname c_surname_chn
+        c_mingzi c_mingzi_chn c_dy c_choronym_code c_notes c_by_intercalary c_dy_intercalary
+        c_by_month c_dy_month c_by_day c_dy_day c_by_day_gz c_dy_day_gz c_surname_proper
+        c_mingzi_proper c_name_proper c_surname_rm c_mingzi_rm c_name_rm c_created_by
+        c_created_date c_modified_by c_modified_date"""),
+    "ADDR_CODES": ("c_addr_id", """
+        c_addr_id c_name c_name_chn c_firstyear c_lastyear c_admin_type x_coord y_coord
+        c_notes c_alt_names"""),
+    "ADDR_BELONGS_DATA": (None, """
+        c_addr_id c_belongs_to c_firstyear c_lastyear c_source c_pages c_notes"""),
+    "ALTNAME_DATA": (None, """
+        c_personid c_alt_name c_alt_name_chn c_alt_name_type_code c_sequence c_source c_pages
+        c_notes"""),
+    "ASSOC_DATA": (None, """
+        c_personid c_assoc_id c_assoc_code c_kin_code c_kin_id c_assoc_kin_code c_assoc_kin_id
+        c_assoc_claimer_id c_text_title c_assoc_count c_sequence c_assoc_first_year
+        c_assoc_fy_intercalary c_assoc_fy_month c_assoc_fy_day c_assoc_fy_nh_code
+        c_assoc_fy_nh_year c_assoc_fy_range c_assoc_fy_day_gz c_litgenre_code c_occasion_code
+        c_topic_code c_inst_name_code c_addr_id c_source c_pages c_notes"""),
+    "KIN_DATA": (None, "c_personid c_kin_id c_kin_code c_source c_pages c_notes"),
+    "BIOG_ADDR_DATA": (None, """
+        c_personid c_addr_id c_addr_type c_sequence c_firstyear c_fy_nh_code c_fy_nh_year
+        c_fy_range c_fy_intercalary c_fy_month c_fy_day c_fy_day_gz c_lastyear c_ly_nh_code
+        c_ly_nh_year c_ly_range c_ly_intercalary c_ly_month c_ly_day c_ly_day_gz c_natal
+        c_source c_pages c_notes"""),
+    "BIOG_INST_DATA": (None, """
+        c_personid c_inst_name_code c_inst_code c_bi_role_code c_bi_begin_year c_bi_by_nh_code
+        c_bi_by_nh_year c_bi_by_range c_bi_end_year c_bi_ey_nh_code c_bi_ey_nh_year
+        c_bi_ey_range c_source c_pages c_notes"""),
+    "SOCIAL_INSTITUTION_ADDR": (None, """
+        c_inst_name_code c_inst_code c_inst_addr_type_code c_inst_addr_id inst_xcoord
+        inst_ycoord"""),
+    "BIOG_SOURCE_DATA": (None, "c_personid c_textid c_pages c_notes c_main_source"),
+    "BIOG_TEXT_DATA": (None, "c_personid c_textid c_role_id c_year c_source c_pages c_notes"),
+    "ENTRY_DATA": (None, """
+        c_personid c_entry_code c_sequence c_exam_rank c_kin_code c_kin_id c_assoc_code
+        c_assoc_id c_year c_age c_entry_nh_id c_entry_nh_year c_entry_range c_inst_code
+        c_inst_name_code c_exam_field c_entry_addr_id c_parental_status_code c_attempt_count
+        c_source c_pages c_notes c_posting_notes"""),
+    "EVENTS_DATA": (None, """
+        c_personid c_sequence c_event_code c_role c_year c_nh_code c_nh_year c_yr_range
+        c_intercalary c_month c_day c_day_ganzhi c_source c_pages c_notes"""),
+    "EVENTS_ADDR": (None, """
+        c_personid c_event_code c_sequence c_addr_id c_year c_nh_code c_nh_year c_yr_range
+        c_intercalary c_month c_day c_day_ganzhi"""),
+    "POSSESSION_DATA": ("c_possession_record_id", """
+        c_possession_record_id c_personid c_sequence c_possession_act_code c_possession_desc
+        c_possession_desc_chn c_quantity c_measure_code c_possession_yr c_possession_nh_code
+        c_possession_nh_yr c_possession_yr_range c_source c_pages c_notes"""),
+    "POSSESSION_ADDR": (None, "c_possession_record_id c_addr_id"),
+    "POSTED_TO_OFFICE_DATA": (None, """
+        c_personid c_office_id c_posting_id c_sequence c_firstyear c_fy_nh_code c_fy_nh_year
+        c_fy_range c_fy_intercalary c_fy_month c_fy_day c_fy_day_gz c_lastyear c_ly_nh_code
+        c_ly_nh_year c_ly_range c_ly_intercalary c_ly_month c_ly_day c_ly_day_gz c_appt_code
+        c_assume_office_code c_inst_code c_inst_name_code c_office_category_id c_dy c_source
+        c_pages c_notes"""),
+    "POSTED_TO_ADDR_DATA": (None, "c_personid c_posting_id c_office_id c_addr_id"),
+    "STATUS_DATA": (None, """
+        c_personid c_sequence c_status_code c_firstyear c_fy_nh_code c_fy_nh_year c_fy_range
+        c_lastyear c_ly_nh_code c_ly_nh_year c_ly_range c_supplement c_source c_pages c_notes"""),
+    # Code tables.
+    "ALTNAME_CODES": ("c_name_type_code", "c_name_type_code c_name_type_desc c_name_type_desc_chn"),
+    "APPOINTMENT_CODES": ("c_appt_code", "c_appt_code c_appt_desc c_appt_desc_chn"),
+    "ASSOC_CODES": ("c_assoc_code", "c_assoc_code c_assoc_desc c_assoc_desc_chn"),
+    "ASSUME_OFFICE_CODES": (
+        "c_assume_office_code", "c_assume_office_code c_assume_office_desc c_assume_office_desc_chn"
+    ),
+    "BIOG_ADDR_CODES": ("c_addr_type", "c_addr_type c_addr_desc c_addr_desc_chn"),
+    "BIOG_INST_CODES": ("c_bi_role_code", "c_bi_role_code c_bi_role_desc c_bi_role_chn"),
+    "CHORONYM_CODES": ("c_choronym_code", "c_choronym_code c_choronym_desc c_choronym_chn"),
+    "DYNASTIES": ("c_dy", "c_dy c_dynasty c_dynasty_chn c_start c_end"),
+    "ENTRY_CODES": ("c_entry_code", "c_entry_code c_entry_desc c_entry_desc_chn"),
+    "ETHNICITY_TRIBE_CODES": ("c_ethnicity_code", "c_ethnicity_code c_name c_name_chn"),
+    "EVENT_CODES": ("c_event_code", "c_event_code c_event_name c_event_name_chn"),
+    "GANZHI_CODES": ("c_ganzhi_code", "c_ganzhi_code c_ganzhi_chn c_ganzhi_py"),
+    "HOUSEHOLD_STATUS_CODES": (
+        "c_household_status_code",
+        "c_household_status_code c_household_status_desc c_household_status_desc_chn",
+    ),
+    "INDEXYEAR_TYPE_CODES": (
+        "c_index_year_type_code", "c_index_year_type_code c_index_year_type_desc c_index_year_type_hz"
+    ),
+    "KINSHIP_CODES": ("c_kincode", "c_kincode c_kinrel c_kinrel_chn"),
+    "LITERARYGENRE_CODES": ("c_lit_genre_code", "c_lit_genre_code c_lit_genre_desc c_lit_genre_desc_chn"),
+    "MEASURE_CODES": ("c_measure_code", "c_measure_code c_measure_desc c_measure_desc_chn"),
+    "NIAN_HAO": ("c_nianhao_id", "c_nianhao_id c_nianhao_pin c_nianhao_chn"),
+    "OCCASION_CODES": ("c_occasion_code", "c_occasion_code c_occasion_desc c_occasion_desc_chn"),
+    "OFFICE_CATEGORIES": ("c_office_category_id", "c_office_category_id c_category_desc c_category_desc_chn"),
+    "OFFICE_CODES": ("c_office_id", "c_office_id c_office_pinyin c_office_chn c_office_trans"),
+    "PARENTAL_STATUS_CODES": (
+        "c_parental_status_code",
+        "c_parental_status_code c_parental_status_desc c_parental_status_desc_chn",
+    ),
+    "POSSESSION_ACT_CODES": (
+        "c_possession_act_code", "c_possession_act_code c_possession_act_desc c_possession_act_desc_chn"
+    ),
+    "SCHOLARLYTOPIC_CODES": ("c_topic_code", "c_topic_code c_topic_desc c_topic_desc_chn"),
+    "SOCIAL_INSTITUTION_ADDR_TYPES": (
+        "c_inst_addr_type_code", "c_inst_addr_type_code c_inst_addr_type_desc c_inst_addr_type_chn"
+    ),
+    "SOCIAL_INSTITUTION_NAME_CODES": ("c_inst_name_code", "c_inst_name_code c_inst_name_py c_inst_name_hz"),
+    "STATUS_CODES": ("c_status_code", "c_status_code c_status_desc c_status_desc_chn"),
+    "TEXT_CODES": ("c_textid", "c_textid c_title c_title_chn c_url_api c_url_api_coda c_url_homepage"),
+    "TEXT_ROLE_CODES": ("c_role_id", "c_role_id c_role_desc c_role_desc_chn"),
+    "YEAR_RANGE_CODES": ("c_range_code", "c_range_code c_range c_range_chn"),
+}
+
+# Data-table rows per person.
+ROWS_PER_PERSON: Dict[str, float] = {
+    "ALTNAME_DATA": 0.8,
+    "ASSOC_DATA": 3.0,
+    "KIN_DATA": 2.5,
+    "BIOG_ADDR_DATA": 1.5,
+    "BIOG_INST_DATA": 0.1,
+    "BIOG_SOURCE_DATA": 1.2,
+    "BIOG_TEXT_DATA": 0.4,
+    "ENTRY_DATA": 0.5,
+    "EVENTS_DATA": 0.2,
+    "EVENTS_ADDR": 0.2,
+    "POSSESSION_DATA": 0.05,
+    "POSTED_TO_OFFICE_DATA": 2.0,
+    "STATUS_DATA": 0.8,
+}
+
+# Tables filled from fixed or generated labels before any data row refers to them.
+CODE_TABLES = tuple(
+    table
+    for table, (primary_key, _) in TABLES.items()
+    if primary_key and table not in ("BIOG_MAIN", "ADDR_CODES") and table not in ROWS_PER_PERSON
+)
+
+# Rows per code table; the others get DEFAULT_CODES.
+DEFAULT_CODES = 40
+CODE_COUNTS = {"GANZHI_CODES": 60, "KINSHIP_CODES": 400, "ASSOC_CODES": 500, "NIAN_HAO": 800, "STATUS_CODES": 300}
+
+# (dynasty, chinese, first year, last year)
+DYNASTIES = (
+    ("Unknown", "未詳", None, None), ("Qin", "秦", -221, -207), ("Han", "漢", -206, 220),
+    ("Wei", "魏", 220, 265), ("Jin", "晉", 266, 420), ("Southern and Northern", "南北朝", 420, 589),
+    ("Sui", "隋", 581, 618), ("Tang", "唐", 618, 907), ("Five Dynasties", "五代", 907, 960),
+    ("Song", "宋", 960, 1279), ("Liao", "遼", 916, 1125), ("Jin", "金", 1115, 1234),
+    ("Yuan", "元", 1271, 1368), ("Ming", "明", 1368, 1644), ("Qing", "清", 1644, 1912),
+    ("Republic", "民國", 1912, 1949),
+)
+
+# Six tiers of places: share of all addresses and admin type.
+ADDRESS_TIERS = (
+    (0.01, "dao"), (0.04, "lu"), (0.10, "zhou"), (0.20, "jun"), (0.30, "xian"), (0.35, "zhen"),
+)
+# Share of dirty ADDR_BELONGS_DATA rows, as in the real data.
+DIRTY_BELONGS_SHARE = 0.03
+
+SYLLABLES = (
+    ("wang", "王"), ("li", "李"), ("zhang", "張"), ("liu", "劉"), ("chen", "陳"), ("yang", "楊"),
+    ("zhao", "趙"), ("huang", "黃"), ("zhou", "周"), ("wu", "吳"), ("xu", "徐"), ("sun", "孫"),
+    ("hu", "胡"), ("zhu", "朱"), ("gao", "高"), ("lin", "林"), ("he", "何"), ("guo", "郭"),
+    ("ma", "馬"), ("luo", "羅"), ("an", "安"), ("shi", "石"), ("yuan", "元"), ("jing", "靖"),
+    ("wen", "文"), ("ming", "明"), ("de", "德"), ("guang", "光"), ("zhi", "之"), ("yi", "逸"),
+    ("qing", "清"), ("fu", "甫"), ("yu", "玉"), ("shan", "山"), ("hai", "海"), ("feng", "風"),
+)
+
+_INTEGER_RE = re.compile(
+    r"(id|code|year|_yr|month|day|sequence|count|age|_dy|female|rank|natal|intercalary|gz|"
+    r"ganzhi|supplement|main_source|source|nh_yr|range|belongs_to|_type|_start|_end)$"
+)
+_TEXT_COLUMNS = {"c_range", "c_admin_type", "c_role", "c_exam_field", "c_quantity"}
+_REAL_RE = re.compile(r"coord$")
+
+# (column pattern, parent table, parent column); the first match wins.
+REFERENCES: Tuple[Tuple[str, str, str], ...] = (
+    (r"c_personid|c_assoc_id|c_kin_id|c_assoc_kin_id|c_assoc_claimer_id", "BIOG_MAIN", "c_personid"),
+    (r"c_addr_id|c_index_addr_id|c_belongs_to|c_entry_addr_id|c_inst_addr_id", "ADDR_CODES", "c_addr_id"),
+    (r"c_textid|c_source|c_index_year_source_id", "TEXT_CODES", "c_textid"),
+    (r"c_possession_record_id", "POSSESSION_DATA", "c_possession_record_id"),
+    (r"c_\w*nh_code|c_entry_nh_id", "NIAN_HAO", "c_nianhao_id"),
+    (r"c_\w+_range", "YEAR_RANGE_CODES", "c_range_code"),
+    (r"c_\w*day_gz|c_day_ganzhi", "GANZHI_CODES", "c_ganzhi_code"),
+    (r"c_alt_name_type_code", "ALTNAME_CODES", "c_name_type_code"),
+    (r"c_kin_code|c_assoc_kin_code", "KINSHIP_CODES", "c_kincode"),
+    (r"c_litgenre_code", "LITERARYGENRE_CODES", "c_lit_genre_code"),
+    (r"c_index_addr_type_code", "BIOG_ADDR_CODES", "c_addr_type"),
+)
+
+
+def columns_of(table: str) -> List[str]:
+    return TABLES[table][1].split()
+
+
+@lru_cache(maxsize=None)
+def column_type(column: str) -> str:
+    if column in _TEXT_COLUMNS:
+        return "TEXT"
+    if _REAL_RE.search(column):
+        return "REAL"
+    return "INTEGER" if _INTEGER_RE.search(column) else "TEXT"
+
+
+def create_table_sql(table: str) -> str:
+    """CREATE TABLE statement in the layout of the release databases, one column per line."""
+    primary_key = TABLES[table][0]
+    lines = []
+    for column in columns_of(table):
+        suffix = " PRIMARY KEY" if column == primary_key else ""
+        lines.append(f'    "{column}" {column_type(column)}{suffix}')
+    return f'CREATE TABLE "{table}" (\n' + ",\n".join(lines) + "\n)"
+
+
+@lru_cache(maxsize=None)
+def reference(table: str, column: str) -> Optional[FKDef]:
+    """The (column, parent table, parent column) *column* of *table* refers to, if any."""
+    if TABLES[table][0] == column:
+        return None
+    for pattern, parent, parent_column in REFERENCES:
+        if re.fullmatch(pattern, column):
+            return column, parent, parent_column
+    # Any other code column refers to the code table whose primary key has its name.
+    for parent, (primary_key, _) in TABLES.items():
+        if primary_key == column and parent != table:
+            return column, parent, primary_key
+    return None
+
+
+def foreign_keys() -> Dict[str, List[FKDef]]:
+    """The FK map of the synthetic schema, in the format of add_foreign_keys.load_foreign_keys."""
+    fk_map: Dict[str, List[FKDef]] = {}
+    for table in TABLES:
+        fks = [fk for fk in (reference(table, column) for column in columns_of(table)) if fk]
+        if fks:
+            fk_map[table] = fks
+    return fk_map
+
+
+class SyntheticGenerator:
+    """Produces the rows of every table; all randomness comes from one seeded RNG."""
+
+    def __init__(self, people: int, addresses: int, seed: int = DEFAULT_SEED):
+        self.people = people
+        self.addresses = addresses
+        self.rng = random.Random(seed)
+        self.keys: Dict[str, List[int]] = {}
+        # c_personid -> (birth year, death year)
+        self.lifetimes: Dict[int, Tuple[int, int]] = {}
+
+    def name(self, parts: int) -> Tuple[str, str]:
+        chosen = [self.rng.choice(SYLLABLES) for _ in range(parts)]
+        return " ".join(p for p, _ in chosen).title(), "".join(c for _, c in chosen)
+
+    def pick(self, table: str, nullable: float = 0.0) -> Optional[int]:
+        if nullable and self.rng.random() < nullable:
+            return None
+        return self.rng.choice(self.keys[table])
+
+    # -- code tables ---------------------------------------------------------
+
+    def code_rows(self, table: str) -> Iterator[tuple]:
+        if table == "DYNASTIES":
+            for code, (name, chn, start, end) in enumerate(DYNASTIES):
+                yield code, name, chn, start, end
+            return
+        primary_key, _ = TABLES[table]
+        count = {
+            "TEXT_CODES": max(DEFAULT_CODES, self.people // 20),
+            "OFFICE_CODES": max(DEFAULT_CODES, self.people // 10),
+        }.get(table, CODE_COUNTS.get(table, DEFAULT_CODES))
+        others = [column for column in columns_of(table) if column != primary_key]
+        label = table.split("_CODES")[0].lower().replace("_", " ")
+        for code in range(count):
+            row = [code]
+            for column in others:
+                if code == 0:
+                    row.append("未詳" if column.endswith(("chn", "hz")) else "Unknown")
+                elif column.endswith(("chn", "hz")):
+                    row.append(self.name(2)[1])
+                elif column.startswith("c_url"):
+                    row.append(f"https://example.org/{label.replace(' ', '-')}/{code}")
+                else:
+                    row.append(f"{label} {code}")
+            yield tuple(row)
+
+    # -- places --------------------------------------------------------------
+
+    def address_rows(self) -> Tuple[List[tuple], List[tuple]]:
+        """Return (ADDR_CODES rows, ADDR_BELONGS_DATA rows)."""
+        rng = self.rng
+        codes: List[tuple] = []
+        belongs: List[tuple] = []
+        # Per tier: [(c_addr_id, firstyear, lastyear)]
+        tiers: List[List[Tuple[int, int, int]]] = []
+        addr_id = 1
+        for depth, (share, admin_type) in enumerate(ADDRESS_TIERS):
+            tier = []
+            for _ in range(max(2, int(self.addresses * share))):
+                if depth:
+                    # Most places exist within the lifetime of a parent; some outlive it.
+                    _, parent_first, parent_last = rng.choice(tiers[depth - 1])
+                    first = rng.randint(parent_first, parent_last)
+                    last = rng.randint(first, parent_last + (200 if rng.random() < 0.2 else 0))
+                else:
+                    first = rng.randint(-221, 600)
+                    last = rng.randint(1600, 1911)
+                pinyin, chn = self.name(2)
+                codes.append((
+                    addr_id, pinyin, chn, first, last, admin_type,
+                    round(rng.uniform(97.0, 123.0), 5), round(rng.uniform(20.0, 42.0), 5), None, None,
+                ))
+                tier.append((addr_id, first, last))
+                addr_id += 1
+            tiers.append(tier)
+            if depth:
+                for child in tier:
+                    belongs.extend(self._belongs_periods(child, tiers[depth - 1]))
+
+        # Dirty rows the ADDRESSES build has to clean up.
+        for _ in range(int(len(belongs) * DIRTY_BELONGS_SHARE)):
+            child, parent, first, last = rng.choice(belongs)[:4]
+            kind = rng.randrange(5)
+            if kind == 0:
+                parent = rng.choice((0, None))
+            elif kind == 1:
+                parent = addr_id + rng.randint(1, 1000)
+            elif kind == 2:
+                first, last = (None, last) if rng.random() < 0.5 else (first, None)
+            elif kind == 3 and first is not None and last is not None:
+                first, last = last, first - 1
+            belongs.append((child, parent, first, last, 0, None, None))
+        rng.shuffle(belongs)
+
+        self.keys["ADDR_CODES"] = [row[0] for row in codes]
+        # Some places have no years at all and are skipped by the ADDRESSES build.
+        for index in rng.sample(range(len(codes)), len(codes) // 50):
+            codes[index] = codes[index][:3] + (None, None) + codes[index][5:]
+        return codes, belongs
+
+    def _belongs_periods(self, child: Tuple[int, int, int], parents: List[Tuple[int, int, int]]) -> List[tuple]:
+        """Split the lifetime of *child* into consecutive periods under different parents."""
+        rng = self.rng
+        addr_id, first, last = child
+        rows = []
+        start = first
+        periods = rng.choice((1, 1, 1, 2, 2, 3))
+        for period in range(periods):
+            if start > last:
+                break
+            end = last if period == periods - 1 else rng.randint(start, last)
+            candidates = [p for p in parents if p[1] <= start and p[2] >= end]
+            if not candidates:
+                candidates = [p for p in parents if p[1] <= end and p[2] >= start] or parents
+            parent = rng.choice(candidates)[0]
+            rows.append((addr_id, parent, start, end, rng.choice(self.keys["TEXT_CODES"]), None, None))
+            # A gap between two periods is a time the hierarchy is unknown.
+            start = end + 1 + (rng.randint(1, 40) if rng.random() < 0.3 else 0)
+        return rows
+
+    # -- people --------------------------------------------------------------
+
+    def biog_main_rows(self) -> Iterator[tuple]:
+        rng = self.rng
+        dynasties = [(code, start, end) for code, (_, _, start, end) in enumerate(DYNASTIES) if start is not None]
+        columns = columns_of("BIOG_MAIN")
+        self.keys["BIOG_MAIN"] = list(range(1, self.people + 1))
+        for person_id in self.keys["BIOG_MAIN"]:
+            birth = rng.randint(-200, 1880)
+            death = birth + rng.randint(18, 90)
+            self.lifetimes[person_id] = (birth, death)
+            surname, surname_chn = self.name(1)
+            mingzi, mingzi_chn = self.name(rng.choice((1, 2)))
+            dynasty = next((code for code, start, end in dynasties if start <= birth + 30 <= end), 0)
+            known = {
+                "c_personid": person_id,
+                "c_name": f"{surname} {mingzi}",
+                "c_name_chn": surname_chn + mingzi_chn,
+                "c_surname": surname, "c_surname_chn": surname_chn,
+                "c_mingzi": mingzi, "c_mingzi_chn": mingzi_chn,
+                "c_surname_proper": surname, "c_mingzi_proper": mingzi,
+                "c_name_proper": f"{surname} {mingzi}",
+                "c_surname_rm": surname, "c_mingzi_rm": mingzi, "c_name_rm": f"{surname} {mingzi}",
+                "c_birthyear": birth if rng.random() < 0.6 else None,
+                "c_deathyear": death if rng.random() < 0.6 else None,
+                "c_index_year": birth + 60,
+                "c_death_age": death - birth,
+                "c_fl_earliest_year": birth + 20 if rng.random() < 0.3 else None,
+                "c_fl_latest_year": death - 5 if rng.random() < 0.3 else None,
+                "c_female": int(rng.random() < 0.08),
+                "c_dy": dynasty,
+                "c_created_by": "synthetic",
+                "c_created_date": "20200101",
+                "c_modified_by": "synthetic",
+                "c_modified_date": f"2024{rng.randint(1, 12):02d}{rng.randint(1, 28):02d}",
+            }
+            yield tuple(
+                known[column] if column in known else self.value("BIOG_MAIN", column, person_id)
+                for column in columns
+            )
+
+    def value(self, table: str, column: str, person_id: int) -> object:
+        """A plausible value for *column* in a row of *table* about *person_id*."""
+        rng = self.rng
+        fk = reference(table, column)
+        if fk is not None:
+            parent = fk[1]
+            if parent == "BIOG_MAIN":
+                return person_id if column == "c_personid" else self.pick(parent)
+            return self.pick(parent, nullable=0.3 if parent in ("NIAN_HAO", "GANZHI_CODES") else 0.0)
+        kind = column_type(column)
+        if kind == "REAL":
+            return round(rng.uniform(97.0, 123.0 if "x" in column else 42.0), 5)
+        if kind == "INTEGER":
+            birth, death = self.lifetimes.get(person_id, (1000, 1060))
+            if re.search(r"year|_yr$", column):
+                return rng.randint(birth, death) if rng.random() < 0.6 else None
+            if column.endswith("month"):
+                return rng.randint(1, 12) if rng.random() < 0.2 else None
+            if column.endswith("day"):
+                return rng.randint(1, 28) if rng.random() < 0.1 else None
+            if column.endswith("intercalary"):
+                return 0
+            if column.endswith("age"):
+                return rng.randint(15, 70)
+            return rng.randint(0, 3)
+        if column == "c_pages":
+            page = rng.randint(1, 900)
+            return f"{page}-{page + rng.randint(0, 3)}"
+        if column == "c_notes":
+            return "synthetic note" if rng.random() < 0.1 else None
+        return self.name(2)[1] if column.endswith("chn") else self.name(2)[0]
+
+    def data_rows(self, table: str) -> Iterator[tuple]:
+        columns = columns_of(table)
+        count = int(self.people * ROWS_PER_PERSON[table])
+        for row_number in range(1, count + 1):
+            person_id = self.pick("BIOG_MAIN")
+            row = [self.value(table, column, person_id) for column in columns]
+            if table == "POSSESSION_DATA":
+                row[0] = row_number
+            yield tuple(row)
+
+    def posting_rows(self) -> Tuple[List[tuple], List[tuple]]:
+        """POSTED_TO_OFFICE_DATA rows and the POSTED_TO_ADDR_DATA rows that share their c_posting_id."""
+        columns = columns_of("POSTED_TO_OFFICE_DATA")
+        offices, addresses = [], []
+        for posting_id, row in enumerate(self.data_rows("POSTED_TO_OFFICE_DATA"), 1):
+            row = dict(zip(columns, row), c_posting_id=posting_id)
+            offices.append(tuple(row[column] for column in columns))
+            for _ in range(self.rng.choice((0, 1, 1, 2))):
+                addresses.append((row["c_personid"], posting_id, row["c_office_id"], self.pick("ADDR_CODES")))
+        return offices, addresses
+
+
+def generate(
+    db_path: str | Path,
+    people: int = DEFAULT_PEOPLE,
+    addresses: Optional[int] = None,
+    seed: int = DEFAULT_SEED,
+) -> Dict[str, int]:
+    """
+    Write a synthetic CBDB database to *db_path*, which must not exist yet, and
+    return {table: row count}.  *addresses* defaults to one place per ten people.
+    """
+    db_path = Path(db_path)
+    if db_path.exists():
+        raise FileExistsError(f"{db_path} already exists")
+    generator = SyntheticGenerator(people, addresses or max(200, people // 10), seed)
+    counts: Dict[str, int] = {}
+    started = time.perf_counter()
+
+    # A new file that is deleted on failure does not need a rollback journal.
+    conn = sqlite_profiles.connect(db_path, journal_mode="off", isolation_level=None)
+    try:
+        conn.execute("BEGIN")
+        for table in TABLES:
+            conn.execute(create_table_sql(table))
+
+        def insert(table: str, rows: Callable[[], Iterator[tuple]] | List[tuple]) -> None:
+            placeholders = ", ".join("?" * len(columns_of(table)))
+            cursor = conn.executemany(
+                f'INSERT INTO "{table}" VALUES ({placeholders})', rows() if callable(rows) else rows
+            )
+            counts[table] = cursor.rowcount
+
+        # Code tables first: the data tables draw their code values from them.
+        for table in CODE_TABLES:
+            rows = list(generator.code_rows(table))
+            generator.keys[table] = [row[0] for row in rows]
+            insert(table, rows)
+        addr_codes, addr_belongs = generator.address_rows()
+        insert("ADDR_CODES", addr_codes)
+        insert("ADDR_BELONGS_DATA", addr_belongs)
+        insert("BIOG_MAIN", generator.biog_main_rows)
+        possessions = list(generator.data_rows("POSSESSION_DATA"))
+        generator.keys["POSSESSION_DATA"] = [row[0] for row in possessions]
+        insert("POSSESSION_DATA", possessions)
+        insert("POSSESSION_ADDR", [(key, generator.pick("ADDR_CODES")) for key in generator.keys["POSSESSION_DATA"]])
+        offices, posted_addresses = generator.posting_rows()
+        insert("POSTED_TO_OFFICE_DATA", offices)
+        insert("POSTED_TO_ADDR_DATA", posted_addresses)
+        for table in ROWS_PER_PERSON:
+            if table not in counts:
+                insert(table, lambda: generator.data_rows(table))
+        insert("SOCIAL_INSTITUTION_ADDR", [
+            (
+                code, code, generator.pick("SOCIAL_INSTITUTION_ADDR_TYPES"), generator.pick("ADDR_CODES"),
+                round(generator.rng.uniform(97.0, 123.0), 5), round(generator.rng.uniform(20.0, 42.0), 5),
+            )
+            for code in generator.keys["SOCIAL_INSTITUTION_NAME_CODES"]
+        ])
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.close()
+        db_path.unlink(missing_ok=True)
+        raise
+    conn.close()
+
+    logger.info(
+        "Wrote %s: %d tables, %d rows in %.1f s",
+        db_path, len(counts), sum(counts.values()), time.perf_counter() - started,
+    )
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Generate a synthetic database with the CBDB schema for benchmarks and offline testing."
+    )
+    parser.add_argument(
+        "--db",
+        default="synthetic.db",
+        type=Path,
+        help="Path of the database to create (default: synthetic.db).",
+    )
+    parser.add_argument(
+        "--people",
+        type=int,
+        default=DEFAULT_PEOPLE,
+        help=f"Rows in BIOG_MAIN; the data tables scale with it (default: {DEFAULT_PEOPLE}).",
+    )
+    parser.add_argument(
+        "--addresses",
+        type=int,
+        help="Rows in ADDR_CODES (default: one per ten people, at least 200).",
+    )
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"Random seed (default: {DEFAULT_SEED}).")
+    parser.add_argument(
+        "--export-fk-json",
+        type=Path,
+        metavar="PATH",
+        help="Also write the FK map of the synthetic schema for add_foreign_keys.py --fk-json.",
+    )
+    args = parser.parse_args()
+    if args.db.exists():
+        parser.error(f"'{args.db}' already exists. Move or remove it first.")
+
+    generate(args.db, args.people, args.addresses, args.seed)
+    if args.export_fk_json:
+        save_fk_json(foreign_keys(), args.export_fk_json, "make_synthetic_db.py")
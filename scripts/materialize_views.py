@@ -0,0 +1,365 @@
+#!/usr/bin/env python3
+"""
+Materialize CBDB convenience views into indexed tables and keep them fresh.
+
+Each view from create_views.sh can be copied into a real table named
+MAT_<view> (e.g. MAT_View_PeopleData) with indexes on its id columns.  The
+MATERIALIZED_VIEWS table records when each one was built and a signature
+(row count and content checksum) of every source table it reads;
+``refresh`` rebuilds only the materialized views whose sources changed.
+
+Hashing every source table is a full scan, so ``refresh`` first compares the
+file change counter in the database header, which SQLite bumps on every
+commit outside WAL mode, with the one recorded after the last run: if it is
+unchanged, nothing was written and no table is read.  Otherwise a source
+whose row count differs is known to have changed without hashing it.
+
+Usage:
+    python materialize_views.py [--db DB_PATH] materialize [VIEW ...]
+    python materialize_views.py [--db DB_PATH] refresh [VIEW ...] [--force]
+    python materialize_views.py [--db DB_PATH] status
+    python materialize_views.py [--db DB_PATH] drop [VIEW ...]
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import re
+import sqlite3
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+import sqlite_profiles
+from create_views import load_view_definitions
+
+TABLE_PREFIX = "MAT_"
+METADATA_TABLE = "MATERIALIZED_VIEWS"
+STAMP_TABLE = "MATERIALIZED_VIEWS_STAMP"
+
+# Columns indexed on a materialized view whenever the view exposes them.
+INDEX_COLUMNS = ("c_personid", "c_node_id", "c_kin_id", "c_addr_id", "c_textid", "c_office_id")
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+# (row_count, checksum)
+Signature = Tuple[int, str]
+
+_SOURCE_RE = re.compile(r'(?i)\b(?:FROM|JOIN)\s*\(?\s*["`\[]?(\w+)')
+
+
+def quote_identifier(identifier: str) -> str:
+    """Return identifier quoted with double quotes for SQLite usage."""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def materialized_name(view: str) -> str:
+    return TABLE_PREFIX + view
+
+
+def source_tables(view: str, definitions: Dict[str, str], tables: Set[str]) -> List[str]:
+    """Return the tables *view* reads, following references to other views."""
+    found: Set[str] = set()
+    pending = [view]
+    seen_views: Set[str] = set()
+    while pending:
+        current = pending.pop()
+        if current in seen_views:
+            continue
+        seen_views.add(current)
+        for name in _SOURCE_RE.findall(definitions[current]):
+            if name in definitions:
+                pending.append(name)
+            elif name in tables:
+                found.add(name)
+    return sorted(found)
+
+
+def table_signature(conn: sqlite3.Connection, table: str) -> Signature:
+    """Row count and a SHA-1 over every row of *table* in storage order."""
+    digest = hashlib.sha1()
+    count = 0
+    for row in conn.execute(f"SELECT * FROM {quote_identifier(table)}"):
+        digest.update(repr(row).encode("utf-8"))
+        count += 1
+    return count, digest.hexdigest()
+
+
+def _ensure_metadata(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {METADATA_TABLE} (
+            c_view_name TEXT PRIMARY KEY,
+            c_table_name TEXT NOT NULL,
+            c_built_at_utc TEXT NOT NULL,
+            c_build_seconds REAL,
+            c_row_count INTEGER,
+            c_sources TEXT NOT NULL
+        )
+        """
+    )
+
+
+def _change_counter(db_path: str | Path) -> int:
+    """The file change counter at offset 24 of the database header."""
+    with open(db_path, "rb") as handle:
+        handle.seek(24)
+        return int.from_bytes(handle.read(4), "big")
+
+
+def _database_stamp(conn: sqlite3.Connection, db_path: str | Path) -> Optional[Tuple[int, int]]:
+    """
+    (schema_version, change counter) of the database, or None in WAL mode,
+    where commits do not bump the counter.  Call inside a transaction so the
+    header cannot change while it is read.
+    """
+    schema_version = conn.execute("PRAGMA schema_version").fetchone()[0]
+    if conn.execute("PRAGMA journal_mode").fetchone()[0].lower() == "wal":
+        return None
+    return schema_version, _change_counter(db_path)
+
+
+def record_stamp(db_path: str | Path) -> None:
+    """
+    Store the stamp the database will have once this write commits, so the
+    next refresh can tell whether anything was written since.
+    """
+    conn = sqlite3.connect(str(db_path), isolation_level=None)
+    try:
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {STAMP_TABLE} (c_schema_version INTEGER, c_change_counter INTEGER)")
+        conn.execute("BEGIN IMMEDIATE")
+        stamp = _database_stamp(conn, db_path)
+        conn.execute(f"DELETE FROM {STAMP_TABLE}")
+        if stamp is not None:
+            # Committing outside WAL mode bumps the counter exactly once.
+            conn.execute(f"INSERT INTO {STAMP_TABLE} VALUES (?, ?)", (stamp[0], stamp[1] + 1))
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+
+
+def unchanged_since_last_run(db_path: str | Path, views: Iterable[str] = ()) -> bool:
+    """
+    True if nothing was written to the database since the last run recorded
+    its stamp and every one of *views* (default: all recorded) is materialized.
+    """
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True, isolation_level=None)
+    try:
+        conn.execute("BEGIN")
+        tables = _list_tables(conn)
+        if not {METADATA_TABLE, STAMP_TABLE} <= tables:
+            return False
+        stored = conn.execute(f"SELECT c_schema_version, c_change_counter FROM {STAMP_TABLE}").fetchone()
+        if stored is None or tuple(stored) != _database_stamp(conn, db_path):
+            return False
+        materialized = dict(conn.execute(f"SELECT c_view_name, c_table_name FROM {METADATA_TABLE}"))
+        views = list(views) or list(materialized)
+        return all(view in materialized and materialized[view] in tables for view in views)
+    finally:
+        conn.close()
+
+
+def _list_tables(conn: sqlite3.Connection) -> Set[str]:
+    return {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        )
+    }
+
+
+class ViewMaterializer:
+    """Builds, refreshes and drops MAT_* tables for the views of create_views.sh."""
+
+    def __init__(self, conn: sqlite3.Connection, definitions: Optional[Dict[str, str]] = None):
+        self.conn = conn
+        self.definitions = definitions or load_view_definitions()
+        self.tables = _list_tables(conn)
+        # Signatures are computed at most once per run, even if several views share a source,
+        # as long as no other connection commits in between (PRAGMA data_version).
+        self._signatures: Dict[str, Signature] = {}
+        self._data_version: Optional[int] = None
+
+    def resolve(self, views: Iterable[str]) -> List[str]:
+        views = list(views) or list(self.definitions)
+        unknown = [view for view in views if view not in self.definitions]
+        if unknown:
+            raise ValueError(f"Unknown view(s): {', '.join(unknown)}")
+        return views
+
+    def signature(self, table: str) -> Signature:
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._signatures.clear()
+            self._data_version = data_version
+        if table not in self._signatures:
+            self._signatures[table] = table_signature(self.conn, table)
+        return self._signatures[table]
+
+    def current_sources(self, view: str) -> Dict[str, Signature]:
+        return {
+            table: self.signature(table)
+            for table in source_tables(view, self.definitions, self.tables)
+        }
+
+    def changed_sources(self, view: str, stored: Dict[str, Signature]) -> List[str]:
+        """Source tables of *view* whose signature differs from *stored*, counting rows before hashing."""
+        current = source_tables(view, self.definitions, self.tables)
+        changed = []
+        for table in sorted(stored.keys() | set(current)):
+            if table not in stored or table not in current:
+                changed.append(table)
+                continue
+            count = self.conn.execute(f"SELECT COUNT(*) FROM {quote_identifier(table)}").fetchone()[0]
+            if count != stored[table][0] or self.signature(table) != stored[table]:
+                changed.append(table)
+        return changed
+
+    def stored_sources(self, view: str) -> Optional[Dict[str, Signature]]:
+        row = self.conn.execute(
+            f"SELECT c_sources FROM {METADATA_TABLE} WHERE c_view_name = ?", (view,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {table: tuple(sig) for table, sig in json.loads(row[0]).items()}
+
+    def materialize(self, view: str) -> int:
+        """(Re)build MAT_<view> with its indexes; return its row count."""
+        table = materialized_name(view)
+        quoted = quote_identifier(table)
+        started = time.perf_counter()
+
+        # Take the write lock before reading the sources, so a write cannot land between
+        # the signatures and the copy and be recorded as already materialized.
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            sources = self.current_sources(view)
+            self.conn.execute(f"DROP TABLE IF EXISTS {quoted}")
+            self.conn.execute(f"CREATE TABLE {quoted} AS SELECT * FROM {quote_identifier(view)}")
+            columns = {row[1] for row in self.conn.execute(f"PRAGMA table_info({quoted})")}
+            for column in INDEX_COLUMNS:
+                if column in columns:
+                    self.conn.execute(
+                        f"CREATE INDEX {quote_identifier(f'{table}_{column}')} "
+                        f"ON {quoted} ({quote_identifier(column)})"
+                    )
+            row_count = self.conn.execute(f"SELECT COUNT(*) FROM {quoted}").fetchone()[0]
+            elapsed = time.perf_counter() - started
+            self.conn.execute(
+                f"INSERT OR REPLACE INTO {METADATA_TABLE} VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    view,
+                    table,
+                    datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                    elapsed,
+                    row_count,
+                    json.dumps(sources, sort_keys=True),
+                ),
+            )
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+        logger.info("  ✓ %s -> %s  (%d rows, %.2f s)", view, table, row_count, elapsed)
+        return row_count
+
+    def refresh(self, view: str, force: bool = False) -> bool:
+        """Rebuild MAT_<view> if any source table changed; return True if rebuilt."""
+        stored = self.stored_sources(view)
+        if stored is None or materialized_name(view) not in _list_tables(self.conn):
+            reason = "not materialized yet"
+        elif force:
+            reason = "forced"
+        else:
+            changed = self.changed_sources(view, stored)
+            if not changed:
+                logger.info("  = %s: up to date", view)
+                return False
+            reason = "changed: " + ", ".join(changed)
+        logger.info("  ~ %s: %s", view, reason)
+        self.materialize(view)
+        return True
+
+    def drop(self, view: str) -> None:
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute(f"DROP TABLE IF EXISTS {quote_identifier(materialized_name(view))}")
+            self.conn.execute(f"DELETE FROM {METADATA_TABLE} WHERE c_view_name = ?", (view,))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        logger.info("  ✗ %s dropped", materialized_name(view))
+
+
+def run(db_path: str | Path, command: str, views: Iterable[str] = (), force: bool = False) -> None:
+    if command == "refresh" and not force and unchanged_since_last_run(db_path, views):
+        logger.info("Finished: nothing was written since the last run, all up to date.")
+        return
+    conn = sqlite_profiles.connect(db_path, isolation_level=None)
+    try:
+        _ensure_metadata(conn)
+        materializer = ViewMaterializer(conn)
+
+        if command == "status":
+            rows = conn.execute(
+                f"SELECT c_view_name, c_table_name, c_built_at_utc, c_row_count, c_build_seconds "
+                f"FROM {METADATA_TABLE} ORDER BY c_view_name"
+            ).fetchall()
+            if not rows:
+                logger.info("No materialized views.")
+            for view, table, built_at, row_count, seconds in rows:
+                logger.info("  %s -> %s  built %s  (%d rows, %.2f s)", view, table, built_at, row_count, seconds)
+            return
+
+        if command in ("refresh", "drop") and not views:
+            views = [row[0] for row in conn.execute(f"SELECT c_view_name FROM {METADATA_TABLE}")]
+            if not views:
+                logger.info("No materialized views.")
+                return
+
+        selected = materializer.resolve(views)
+        if command == "materialize":
+            for view in selected:
+                materializer.materialize(view)
+        elif command == "refresh":
+            rebuilt = sum(materializer.refresh(view, force) for view in selected)
+            logger.info("Finished: %d rebuilt, %d up to date.", rebuilt, len(selected) - rebuilt)
+        elif command == "drop":
+            for view in selected:
+                materializer.drop(view)
+    finally:
+        conn.close()
+    # The bulk connection is closed and the journal mode restored, so the stamp is final.
+    record_stamp(db_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Materialize CBDB convenience views into indexed tables."
+    )
+    parser.add_argument(
+        "--db",
+        default="latest.db",
+        type=Path,
+        help="Path to the SQLite database (default: latest.db).",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, help_text in (
+        ("materialize", "Build MAT_* tables for the given views (default: all views)."),
+        ("refresh", "Rebuild materialized views whose source tables changed (default: all materialized)."),
+        ("drop", "Drop the MAT_* tables of the given views (default: all materialized)."),
+    ):
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("views", nargs="*", metavar="VIEW", help="View name, e.g. View_PeopleData.")
+        if name == "refresh":
+            sub.add_argument("--force", action="store_true", help="Rebuild even if sources are unchanged.")
+    subparsers.add_parser("status", help="List materialized views and when they were built.")
+    args = parser.parse_args()
+    run(args.db, args.command, getattr(args, "views", ()), getattr(args, "force", False))
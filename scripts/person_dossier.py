@@ -0,0 +1,419 @@
+#!/usr/bin/env python3
+"""
+Precompute one compressed JSON dossier per person into PERSON_DOSSIER.
+
+A dossier holds the rows of the views of dossier_service.DOSSIER_VIEWS for
+one c_personid, in the same shape dossier_service.py serves them.  Each is
+stored as zlib-compressed JSON in
+
+    PERSON_DOSSIER (c_personid INTEGER PRIMARY KEY, c_modified_date, c_dossier)
+
+so fetching one is a single primary-key lookup.  The build splits the people
+into id ranges that worker processes query and encode in parallel; the parent
+writes each range in its own transaction.
+
+``build`` is incremental.  It rebuilds the people whose BIOG_MAIN
+c_modified_date differs from the one stored with their dossier, the people
+added to or removed from BIOG_MAIN, the people with rows in other tables the
+views read whose c_modified_date is not older than the previous build, and
+everyone whose dossier names one of those people (e.g. as an associate).  A
+change to the view definitions, or to any code table the views read (tables
+without c_personid), rebuilds everything.  Edits that leave no
+c_modified_date behind, such as a deleted association, need ``build --full``.
+
+Usage:
+    python person_dossier.py [--db DB_PATH] build [--full] [--workers N] [--chunk N]
+    python person_dossier.py [--db DB_PATH] get PERSON_ID
+    python person_dossier.py [--db DB_PATH] status
+"""
+
+from __future__ import annotations
+
+import argparse
+import contextlib
+import json
+import logging
+import os
+import sqlite3
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+import sqlite_profiles
+from create_views import load_view_definitions
+from dossier_service import DOSSIER_VIEWS, LOOKUP_COLUMN
+from index_advisor import join_equalities, quote_identifier, table_columns, view_aliases
+from materialize_views import source_tables, table_signature
+
+DOSSIER_TABLE = "PERSON_DOSSIER"
+STATE_TABLE = "PERSON_DOSSIER_STATE"
+PERSON_TABLE = "BIOG_MAIN"
+MODIFIED_COLUMN = "c_modified_date"
+
+DEFAULT_CHUNK = 1000
+COMPRESSION_LEVEL = 6
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+Dossier = Dict[str, Any]
+
+# Read-only connection of a worker process, opened by _init_worker.
+_worker_conn: Optional[sqlite3.Connection] = None
+
+
+def _list_tables(conn: sqlite3.Connection) -> Set[str]:
+    return {
+        row[0]
+        for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%'"
+        )
+    }
+
+
+def encode_dossier(person_id: int, views: Dict[str, List[Dict[str, Any]]]) -> bytes:
+    document = {LOOKUP_COLUMN: person_id, "views": views}
+    text = json.dumps(document, ensure_ascii=False, separators=(",", ":"), default=str)
+    return zlib.compress(text.encode("utf-8"), COMPRESSION_LEVEL)
+
+
+def decode_dossier(blob: bytes) -> Dossier:
+    return json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def person_references(definitions: Dict[str, str]) -> Set[Tuple[str, str]]:
+    """
+    (table, column) pairs the dossier views join to BIOG_MAIN.c_personid to
+    show another person, e.g. ("ASSOC_DATA", "c_assoc_id").
+    """
+    references: Set[Tuple[str, str]] = set()
+    for view in DOSSIER_VIEWS:
+        aliases = view_aliases(view, definitions)
+        for left, right in join_equalities(definitions[view]):
+            for (alias, column), (other_alias, other_column) in ((left, right), (right, left)):
+                other_table = aliases.get(other_alias)
+                if (
+                    aliases.get(alias) == PERSON_TABLE
+                    and column == LOOKUP_COLUMN
+                    and other_table not in (None, PERSON_TABLE)
+                    and other_column != LOOKUP_COLUMN
+                ):
+                    references.add((other_table, other_column))
+    return references
+
+
+def _dossier_sources(conn: sqlite3.Connection, definitions: Dict[str, str]) -> Tuple[List[str], List[str]]:
+    """The tables the dossier views read, split into (person tables, code tables)."""
+    tables = _list_tables(conn)
+    sources = sorted({table for view in DOSSIER_VIEWS for table in source_tables(view, definitions, tables)})
+    person = [table for table in sources if LOOKUP_COLUMN in table_columns(conn, table)]
+    return person, [table for table in sources if table not in person]
+
+
+def _views_digest(definitions: Dict[str, str]) -> str:
+    return json.dumps({view: definitions[view] for view in DOSSIER_VIEWS}, sort_keys=True)
+
+
+def _chunk_query(view: str, contiguous: bool) -> str:
+    sql = f"SELECT * FROM {quote_identifier(view)} WHERE {LOOKUP_COLUMN} BETWEEN ? AND ?"
+    if not contiguous:
+        sql += f" AND {LOOKUP_COLUMN} IN (SELECT value FROM json_each(?))"
+    return sql
+
+
+def build_chunk(conn: sqlite3.Connection, person_ids: List[int]) -> Tuple[List[Tuple[int, bytes]], List[int]]:
+    """
+    Encode the dossiers of *person_ids* (sorted) with one query per view.
+    Returns ([(c_personid, blob), ...], [ids without a View_PeopleData row]).
+    """
+    low, high = person_ids[0], person_ids[-1]
+    # A dense range is read whole; sparse ids, as in incremental builds, are looked up one by one.
+    contiguous = len(person_ids) * 2 >= high - low + 1
+    params: Tuple[Any, ...] = (low, high) if contiguous else (low, high, json.dumps(person_ids))
+    grouped: Dict[int, Dict[str, List[Dict[str, Any]]]] = {
+        person_id: {view: [] for view in DOSSIER_VIEWS} for person_id in person_ids
+    }
+    for view in DOSSIER_VIEWS:
+        cursor = conn.execute(_chunk_query(view, contiguous), params)
+        columns = [column[0] for column in cursor.description]
+        key = columns.index(LOOKUP_COLUMN)
+        for row in cursor:
+            views = grouped.get(row[key])
+            if views is not None:
+                views[view].append(dict(zip(columns, row)))
+
+    encoded, missing = [], []
+    for person_id, views in grouped.items():
+        if views[DOSSIER_VIEWS[0]]:
+            encoded.append((person_id, encode_dossier(person_id, views)))
+        else:
+            missing.append(person_id)
+    return encoded, missing
+
+
+def _init_worker(db_path: str) -> None:
+    global _worker_conn
+    _worker_conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+
+
+def _build_chunk_in_worker(person_ids: List[int]) -> Tuple[List[Tuple[int, bytes]], List[int]]:
+    return build_chunk(_worker_conn, person_ids)
+
+
+def _ensure_tables(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        f"""
+        CREATE TABLE IF NOT EXISTS {DOSSIER_TABLE} (
+            c_personid INTEGER PRIMARY KEY,
+            {MODIFIED_COLUMN} TEXT,
+            c_dossier BLOB NOT NULL
+        )
+        """
+    )
+    conn.execute(f"CREATE TABLE IF NOT EXISTS {STATE_TABLE} (c_key TEXT PRIMARY KEY, c_value TEXT)")
+
+
+def _load_state(conn: sqlite3.Connection) -> Dict[str, str]:
+    return dict(conn.execute(f"SELECT c_key, c_value FROM {STATE_TABLE}"))
+
+
+def _changed_people(
+    conn: sqlite3.Connection,
+    person_tables: List[str],
+    references: Set[Tuple[str, str]],
+    watermark: Optional[str],
+    current: Dict[int, Optional[str]],
+) -> Tuple[Set[int], Set[int]]:
+    """(people to rebuild, people to delete) since the dossiers in DOSSIER_TABLE were built."""
+    stored = dict(conn.execute(f"SELECT c_personid, {MODIFIED_COLUMN} FROM {DOSSIER_TABLE}"))
+    removed = stored.keys() - current.keys()
+    changed = {person_id for person_id, modified in current.items() if stored.get(person_id, ()) != modified}
+    logger.info("  %d changed or new in %s, %d removed", len(changed), PERSON_TABLE, len(removed))
+
+    if watermark is not None:
+        for table in person_tables:
+            if table == PERSON_TABLE or MODIFIED_COLUMN not in table_columns(conn, table):
+                continue
+            # Dates are kept per day, so the day of the previous build is read again.
+            rows = {
+                row[0]
+                for row in conn.execute(
+                    f"SELECT DISTINCT {LOOKUP_COLUMN} FROM {quote_identifier(table)} WHERE {MODIFIED_COLUMN} >= ?",
+                    (watermark,),
+                )
+            }
+            if rows:
+                logger.info("  %d with rows modified in %s", len(rows), table)
+            changed |= rows
+
+    # Dossiers that name a changed or removed person show their old name.
+    mentioned = json.dumps(sorted(changed | removed))
+    for table, column in sorted(references):
+        rows = {
+            row[0]
+            for row in conn.execute(
+                f"SELECT DISTINCT {LOOKUP_COLUMN} FROM {quote_identifier(table)} "
+                f"WHERE {quote_identifier(column)} IN (SELECT value FROM json_each(?))",
+                (mentioned,),
+            )
+        }
+        if rows - changed:
+            logger.info("  %d mention them in %s.%s", len(rows - changed), table, column)
+        changed |= rows
+    return changed & current.keys(), removed
+
+
+def build_dossiers(
+    db_path: str | Path,
+    full: bool = False,
+    workers: Optional[int] = None,
+    chunk: int = DEFAULT_CHUNK,
+    timeout: float = 5.0,
+) -> Tuple[int, int]:
+    """
+    Bring PERSON_DOSSIER up to date with the views (everything with *full*)
+    and return (dossiers written, dossiers deleted).  Each write waits up to
+    *timeout* seconds for another writer.
+    """
+    started = time.perf_counter()
+    definitions = load_view_definitions()
+    conn = sqlite_profiles.connect(db_path, timeout=timeout, isolation_level=None)
+    try:
+        missing_views = [
+            view for view in DOSSIER_VIEWS
+            if conn.execute("SELECT 1 FROM sqlite_master WHERE type='view' AND name=?", (view,)).fetchone() is None
+        ]
+        if missing_views:
+            raise LookupError(f"View(s) {', '.join(missing_views)} not found in {db_path}, run `create_views.py` first")
+        _ensure_tables(conn)
+        state = _load_state(conn)
+
+        person_tables, code_tables = _dossier_sources(conn, definitions)
+        views_digest = _views_digest(definitions)
+        code_signatures = json.dumps({table: table_signature(conn, table) for table in code_tables}, sort_keys=True)
+        # Taken before reading, so edits made during the build are picked up next time.
+        watermark = max(
+            (
+                conn.execute(f"SELECT MAX({MODIFIED_COLUMN}) FROM {quote_identifier(table)}").fetchone()[0] or ""
+                for table in person_tables
+                if MODIFIED_COLUMN in table_columns(conn, table)
+            ),
+            default="",
+        ) or None
+        current = dict(conn.execute(f"SELECT {LOOKUP_COLUMN}, {MODIFIED_COLUMN} FROM {PERSON_TABLE}"))
+
+        if full or not state:
+            reason = "requested" if full else "no previous build"
+        elif state.get("views") != views_digest:
+            reason = "view definitions changed"
+        elif state.get("code_tables") != code_signatures:
+            changed_tables = json.loads(state.get("code_tables") or "{}")
+            reason = "code tables changed: " + ", ".join(
+                sorted(t for t in set(changed_tables) | set(json.loads(code_signatures))
+                       if changed_tables.get(t) != json.loads(code_signatures).get(t))
+            )
+        else:
+            reason = None
+
+        if reason is not None:
+            logger.info("Full build of %s (%s)", DOSSIER_TABLE, reason)
+            todo = set(current)
+            stored = {row[0] for row in conn.execute(f"SELECT {LOOKUP_COLUMN} FROM {DOSSIER_TABLE}")}
+            removed = stored - todo
+        else:
+            logger.info("Incremental build of %s", DOSSIER_TABLE)
+            todo, removed = _changed_people(
+                conn, person_tables, person_references(definitions), state.get("watermark"), current
+            )
+
+        ordered = sorted(todo)
+        chunks = [ordered[i:i + chunk] for i in range(0, len(ordered), chunk)]
+        workers = workers or min(4, os.cpu_count() or 1, len(chunks)) or 1
+        logger.info("Building %d dossier(s) in %d range(s) with %d worker(s)", len(ordered), len(chunks), workers)
+
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(f"DELETE FROM {DOSSIER_TABLE} WHERE {LOOKUP_COLUMN} = ?", ((i,) for i in removed))
+        conn.execute("COMMIT")
+        written = 0
+        deleted = len(removed)
+        with contextlib.ExitStack() as stack:
+            if workers == 1:
+                reader = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+                stack.callback(reader.close)
+                results: Iterable[Tuple[List[Tuple[int, bytes]], List[int]]] = (
+                    build_chunk(reader, ids) for ids in chunks
+                )
+            else:
+                pool = stack.enter_context(
+                    ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(str(db_path),))
+                )
+                results = pool.map(_build_chunk_in_worker, chunks)
+            for done, (encoded, missing) in enumerate(results, 1):
+                conn.execute("BEGIN IMMEDIATE")
+                conn.executemany(
+                    f"INSERT OR REPLACE INTO {DOSSIER_TABLE} VALUES (?, ?, ?)",
+                    ((person_id, current[person_id], blob) for person_id, blob in encoded),
+                )
+                deleted += conn.executemany(
+                    f"DELETE FROM {DOSSIER_TABLE} WHERE {LOOKUP_COLUMN} = ?", ((i,) for i in missing)
+                ).rowcount
+                conn.execute("COMMIT")
+                written += len(encoded)
+                if done % 50 == 0 or done == len(chunks):
+                    logger.info("  %d/%d ranges, %d dossiers", done, len(chunks), written)
+
+        conn.execute("BEGIN IMMEDIATE")
+        conn.executemany(
+            f"INSERT OR REPLACE INTO {STATE_TABLE} VALUES (?, ?)",
+            [
+                ("views", views_digest),
+                ("code_tables", code_signatures),
+                ("watermark", watermark),
+                ("built_at_utc", datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")),
+            ],
+        )
+        conn.execute("COMMIT")
+    finally:
+        conn.close()
+    logger.info(
+        "%s: %d dossier(s) written, %d deleted in %.2f s",
+        DOSSIER_TABLE, written, deleted, time.perf_counter() - started,
+    )
+    return written, deleted
+
+
+class DossierStore:
+    """Read-only access to PERSON_DOSSIER.  Keep one instance per thread and reuse it."""
+
+    def __init__(self, db_path: str | Path):
+        db_path = Path(db_path)
+        if not db_path.exists():
+            raise FileNotFoundError(f"Database file not found: {db_path}")
+        self.conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+        if DOSSIER_TABLE not in _list_tables(self.conn):
+            self.conn.close()
+            raise LookupError(f"{DOSSIER_TABLE} not found in {db_path}, run `person_dossier.py build` first")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "DossierStore":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get(self, person_id: int) -> Optional[Dossier]:
+        row = self.conn.execute(
+            f"SELECT c_dossier FROM {DOSSIER_TABLE} WHERE {LOOKUP_COLUMN} = ?", (person_id,)
+        ).fetchone()
+        return None if row is None else decode_dossier(row[0])
+
+
+def print_status(db_path: str | Path) -> None:
+    with DossierStore(db_path) as store:
+        count, stored_bytes = store.conn.execute(
+            f"SELECT COUNT(*), COALESCE(SUM(LENGTH(c_dossier)), 0) FROM {DOSSIER_TABLE}"
+        ).fetchone()
+        state = _load_state(store.conn)
+    print(f"{DOSSIER_TABLE}: {count} dossiers, {stored_bytes / 1e6:.1f} MB compressed")
+    print(f"built {state.get('built_at_utc', '-')}, modified dates up to {state.get('watermark') or '-'}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute and read per-person JSON dossiers of a CBDB database.")
+    parser.add_argument(
+        "--db",
+        default="latest.db",
+        type=Path,
+        help="Path to the SQLite database (default: latest.db).",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build = subparsers.add_parser("build", help=f"Bring {DOSSIER_TABLE} up to date with the views.")
+    build.add_argument("--full", action="store_true", help="Rebuild every dossier.")
+    build.add_argument("--workers", type=int, help="Worker processes (default: up to 4, one per CPU).")
+    build.add_argument(
+        "--chunk", type=int, default=DEFAULT_CHUNK, help=f"People per id range (default: {DEFAULT_CHUNK})."
+    )
+    get = subparsers.add_parser("get", help="Print the stored dossier of one person as JSON.")
+    get.add_argument("person_id", type=int, help="c_personid of the person.")
+    subparsers.add_parser("status", help=f"Show the size of {DOSSIER_TABLE} and when it was built.")
+    args = parser.parse_args()
+    if not args.db.is_file():
+        parser.error(f"database file '{args.db}' does not exist.")
+
+    if args.command == "build":
+        if args.chunk < 1:
+            parser.error("--chunk must be at least 1.")
+        build_dossiers(args.db, args.full, args.workers, args.chunk)
+    elif args.command == "get":
+        with DossierStore(args.db) as store:
+            dossier = store.get(args.person_id)
+        if dossier is None:
+            parser.exit(1, f"No dossier for c_personid {args.person_id}.\n")
+        print(json.dumps(dossier, ensure_ascii=False, indent=2))
+    else:
+        print_status(args.db)
@@ -0,0 +1,518 @@
+#!/usr/bin/env python3
+"""
+Export the association and kinship network to CSR arrays and query it.
+
+``build`` reads the edges of
+
+    ASSOC_DATA  c_personid -> c_assoc_id  (kind "assoc", c_assoc_code, c_assoc_first_year)
+    KIN_DATA    c_personid -> c_kin_id    (kind "kin", c_kin_code, no year)
+
+and stores them as compressed-sparse-row NumPy arrays in a directory next to
+the database (latest.db -> latest.graph/).  nodes.npy holds the sorted
+c_personid of every person in BIOG_MAIN or on an edge (int32); a person's
+position in it is its node index.  For each direction ("out" as recorded,
+"in" reversed) there is
+
+    <dir>_indptr.npy   int64, edges of node i are indptr[i]:indptr[i + 1]
+    <dir>_targets.npy  int32 node index at the other end
+    <dir>_kind.npy     int8 index into KINDS
+    <dir>_code.npy     int32 association or kinship code
+    <dir>_year.npy     int16 first year, MISSING_YEAR if unknown
+
+PersonGraph opens them memory-mapped, so loading is instant and the pages are
+shared between processes, and answers k-hop neighbourhood (breadth-first,
+one vectorized step per hop), degree and ego-network queries, optionally
+restricted by edge kind, code and year.  Edges to the unknown person (id 0
+or NULL) and from a person to themselves are left out.
+
+Usage:
+    python person_graph.py [--db DB_PATH] build
+    python person_graph.py [--db DB_PATH] khop PERSON_ID [-k N] [--sql] [filters]
+    python person_graph.py [--db DB_PATH] degree [PERSON_ID ...] [--top N] [filters]
+    python person_graph.py [--db DB_PATH] ego PERSON_ID [--radius N] [filters]
+
+    filters: [--direction out|in|both] [--kind assoc|kin] [--code N ...]
+             [--from-year Y] [--to-year Y] [--include-undated]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import shutil
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # only needed to build and query; the module can still be imported without it
+    np = None
+
+KINDS = ("assoc", "kin")
+DIRECTIONS = ("out", "in", "both")
+ARRAYS = ("indptr", "targets", "kind", "code", "year")
+MISSING_YEAR = -32768
+GRAPH_SUFFIX = ".graph"
+META_FILE = "graph.json"
+FORMAT_VERSION = 1
+PERSON_TABLE = "BIOG_MAIN"
+
+# (kind, table, person column, other person column, code column, year column or None)
+EDGE_SOURCES = (
+    ("assoc", "ASSOC_DATA", "c_personid", "c_assoc_id", "c_assoc_code", "c_assoc_first_year"),
+    ("kin", "KIN_DATA", "c_personid", "c_kin_id", "c_kin_code", None),
+)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def require_numpy() -> None:
+    if np is None:
+        raise ImportError("person_graph.py needs numpy: pip install numpy")
+
+
+def graph_dir_for(db_path: str | Path) -> Path:
+    db_path = Path(db_path)
+    return db_path.with_name(db_path.stem + GRAPH_SUFFIX)
+
+
+def _db_identity(db_path: Path) -> Dict[str, int]:
+    stat = db_path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _person_column(column: str) -> str:
+    """SQL for a person id column, NULL unless it is a usable positive int32."""
+    return f"CASE WHEN typeof({column}) = 'integer' AND {column} BETWEEN 1 AND 2147483647 THEN {column} END"
+
+
+def load_edges(conn: sqlite3.Connection) -> Tuple["np.ndarray", ...]:
+    """(source ids, target ids, kind, code, year) of every edge, as int64 arrays."""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    parts = []
+    for kind, (name, table, source, target, code, year) in enumerate(EDGE_SOURCES):
+        if table not in tables:
+            logger.warning("%s not found, the graph has no %s edges", table, name)
+            continue
+        year_sql = (
+            f"CASE WHEN typeof({year}) = 'integer' AND {year} BETWEEN -32767 AND 32767 "
+            f"THEN {year} ELSE {MISSING_YEAR} END"
+            if year
+            else str(MISSING_YEAR)
+        )
+        rows = conn.execute(
+            f"""
+            SELECT s, t, {kind}, c, y FROM (
+                SELECT {_person_column(source)} AS s, {_person_column(target)} AS t,
+                       CASE WHEN typeof({code}) = 'integer' THEN {code} ELSE 0 END AS c, {year_sql} AS y
+                FROM {table}
+            )
+            WHERE s IS NOT NULL AND t IS NOT NULL AND s <> t
+            """
+        ).fetchall()
+        logger.info("  %s: %d %s edges", table, len(rows), name)
+        parts.append(np.array(rows, dtype=np.int64).reshape(-1, 5))
+    edges = np.concatenate(parts) if parts else np.empty((0, 5), dtype=np.int64)
+    return tuple(edges[:, column] for column in range(5))
+
+
+def _csr(
+    n: int, sources: "np.ndarray", targets: "np.ndarray", kind: "np.ndarray", code: "np.ndarray", year: "np.ndarray"
+) -> Dict[str, "np.ndarray"]:
+    order = np.lexsort((targets, sources))
+    indptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    return {
+        "indptr": indptr,
+        "targets": targets[order].astype(np.int32),
+        "kind": kind[order].astype(np.int8),
+        "code": code[order].astype(np.int32),
+        "year": year[order].astype(np.int16),
+    }
+
+
+def build_graph(db_path: str | Path, graph_dir: Optional[str | Path] = None) -> Path:
+    """Write the CSR arrays of *db_path* to *graph_dir* (default: next to the database) and return it."""
+    require_numpy()
+    db_path = Path(db_path)
+    graph_dir = Path(graph_dir) if graph_dir else graph_dir_for(db_path)
+    started = time.perf_counter()
+    identity = _db_identity(db_path)
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        sources, targets, kind, code, year = load_edges(conn)
+        people = np.array(
+            [row[0] for row in conn.execute(f"SELECT {_person_column('c_personid')} FROM {PERSON_TABLE}")
+             if row[0] is not None],
+            dtype=np.int64,
+        )
+    finally:
+        conn.close()
+
+    nodes = np.unique(np.concatenate([people, sources, targets])).astype(np.int32)
+    source_index = np.searchsorted(nodes, sources)
+    target_index = np.searchsorted(nodes, targets)
+    directions = {
+        "out": _csr(len(nodes), source_index, target_index, kind, code, year),
+        "in": _csr(len(nodes), target_index, source_index, kind, code, year),
+    }
+
+    # Written beside the old graph and swapped in, so open PersonGraphs keep their files.
+    staging = graph_dir.with_name(graph_dir.name + ".tmp")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    np.save(staging / "nodes.npy", nodes)
+    for direction, arrays in directions.items():
+        for name, array in arrays.items():
+            np.save(staging / f"{direction}_{name}.npy", array)
+    meta = {
+        "version": FORMAT_VERSION,
+        "database": db_path.name,
+        "database_identity": identity,
+        "built_at_utc": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "nodes": int(len(nodes)),
+        "edges": {name: int((kind == index).sum()) for index, name in enumerate(KINDS)},
+    }
+    (staging / META_FILE).write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    old = graph_dir.with_name(graph_dir.name + ".old")
+    shutil.rmtree(old, ignore_errors=True)
+    if graph_dir.exists():
+        graph_dir.rename(old)
+    staging.rename(graph_dir)
+    shutil.rmtree(old, ignore_errors=True)
+
+    logger.info(
+        "Graph of %d people and %d edges written to %s in %.2f s",
+        len(nodes), len(sources), graph_dir, time.perf_counter() - started,
+    )
+    return graph_dir
+
+
+@dataclass(frozen=True)
+class EdgeFilter:
+    """
+    Which edges a query follows.  *codes* are c_assoc_code values for
+    association edges and c_kin_code values for kin edges.  With a year range,
+    edges without a year are only followed if *include_undated*.
+    """
+
+    kinds: Optional[Tuple[str, ...]] = None
+    codes: Optional[Tuple[int, ...]] = None
+    first_year: Optional[int] = None
+    last_year: Optional[int] = None
+    include_undated: bool = False
+
+    def __post_init__(self) -> None:
+        unknown = [kind for kind in self.kinds or () if kind not in KINDS]
+        if unknown:
+            raise ValueError(f"Unknown edge kind(s) {unknown}, expected one of {KINDS}")
+
+    def select(self, arrays: Dict[str, "np.ndarray"], edges: "np.ndarray") -> "np.ndarray":
+        """The positions in *edges* (edge indices into *arrays*) that pass the filter."""
+        keep = np.ones(len(edges), dtype=bool)
+        if self.kinds is not None:
+            keep &= np.isin(arrays["kind"][edges], [KINDS.index(kind) for kind in self.kinds])
+        if self.codes is not None:
+            keep &= np.isin(arrays["code"][edges], self.codes)
+        if self.first_year is not None or self.last_year is not None:
+            year = arrays["year"][edges]
+            dated = year != MISSING_YEAR
+            in_range = dated.copy()
+            if self.first_year is not None:
+                in_range &= year >= self.first_year
+            if self.last_year is not None:
+                in_range &= year <= self.last_year
+            keep &= in_range | (~dated if self.include_undated else False)
+        return np.flatnonzero(keep)
+
+
+NO_FILTER = EdgeFilter()
+
+
+def _gather(indptr: "np.ndarray", frontier: "np.ndarray") -> Tuple["np.ndarray", "np.ndarray"]:
+    """(edge indices, their source node) of every edge leaving the nodes of *frontier*."""
+    starts = indptr[frontier]
+    counts = indptr[frontier + 1] - starts
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # Position k of the result is edge starts[j] + (k - first position of j).
+    offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+    return offsets + np.arange(total), np.repeat(frontier, counts)
+
+
+class PersonGraph:
+    """Memory-mapped CSR graph written by build_graph.  Safe to share between threads."""
+
+    def __init__(self, db_path: str | Path, graph_dir: Optional[str | Path] = None):
+        require_numpy()
+        db_path = Path(db_path)
+        self.graph_dir = Path(graph_dir) if graph_dir else graph_dir_for(db_path)
+        meta_path = self.graph_dir / META_FILE
+        if not meta_path.exists():
+            raise LookupError(f"No graph in {self.graph_dir}, run `person_graph.py build` first")
+        self.meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise LookupError(f"{self.graph_dir} has graph format {self.meta.get('version')}, rebuild it")
+        if db_path.exists() and _db_identity(db_path) != self.meta["database_identity"]:
+            logger.warning("%s changed since %s was built; rebuild it for current data", db_path, self.graph_dir)
+        self.nodes = np.load(self.graph_dir / "nodes.npy", mmap_mode="r")
+        self.arrays = {
+            direction: {name: np.load(self.graph_dir / f"{direction}_{name}.npy", mmap_mode="r") for name in ARRAYS}
+            for direction in ("out", "in")
+        }
+
+    def index(self, person_ids: Iterable[int]) -> "np.ndarray":
+        """Node indices of *person_ids*; KeyError for people not in the graph."""
+        ids = np.array(person_ids if isinstance(person_ids, np.ndarray) else list(person_ids), dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.nodes, ids), len(self.nodes) - 1)
+        missing = self.nodes[positions] != ids if len(self.nodes) else np.ones(len(ids), dtype=bool)
+        if missing.any():
+            raise KeyError(f"Not in the graph: {ids[missing][:10].tolist()}")
+        return positions
+
+    def _directions(self, direction: str) -> Sequence[str]:
+        if direction not in DIRECTIONS:
+            raise ValueError(f"Unknown direction {direction!r}, expected one of {DIRECTIONS}")
+        return ("out", "in") if direction == "both" else (direction,)
+
+    def _edges(
+        self, frontier: "np.ndarray", direction: str, edge_filter: EdgeFilter
+    ) -> List[Tuple[Dict[str, "np.ndarray"], "np.ndarray", "np.ndarray"]]:
+        """[(arrays, edge indices, source nodes)] of the filtered edges leaving *frontier*, per direction."""
+        found = []
+        for name in self._directions(direction):
+            arrays = self.arrays[name]
+            edges, sources = _gather(arrays["indptr"], frontier)
+            if edge_filter != NO_FILTER:
+                keep = edge_filter.select(arrays, edges)
+                edges, sources = edges[keep], sources[keep]
+            found.append((arrays, edges, sources))
+        return found
+
+    def neighbours(
+        self, frontier: "np.ndarray", direction: str = "both", edge_filter: EdgeFilter = NO_FILTER
+    ) -> "np.ndarray":
+        """Distinct node indices one filtered edge away from the node indices in *frontier*."""
+        parts = [arrays["targets"][edges] for arrays, edges, _ in self._edges(frontier, direction, edge_filter)]
+        return np.unique(np.concatenate(parts))
+
+    def k_hop(
+        self,
+        person_ids: int | Iterable[int],
+        k: int = 2,
+        direction: str = "both",
+        edge_filter: EdgeFilter = NO_FILTER,
+    ) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        (c_personid, hops) of everyone within *k* hops of *person_ids*, the
+        people themselves included at 0 hops, ordered by hops.
+        """
+        seeds = self.index(np.atleast_1d(person_ids))
+        hops = np.full(len(self.nodes), -1, dtype=np.int16)
+        hops[seeds] = 0
+        frontier = np.unique(seeds)
+        reached = [frontier]
+        for hop in range(1, k + 1):
+            if not len(frontier):
+                break
+            candidates = self.neighbours(frontier, direction, edge_filter)
+            frontier = candidates[hops[candidates] < 0]
+            hops[frontier] = hop
+            reached.append(frontier)
+        nodes = np.concatenate(reached)
+        return np.asarray(self.nodes[nodes]), hops[nodes]
+
+    def degree(
+        self,
+        person_ids: Optional[Iterable[int]] = None,
+        direction: str = "both",
+        edge_filter: EdgeFilter = NO_FILTER,
+    ) -> Tuple["np.ndarray", "np.ndarray"]:
+        """
+        (c_personid, number of distinct people linked to each) for *person_ids*,
+        or for every person in the graph.
+        """
+        nodes = np.arange(len(self.nodes)) if person_ids is None else self.index(person_ids)
+        pairs = []
+        for arrays, edges, sources in self._edges(nodes, direction, edge_filter):
+            pairs.append(sources * len(self.nodes) + arrays["targets"][edges])
+        distinct = np.unique(np.concatenate(pairs)) // len(self.nodes)
+        counts = np.bincount(distinct, minlength=len(self.nodes))
+        return np.asarray(self.nodes[nodes]), counts[nodes]
+
+    def top_degrees(
+        self, limit: int = 20, direction: str = "both", edge_filter: EdgeFilter = NO_FILTER
+    ) -> Tuple["np.ndarray", "np.ndarray"]:
+        """The *limit* people with the highest degree, highest first."""
+        people, degrees = self.degree(None, direction, edge_filter)
+        top = np.argsort(-degrees, kind="stable")[:limit]
+        return people[top], degrees[top]
+
+    def ego(
+        self,
+        person_id: int,
+        radius: int = 1,
+        direction: str = "both",
+        edge_filter: EdgeFilter = NO_FILTER,
+    ) -> Tuple["np.ndarray", "np.ndarray", Dict[str, "np.ndarray"]]:
+        """
+        The ego network of *person_id*: (c_personid, hops) of the people within
+        *radius* hops, and the filtered recorded edges between any two of them
+        as {"source", "target" (c_personid), "kind", "code", "year"} arrays.
+        """
+        people, hops = self.k_hop(person_id, radius, direction, edge_filter)
+        members = self.index(people)
+        is_member = np.zeros(len(self.nodes), dtype=bool)
+        is_member[members] = True
+        (arrays, edges, sources), = self._edges(members, "out", edge_filter)
+        targets = arrays["targets"][edges]
+        inside = is_member[targets]
+        edges, sources, targets = edges[inside], sources[inside], targets[inside]
+        return people, hops, {
+            "source": np.asarray(self.nodes[sources]),
+            "target": np.asarray(self.nodes[targets]),
+            "kind": np.asarray(arrays["kind"][edges]),
+            "code": np.asarray(arrays["code"][edges]),
+            "year": np.asarray(arrays["year"][edges]),
+        }
+
+
+def k_hop_sql(conn: sqlite3.Connection, person_id: int, k: int = 2) -> Dict[int, int]:
+    """{c_personid: hops} within *k* hops over both directions, with a recursive query, for comparison."""
+    tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+    steps = " UNION ".join(
+        f"SELECT {b}, reach.hops + 1 FROM reach JOIN {table} ON {a} = reach.id "
+        f"WHERE reach.hops < :k AND {b} > 0 AND {b} <> {a}"
+        for _, table, source, target, _, _ in EDGE_SOURCES
+        if table in tables
+        for a, b in ((source, target), (target, source))
+    )
+    rows = conn.execute(
+        f"""
+        WITH RECURSIVE reach(id, hops) AS (SELECT :person_id, 0 UNION {steps})
+        SELECT id, MIN(hops) FROM reach GROUP BY id
+        """,
+        {"person_id": person_id, "k": k},
+    )
+    return dict(rows)
+
+
+def _names(db_path: Path, person_ids: Sequence[int]) -> Dict[int, Tuple[str, str]]:
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        return {
+            row[0]: (row[1] or "", row[2] or "")
+            for row in conn.execute(
+                f"SELECT c_personid, c_name_chn, c_name FROM {PERSON_TABLE} "
+                f"WHERE c_personid IN (SELECT value FROM json_each(?))",
+                (json.dumps([int(i) for i in person_ids]),),
+            )
+        }
+    finally:
+        conn.close()
+
+
+def _print_people(db_path: Path, people: "np.ndarray", values: "np.ndarray", label: str, limit: int) -> None:
+    shown = [int(person) for person in people[:limit]]
+    names = _names(db_path, shown)
+    print(f"{'c_personid':>10}  {label:>6}  name")
+    for person, value in zip(shown, values[:limit]):
+        name_chn, name = names.get(person, ("", ""))
+        print(f"{person:>10}  {int(value):>6}  {name_chn}  {name}")
+    if len(people) > limit:
+        print(f"... {len(people) - limit} more")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the CBDB association and kinship network to CSR arrays and query it.")
+    parser.add_argument(
+        "--db",
+        default="latest.db",
+        type=Path,
+        help="Path to the SQLite database (default: latest.db).",
+    )
+    parser.add_argument("--graph-dir", type=Path, help="Directory of the arrays (default: <db stem>.graph next to it).")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help="(Re)build the CSR arrays from ASSOC_DATA and KIN_DATA.")
+    khop = subparsers.add_parser("khop", help="People within k hops of a person.")
+    khop.add_argument("person_id", type=int)
+    khop.add_argument("-k", type=int, default=2, help="Hops (default: 2).")
+    khop.add_argument("--sql", action="store_true", help="Also run the recursive SQL query and compare the timings.")
+    degree = subparsers.add_parser("degree", help="Distinct people linked to each person.")
+    degree.add_argument("person_ids", type=int, nargs="*", metavar="PERSON_ID", help="Default: the --top people.")
+    degree.add_argument("--top", type=int, default=20, help="People with the highest degree to list (default: 20).")
+    ego = subparsers.add_parser("ego", help="A person's ego network: people within --radius hops and their edges.")
+    ego.add_argument("person_id", type=int)
+    ego.add_argument("--radius", type=int, default=1, help="Hops (default: 1).")
+    for sub in (khop, degree, ego):
+        sub.add_argument("--direction", choices=DIRECTIONS, default="both", help="Edges to follow (default: both).")
+        sub.add_argument("--kind", choices=KINDS, action="append", help="Only follow this kind of edge (repeatable).")
+        sub.add_argument("--code", type=int, nargs="+", help="Only follow edges with these association or kin codes.")
+        sub.add_argument("--from-year", type=int, help="Only follow edges dated this year or later.")
+        sub.add_argument("--to-year", type=int, help="Only follow edges dated this year or earlier.")
+        sub.add_argument("--include-undated", action="store_true", help="With a year range, also follow undated edges.")
+        sub.add_argument("--limit", type=int, default=50, help="Rows to print (default: 50).")
+    args = parser.parse_args()
+    if not args.db.is_file():
+        parser.error(f"database file '{args.db}' does not exist.")
+
+    if args.command == "build":
+        build_graph(args.db, args.graph_dir)
+        parser.exit()
+
+    graph = PersonGraph(args.db, args.graph_dir)
+    edge_filter = EdgeFilter(
+        tuple(args.kind) if args.kind else None,
+        tuple(args.code) if args.code else None,
+        args.from_year,
+        args.to_year,
+        args.include_undated,
+    )
+    started = time.perf_counter()
+    try:
+        if args.command == "khop":
+            people, hops = graph.k_hop(args.person_id, args.k, args.direction, edge_filter)
+            elapsed = time.perf_counter() - started
+            _print_people(args.db, people, hops, "hops", args.limit)
+            print(f"{len(people)} people within {args.k} hops in {elapsed * 1000:.1f} ms")
+            if args.sql:
+                if edge_filter != NO_FILTER or args.direction != "both":
+                    parser.error("--sql only supports unfiltered queries in both directions.")
+                conn = sqlite3.connect(f"{args.db.resolve().as_uri()}?mode=ro", uri=True)
+                started = time.perf_counter()
+                try:
+                    expected = k_hop_sql(conn, args.person_id, args.k)
+                finally:
+                    conn.close()
+                same = expected == dict(zip(people.tolist(), hops.tolist()))
+                print(f"recursive SQL: {len(expected)} people in {(time.perf_counter() - started) * 1000:.1f} ms, "
+                      f"{'same' if same else 'DIFFERENT'} result")
+        elif args.command == "degree":
+            if args.person_ids:
+                people, degrees = graph.degree(args.person_ids, args.direction, edge_filter)
+            else:
+                people, degrees = graph.top_degrees(args.top, args.direction, edge_filter)
+            elapsed = time.perf_counter() - started
+            _print_people(args.db, people, degrees, "degree", args.limit)
+            print(f"in {elapsed * 1000:.1f} ms")
+        else:
+            people, hops, edges = graph.ego(args.person_id, args.radius, args.direction, edge_filter)
+            elapsed = time.perf_counter() - started
+            _print_people(args.db, people, hops, "hops", args.limit)
+            print(f"{'source':>10}  {'target':>10}  {'kind':5}  {'code':>5}  year")
+            for i in range(min(len(edges["source"]), args.limit)):
+                year = int(edges["year"][i])
+                print(
+                    f"{int(edges['source'][i]):>10}  {int(edges['target'][i]):>10}  {KINDS[edges['kind'][i]]:5}  "
+                    f"{int(edges['code'][i]):>5}  {'' if year == MISSING_YEAR else year}"
+                )
+            print(f"{len(people)} people, {len(edges['source'])} edges in {elapsed * 1000:.1f} ms")
+    except KeyError as exc:
+        parser.exit(1, f"{exc.args[0]}\n")
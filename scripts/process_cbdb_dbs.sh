@@ -3,7 +3,7 @@
 set -euo pipefail
 IFS=$'\n\t'
 
-readonly REQUIRED_TOOLS=(wget 7z sqlite3 python3)
+readonly REQUIRED_TOOLS=(7z sqlite3 python3)
 
 announce() {
     printf '\n==> %s\n' "$1"
@@ -35,7 +35,8 @@ download_file() {
     local destination="$2"
 
     printf '  %s\n' "$(basename "$destination")"
-    wget --quiet --show-progress --progress=bar:force:noscroll -O "$destination" "$url"
+    # Resumes dropped transfers with HTTP Range requests.
+    python3 download_release.py --url "$url" --output "$destination" >/dev/null
 }
 
 extract_archive() {
@@ -99,6 +100,7 @@ download_release "CBDB_20240820.db" \
     "https://huggingface.co/datasets/cbdb/cbdb-sqlite/resolve/main/history/CBDB_20240820/CBDB_20240820.7z.002"
 
 # optional: remove indexes (saves space); uncomment if preferred
+# (python3 index_advisor.py --db <db> --create restores the ones the views need)
 # sqlite3 CBDB_20250520.db "SELECT 'DROP INDEX IF EXISTS \"' || name || '\";' FROM sqlite_master WHERE type='index';" | sqlite3 CBDB_20250520.db
 # sqlite3 CBDB_20240820.db "SELECT 'DROP INDEX IF EXISTS \"' || name || '\";' FROM sqlite_master WHERE type='index';" | sqlite3 CBDB_20240820.db
 
@@ -0,0 +1,623 @@
+#!/usr/bin/env python3
+"""
+Release-to-release patches for the CBDB SQLite database.
+
+``make`` diffs two releases table by table, keyed by the primary key (by
+the whole row for tables without one), and writes the difference as an
+xz-compressed binary patch: schema statements for the objects that were
+added, removed or changed, then per table the keys to delete and the rows to
+insert.  Tables whose definition changed, and the shadow tables of changed
+virtual tables, are shipped whole.  The FTS5 and R*Tree indexes are patched
+through their shadow tables, so nothing is rebuilt on the receiving side.
+
+``apply`` checks that the patch was made for the database at hand, applies
+it in one transaction and commits only if the result has the logical digest
+of the target release.  The digest is a SHA-256 over the schema and, per
+table, the row count and the sum of the row hashes, so it does not depend on
+row order or on the file layout: a patched file differs byte for byte from
+the released one, so the base is accepted if either its file sha256 or its
+digest matches, and patches can be applied one release after another.
+
+    python release_patch.py make cbdb_20260822.sqlite3 cbdb_20261017.sqlite3 \\
+        --output cbdb_20261017.patch --latest-json ../latest.json --url URL
+    python release_patch.py apply cbdb_20261017.patch --db latest.db
+
+With --latest-json, ``make`` records the patch in latest.json under
+"patch"; ``download_release.py --update`` uses it to bring an existing
+database up to date.
+
+Usage:
+    python release_patch.py make BASE_DB TARGET_DB [--output PATH] [--latest-json PATH --url URL]
+    python release_patch.py apply PATCH [--db DB_PATH] [--output PATH]
+    python release_patch.py digest DB_PATH
+"""
+
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import lzma
+import shutil
+import sqlite3
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import sqlite_profiles
+
+MAGIC = b"CBDBPATCH"
+FORMAT_VERSION = 1
+CHUNK_SIZE = 1 << 20
+# Rows per executemany while applying.
+APPLY_BATCH = 10000
+# Internal tables carried by the patch: ANALYZE statistics, when both releases have them.
+STAT_TABLES = ("sqlite_stat1",)
+
+# Records of the patch stream; each starts with its one-byte opcode.
+OP_SCHEMA = b"S"  # text: a schema statement to execute
+OP_TABLE = b"T"  # text: JSON {"table", "columns", "key", "clear"} for the rows that follow
+OP_DELETE = b"D"  # key values: delete the rows with this key
+OP_INSERT = b"I"  # row values: insert this row
+OP_END = b"E"
+
+_U32 = struct.Struct("<I")
+_I64 = struct.Struct("<q")
+_F64 = struct.Struct("<d")
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+def quote_identifier(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def file_sha256(path: str | Path) -> str:
+    hasher = hashlib.sha256()
+    with Path(path).open("rb") as handle:
+        for chunk in iter(lambda: handle.read(CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+# -- schema -------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class SchemaObject:
+    type: str  # table, virtual, shadow, index, view or trigger
+    name: str
+    tbl_name: str
+    sql: Optional[str]
+
+
+def load_schema(conn: sqlite3.Connection, schema: str = "main") -> Dict[str, SchemaObject]:
+    """{name: object} for every object of *schema* except SQLite's internal ones."""
+    table_types = {
+        row[1]: row[2] for row in conn.execute(f"PRAGMA {schema}.table_list") if row[0] == schema
+    }
+    objects = {}
+    for type_, name, tbl_name, sql in conn.execute(
+        f"SELECT type, name, tbl_name, sql FROM {schema}.sqlite_master WHERE name NOT LIKE 'sqlite_%'"
+    ):
+        if type_ == "table":
+            type_ = table_types.get(name, "table")
+        objects[name] = SchemaObject(type_, name, tbl_name, sql)
+    for name in STAT_TABLES:
+        if name in table_types:
+            objects[name] = SchemaObject("stat", name, name, None)
+    return objects
+
+
+def _columns(conn: sqlite3.Connection, table: str, schema: str = "main") -> Tuple[List[str], List[str]]:
+    """(columns, primary key columns) of *table*; generated columns are left out."""
+    info = list(conn.execute(f"PRAGMA {schema}.table_info({quote_identifier(table)})"))
+    columns = [row[1] for row in info]
+    key = [row[1] for row in sorted(info, key=lambda row: row[5]) if row[5]]
+    return columns, key
+
+
+def _owner(shadow: str, objects: Dict[str, SchemaObject]) -> Optional[str]:
+    """The virtual table a shadow table belongs to (shadow tables are named <vtab>_<suffix>)."""
+    owners = [
+        obj.name for obj in objects.values() if obj.type == "virtual" and shadow.startswith(obj.name + "_")
+    ]
+    return max(owners, key=len) if owners else None
+
+
+def _data_tables(objects: Dict[str, SchemaObject]) -> List[str]:
+    """Tables whose rows are compared: ordinary and shadow tables plus ANALYZE statistics."""
+    return sorted(obj.name for obj in objects.values() if obj.type in ("table", "shadow", "stat"))
+
+
+# -- digest -------------------------------------------------------------------
+
+
+def _row_hash(row: tuple) -> int:
+    return int.from_bytes(hashlib.blake2b(repr(row).encode("utf-8"), digest_size=16).digest(), "big")
+
+
+def logical_digest(conn: sqlite3.Connection) -> str:
+    """
+    SHA-256 over the schema and, per table, the row count and the sum of the
+    row hashes mod 2**128; independent of row order and file layout.  The
+    ANALYZE statistics are not part of it.
+    """
+    objects = load_schema(conn)
+    summary = {
+        "schema": sorted(
+            (obj.type, obj.name, obj.tbl_name, obj.sql) for obj in objects.values() if obj.type != "stat"
+        ),
+        "tables": {},
+    }
+    for table in _data_tables(objects):
+        if objects[table].type == "stat":
+            continue
+        columns, _ = _columns(conn, table)
+        count, total = 0, 0
+        select = ", ".join(quote_identifier(column) for column in columns)
+        for row in conn.execute(f"SELECT {select} FROM {quote_identifier(table)}"):
+            count += 1
+            total = (total + _row_hash(row)) & ((1 << 128) - 1)
+        summary["tables"][table] = [columns, count, f"{total:032x}"]
+    return hashlib.sha256(json.dumps(summary, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def database_digest(db_path: str | Path) -> str:
+    conn = sqlite3.connect(f"{Path(db_path).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        return logical_digest(conn)
+    finally:
+        conn.close()
+
+
+# -- encoding -----------------------------------------------------------------
+
+
+def _encode_text(text: str) -> bytes:
+    data = text.encode("utf-8")
+    return _U32.pack(len(data)) + data
+
+
+def _encode_values(values: Sequence[object]) -> bytes:
+    parts = []
+    for value in values:
+        if value is None:
+            parts.append(b"N")
+        elif isinstance(value, int):
+            parts.append(b"i" + _I64.pack(value))
+        elif isinstance(value, float):
+            parts.append(b"f" + _F64.pack(value))
+        elif isinstance(value, str):
+            parts.append(b"t" + _encode_text(value))
+        else:
+            value = bytes(value)
+            parts.append(b"b" + _U32.pack(len(value)) + value)
+    return b"".join(parts)
+
+
+class _Reader:
+    """Decodes the records of a patch stream."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+
+    def _read(self, size: int) -> bytes:
+        data = self.stream.read(size)
+        if len(data) != size:
+            raise ValueError("Patch is truncated")
+        return data
+
+    def text(self) -> str:
+        return self._read(_U32.unpack(self._read(4))[0]).decode("utf-8")
+
+    def values(self, count: int) -> tuple:
+        values = []
+        for _ in range(count):
+            tag = self._read(1)
+            if tag == b"N":
+                values.append(None)
+            elif tag == b"i":
+                values.append(_I64.unpack(self._read(8))[0])
+            elif tag == b"f":
+                values.append(_F64.unpack(self._read(8))[0])
+            elif tag == b"t":
+                values.append(self.text())
+            elif tag == b"b":
+                values.append(self._read(_U32.unpack(self._read(4))[0]))
+            else:
+                raise ValueError(f"Corrupt patch: unknown value tag {tag!r}")
+        return tuple(values)
+
+    def opcode(self) -> bytes:
+        return self._read(1)
+
+
+def read_header(stream: BinaryIO) -> Dict[str, object]:
+    if stream.read(len(MAGIC)) != MAGIC:
+        raise ValueError("Not a CBDB release patch")
+    header = json.loads(_Reader(stream).text())
+    if header.get("version") != FORMAT_VERSION:
+        raise ValueError(f"Unsupported patch version {header.get('version')}, expected {FORMAT_VERSION}")
+    return header
+
+
+# -- make ---------------------------------------------------------------------
+
+
+class _Writer:
+    """Encodes records, handing them to the compressor in chunks of about CHUNK_SIZE bytes."""
+
+    def __init__(self, stream: BinaryIO):
+        self.stream = stream
+        self.buffer: List[bytes] = []
+        self.buffered = 0
+        self.deleted = 0
+        self.inserted = 0
+
+    def write(self, record: bytes) -> None:
+        self.buffer.append(record)
+        self.buffered += len(record)
+        if self.buffered >= CHUNK_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        self.stream.write(b"".join(self.buffer))
+        self.buffer, self.buffered = [], 0
+
+    def schema(self, sql: str) -> None:
+        self.write(OP_SCHEMA + _encode_text(sql))
+
+    def table(self, table: str, columns: List[str], key: Optional[List[str]], clear: bool = False) -> None:
+        block = {"table": table, "columns": columns, "key": key, "clear": clear}
+        self.write(OP_TABLE + _encode_text(json.dumps(block, ensure_ascii=False)))
+
+    def rows(self, opcode: bytes, rows: Iterator[tuple], copies: bool = False) -> int:
+        """Write one record per row; with *copies*, the last value is how many times to write it."""
+        count = 0
+        for row in rows:
+            times = row[-1] if copies else 1
+            record = opcode + _encode_values(row[:-1] if copies else row)
+            for _ in range(times):
+                self.write(record)
+            count += times
+        if opcode == OP_DELETE:
+            self.deleted += count
+        else:
+            self.inserted += count
+        return count
+
+
+def _diff_table(conn: sqlite3.Connection, writer: _Writer, table: str) -> Tuple[int, int]:
+    """Write the deletes and inserts that turn main.*table* into target.*table*."""
+    columns, key = _columns(conn, table, "target")
+    name = quote_identifier(table)
+    select = ", ".join(quote_identifier(column) for column in columns)
+    if key:
+        key_select = ", ".join(quote_identifier(column) for column in key)
+        deletes = conn.execute(
+            f"SELECT {key_select} FROM (SELECT {select} FROM main.{name} EXCEPT SELECT {select} FROM target.{name})"
+        )
+        inserts = conn.execute(f"SELECT {select} FROM target.{name} EXCEPT SELECT {select} FROM main.{name}")
+        copies = False
+    else:
+        # Without a key the rows form a multiset: changed counts delete every copy and insert the new number.
+        grouped = f"SELECT {select}, COUNT(*) FROM {{}}.{name} GROUP BY {select}"
+        deletes = conn.execute(
+            f"SELECT {select} FROM ({grouped.format('main')} EXCEPT {grouped.format('target')})"
+        )
+        inserts = conn.execute(f"{grouped.format('target')} EXCEPT {grouped.format('main')}")
+        copies = True
+    first = next(deletes, None)
+    first_insert = next(inserts, None)
+    if first is None and first_insert is None:
+        return 0, 0
+    writer.table(table, columns, key or None)
+    deleted = writer.rows(OP_DELETE, _chain(first, deletes))
+    inserted = writer.rows(OP_INSERT, _chain(first_insert, inserts), copies)
+    return deleted, inserted
+
+
+def _chain(first: Optional[tuple], rest: Iterator[tuple]) -> Iterator[tuple]:
+    if first is not None:
+        yield first
+        yield from rest
+
+
+def make_patch(base_db: str | Path, target_db: str | Path, output: str | Path) -> Dict[str, object]:
+    """
+    Write the patch from *base_db* to *target_db* to *output*; return its
+    header, which records both file hashes and logical digests.
+    """
+    base_db, target_db, output = Path(base_db), Path(target_db), Path(output)
+    for path in (base_db, target_db):
+        if not path.exists():
+            raise FileNotFoundError(f"Database file not found: {path}")
+    started = time.perf_counter()
+    logger.info("Computing the hashes and digests of %s and %s...", base_db.name, target_db.name)
+    header: Dict[str, object] = {"version": FORMAT_VERSION}
+    with ProcessPoolExecutor(max_workers=4) as pool:
+        futures = {
+            side: (path.name, pool.submit(file_sha256, path), pool.submit(database_digest, path))
+            for side, path in (("base", base_db), ("target", target_db))
+        }
+        for side, (name, sha256, digest) in futures.items():
+            header[side] = {"filename": name, "sha256": sha256.result(), "digest": digest.result()}
+
+    conn = sqlite3.connect(f"{base_db.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        conn.execute("ATTACH DATABASE ? AS target", (f"{target_db.resolve().as_uri()}?mode=ro",))
+
+        old, new = load_schema(conn), load_schema(conn, "target")
+        changed = {name for name, obj in new.items() if name not in old or old[name] != obj}
+        removed = {name for name in old if name not in new}
+        # Tables created by the patch are filled whole: new or redefined tables and the shadow tables of such virtual tables.
+        fresh = {
+            name for name in changed if new[name].type == "table"
+        } | {
+            name for name, obj in new.items()
+            if obj.type == "shadow" and (_owner(name, new) in changed or name in changed)
+        }
+
+        partial = output.with_name(output.name + ".part")
+        with lzma.open(partial, "wb") as stream:
+            stream.write(MAGIC + _encode_text(json.dumps(header)))
+            writer = _Writer(stream)
+            # Triggers are recreated at the end, so applying rows does not fire them.
+            for obj in sorted(old.values(), key=lambda obj: obj.name):
+                if obj.type == "trigger":
+                    writer.schema(f"DROP TRIGGER {quote_identifier(obj.name)}")
+            for type_ in ("view", "index"):
+                for name in sorted(removed | changed):
+                    if name in old and old[name].type == type_:
+                        writer.schema(f"DROP {type_.upper()} IF EXISTS {quote_identifier(name)}")
+            for name in sorted(removed | changed):
+                if name in old and old[name].type in ("table", "virtual"):
+                    writer.schema(f"DROP TABLE IF EXISTS {quote_identifier(name)}")
+            for name in sorted(changed):
+                if new[name].type in ("table", "virtual"):
+                    writer.schema(new[name].sql)
+            for name in STAT_TABLES:
+                if name in old and name not in new:
+                    writer.schema(f"DROP TABLE {name}")
+
+            for table in _data_tables(new):
+                if new[table].type == "stat" and table not in old:
+                    continue
+                if table in fresh:
+                    columns, key = _columns(conn, table, "target")
+                    writer.table(table, columns, key or None, clear=new[table].type == "shadow")
+                    select = ", ".join(quote_identifier(column) for column in columns)
+                    inserted = writer.rows(OP_INSERT, conn.execute(f"SELECT {select} FROM target.{quote_identifier(table)}"))
+                    deleted = 0
+                else:
+                    deleted, inserted = _diff_table(conn, writer, table)
+                if deleted or inserted:
+                    logger.info("  %-40s %9d deleted  %9d inserted%s", table, deleted, inserted,
+                                "  (whole table)" if table in fresh else "")
+
+            for type_ in ("index", "view", "trigger"):
+                for name, obj in sorted(new.items()):
+                    if obj.type != type_ or obj.sql is None:
+                        continue
+                    if type_ == "trigger" or name in changed or (type_ == "index" and obj.tbl_name in fresh):
+                        writer.schema(obj.sql)
+            for name in STAT_TABLES:
+                if name in new and name not in old:
+                    writer.schema("ANALYZE")
+            writer.write(OP_END)
+            writer.flush()
+        partial.replace(output)
+    finally:
+        conn.close()
+
+    header["patch"] = {"sha256": file_sha256(output), "size": output.stat().st_size}
+    logger.info(
+        "Wrote %s: %d rows deleted, %d inserted, %.1f MB (target %.1f MB) in %.1f s",
+        output, writer.deleted, writer.inserted, output.stat().st_size / 1e6,
+        target_db.stat().st_size / 1e6, time.perf_counter() - started,
+    )
+    return header
+
+
+def record_in_latest_json(latest_json: str | Path, header: Dict[str, object], url: str) -> None:
+    """Add the patch described by *header* to latest.json as its "patch" entry."""
+    latest_json = Path(latest_json)
+    info = json.loads(latest_json.read_text(encoding="utf-8"))
+    if info.get("sha256") and info["sha256"] != header["target"]["sha256"]:
+        logger.warning(
+            "%s describes %s (sha256 %s), not the patch target %s",
+            latest_json, info.get("sqlite_filename"), info["sha256"], header["target"]["filename"],
+        )
+    info["patch"] = {
+        "from_sqlite_filename": header["base"]["filename"],
+        "from_sha256": header["base"]["sha256"],
+        "from_digest": header["base"]["digest"],
+        "digest": header["target"]["digest"],
+        "url": url,
+        "sha256": header["patch"]["sha256"],
+        "size": header["patch"]["size"],
+    }
+    latest_json.write_text(json.dumps(info, indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+    logger.info("Recorded the patch in %s", latest_json)
+
+
+# -- apply --------------------------------------------------------------------
+
+
+class _TableApplier:
+    """Applies the deletes and inserts of one table block."""
+
+    def __init__(self, conn: sqlite3.Connection, block: Dict[str, object]):
+        self.conn = conn
+        self.table = quote_identifier(block["table"])
+        self.columns = block["columns"]
+        self.key = block["key"] or self.columns
+        self.keyed = block["key"] is not None
+        self.pending: List[tuple] = []
+        self.deleting = True
+        if block["clear"]:
+            conn.execute(f"DELETE FROM {self.table}")
+        placeholders = ", ".join("?" * len(self.columns))
+        self.insert_sql = (
+            f"INSERT INTO {self.table} ({', '.join(map(quote_identifier, self.columns))}) VALUES ({placeholders})"
+        )
+        if self.keyed:
+            where = " AND ".join(f"{quote_identifier(column)} IS ?" for column in self.key)
+            self.delete_sql = f"DELETE FROM {self.table} WHERE {where}"
+        else:
+            # Rows without a key are matched on every column; collected in a temp table and deleted in one pass.
+            conn.execute("DROP TABLE IF EXISTS temp.PATCH_KEYS")
+            conn.execute(f"CREATE TEMP TABLE PATCH_KEYS ({', '.join(map(quote_identifier, self.key))})")
+            self.delete_sql = f"INSERT INTO temp.PATCH_KEYS VALUES ({', '.join('?' * len(self.key))})"
+
+    def delete(self, key: tuple) -> None:
+        self.pending.append(key)
+        if len(self.pending) >= APPLY_BATCH:
+            self.flush()
+
+    def insert(self, row: tuple) -> None:
+        if self.deleting:
+            self.flush()
+            self._finish_deletes()
+        self.pending.append(row)
+        if len(self.pending) >= APPLY_BATCH:
+            self.flush()
+
+    def flush(self) -> None:
+        if self.pending:
+            self.conn.executemany(self.delete_sql if self.deleting else self.insert_sql, self.pending)
+            self.pending = []
+
+    def _finish_deletes(self) -> None:
+        self.deleting = False
+        if not self.keyed:
+            columns = ", ".join(map(quote_identifier, self.key))
+            self.conn.execute(f"CREATE INDEX temp.PATCH_KEYS_all ON PATCH_KEYS ({columns})")
+            match = " AND ".join(f"t.{quote_identifier(c)} IS k.{quote_identifier(c)}" for c in self.key)
+            self.conn.execute(
+                f"DELETE FROM {self.table} WHERE rowid IN "
+                f"(SELECT t.rowid FROM {self.table} t JOIN temp.PATCH_KEYS k ON {match})"
+            )
+            self.conn.execute("DROP TABLE temp.PATCH_KEYS")
+
+    def close(self) -> None:
+        self.flush()
+        if self.deleting:
+            self._finish_deletes()
+
+
+def apply_patch(
+    patch: str | Path, db_path: str | Path, output: Optional[str | Path] = None, base_verified: bool = False
+) -> str:
+    """
+    Apply *patch* to *db_path* (or to a copy of it at *output*) in one
+    transaction; return the digest of the result.  Raises ValueError if the
+    patch was made for another database or the result is not the target.
+    *base_verified* skips the base check for callers that did it already.
+    """
+    patch, db_path = Path(patch), Path(db_path)
+    if not db_path.exists():
+        raise FileNotFoundError(f"Database file not found: {db_path}")
+    started = time.perf_counter()
+    with lzma.open(patch, "rb") as stream:
+        header = read_header(stream)
+        base, target = header["base"], header["target"]
+        logger.info("Patch %s -> %s", base["filename"], target["filename"])
+
+        base_matches = base_verified or file_sha256(db_path) == base["sha256"]
+        if output is not None:
+            output = Path(output)
+            shutil.copyfile(db_path, output)
+            db_path = output
+        conn = sqlite_profiles.connect(db_path, profile="default", isolation_level=None)
+        try:
+            if base_matches:
+                if not base_verified:
+                    logger.info("✓ Base file sha256 matches (%s)", base["sha256"])
+            else:
+                # A database patched before differs from the release file, but not in content.
+                logger.info("Base file sha256 differs, comparing logical digests...")
+                digest = logical_digest(conn)
+                if digest != base["digest"]:
+                    raise ValueError(
+                        f"{db_path} is not the base of this patch: digest {digest}, expected {base['digest']}"
+                    )
+                logger.info("✓ Base digest matches (%s)", digest)
+
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                reader = _Reader(stream)
+                applier: Optional[_TableApplier] = None
+                while True:
+                    opcode = reader.opcode()
+                    if opcode == OP_DELETE:
+                        applier.delete(reader.values(len(applier.key)))
+                        continue
+                    if opcode == OP_INSERT:
+                        applier.insert(reader.values(len(applier.columns)))
+                        continue
+                    if applier is not None:
+                        applier.close()
+                        applier = None
+                    if opcode == OP_SCHEMA:
+                        conn.execute(reader.text())
+                    elif opcode == OP_TABLE:
+                        applier = _TableApplier(conn, json.loads(reader.text()))
+                    elif opcode == OP_END:
+                        break
+                    else:
+                        raise ValueError(f"Corrupt patch: unknown record {opcode!r}")
+                logger.info("Patch applied in %.1f s, verifying the result...", time.perf_counter() - started)
+                digest = logical_digest(conn)
+                if digest != target["digest"]:
+                    raise ValueError(f"Patched database has digest {digest}, expected {target['digest']}")
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+    logger.info("✓ %s now matches %s (digest %s) after %.1f s", db_path, target["filename"], digest,
+                time.perf_counter() - started)
+    return digest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Make and apply patches between CBDB SQLite releases.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    make = subparsers.add_parser("make", help="Write the patch from one release to the next.")
+    make.add_argument("base", type=Path, help="The previous release.")
+    make.add_argument("target", type=Path, help="The new release.")
+    make.add_argument("--output", type=Path, help="Patch file to write (default: <target name>.patch).")
+    make.add_argument("--latest-json", type=Path, metavar="PATH",
+                      help="Record the patch in this latest.json (requires --url).")
+    make.add_argument("--url", help="URL the patch will be published at, for --latest-json.")
+
+    apply = subparsers.add_parser("apply", help="Apply a patch to the database of the previous release.")
+    apply.add_argument("patch", type=Path)
+    apply.add_argument("--db", default="latest.db", type=Path,
+                       help="Database to patch in place (default: latest.db).")
+    apply.add_argument("--output", type=Path, help="Patch a copy written to this path instead.")
+
+    digest = subparsers.add_parser("digest", help="Print the logical digest of a database.")
+    digest.add_argument("db", type=Path)
+    args = parser.parse_args()
+
+    if args.command == "make":
+        if args.latest_json and not args.url:
+            parser.error("--latest-json requires --url.")
+        output = args.output or args.target.with_name(args.target.stem + ".patch")
+        header = make_patch(args.base, args.target, output)
+        if args.latest_json:
+            record_in_latest_json(args.latest_json, header, args.url)
+    elif args.command == "apply":
+        apply_patch(args.patch, args.db, args.output)
+    else:
+        print(database_digest(args.db))
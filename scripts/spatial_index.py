@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+"""
+Spatial index over the coordinates of CBDB addresses.
+
+``build`` creates ADDR_RTREE, an SQLite R*Tree over x_coord (longitude),
+y_coord (latitude) and the years each entry is valid.  Every entry is one
+address over one contiguous period of its ADDRESSES rows, so a gap in the
+hierarchy stays a gap; addresses without ADDRESSES rows (or every address,
+if ADDRESSES has not been built) get one entry spanning their ADDR_CODES
+years.  Addresses without coordinates are left out.  Rebuild the index after
+ADDRESSES changed.
+
+SpatialIndex answers bounding-box, radius and k-nearest queries from it,
+optionally restricted to the places that existed in a given year:
+
+    with SpatialIndex("latest.db") as index:
+        index.bbox(114.0, 22.0, 115.0, 23.0, year=1100)
+        index.radius(114.5, 22.5, km=50)
+        index.nearest(114.5, 22.5, k=5, year=1100)
+
+Usage:
+    python spatial_index.py [--db DB_PATH] build
+    python spatial_index.py [--db DB_PATH] bbox MIN_X MIN_Y MAX_X MAX_Y [--year YEAR]
+    python spatial_index.py [--db DB_PATH] radius X Y KM [--year YEAR]
+    python spatial_index.py [--db DB_PATH] nearest X Y [-k K] [--year YEAR]
+"""
+
+from __future__ import annotations
+
+import argparse
+import logging
+import math
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import sqlite_profiles
+
+RTREE_TABLE = "ADDR_RTREE"
+# Year bounds of entries whose address has no years; R*Tree coordinates are 32-bit floats.
+UNKNOWN_FIRST_YEAR = -9999
+UNKNOWN_LAST_YEAR = 9999
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+# First radius tried by nearest(); it doubles until k places are found.
+NEAREST_START_KM = 25.0
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Place:
+    c_addr_id: int
+    x_coord: float
+    y_coord: float
+    first_year: int
+    last_year: int
+
+
+def haversine_km(x1: float, y1: float, x2: float, y2: float) -> float:
+    """Great-circle distance in km between two (longitude, latitude) points."""
+    phi1, phi2 = math.radians(y1), math.radians(y2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(x2 - x1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _address_periods(conn: sqlite3.Connection, tables: set) -> Iterator[Tuple[int, float, float, int, int]]:
+    """(c_addr_id, x, y, first_year, last_year) per address and contiguous period."""
+    covered = set()
+    if "ADDRESSES" in tables:
+        current = None
+        for addr_id, x, y, first, last in conn.execute(
+            """
+            SELECT c_addr_id, x_coord, y_coord, c_belongs_firstyear, c_belongs_lastyear
+            FROM ADDRESSES
+            WHERE x_coord IS NOT NULL AND y_coord IS NOT NULL AND c_belongs_firstyear IS NOT NULL
+            ORDER BY c_addr_id, c_belongs_firstyear
+            """
+        ):
+            covered.add(addr_id)
+            if current and current[0] == addr_id and first <= current[4] + 1:
+                current[4] = max(current[4], last)
+                continue
+            if current:
+                yield tuple(current)
+            current = [addr_id, x, y, first, last]
+        if current:
+            yield tuple(current)
+
+    for addr_id, x, y, first, last in conn.execute(
+        "SELECT c_addr_id, x_coord, y_coord, c_firstyear, c_lastyear FROM ADDR_CODES "
+        "WHERE x_coord IS NOT NULL AND y_coord IS NOT NULL ORDER BY c_addr_id"
+    ):
+        if addr_id not in covered:
+            yield (
+                addr_id,
+                x,
+                y,
+                UNKNOWN_FIRST_YEAR if first is None else first,
+                UNKNOWN_LAST_YEAR if last is None else last,
+            )
+
+
+def build_spatial_index(db_path: str | Path, timeout: float = 5.0) -> int:
+    """
+    (Re)build ADDR_RTREE in *db_path*, waiting up to *timeout* seconds for
+    another writer; return its number of entries.
+    """
+    conn = sqlite_profiles.connect(db_path, timeout=timeout, isolation_level=None)
+    try:
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        if "ADDRESSES" not in tables:
+            logger.warning("ADDRESSES not found, indexing the ADDR_CODES years of every address")
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(f"DROP TABLE IF EXISTS {RTREE_TABLE}")
+            # The point is stored twice: rounded outwards to 32-bit floats in the
+            # tree, and exactly in the auxiliary columns that results are filtered on.
+            conn.execute(
+                f"""
+                CREATE VIRTUAL TABLE {RTREE_TABLE} USING rtree(
+                    id,
+                    min_x, max_x,
+                    min_y, max_y,
+                    min_year, max_year,
+                    +c_addr_id INTEGER,
+                    +x_coord REAL,
+                    +y_coord REAL
+                )
+                """
+            )
+            conn.executemany(
+                f"INSERT INTO {RTREE_TABLE} VALUES (NULL, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    (x, x, y, y, first, last, addr_id, x, y)
+                    for addr_id, x, y, first, last in _address_periods(conn, tables)
+                ),
+            )
+            count = conn.execute(f"SELECT COUNT(*) FROM {RTREE_TABLE}").fetchone()[0]
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.close()
+    logger.info("%s built with %d entries", RTREE_TABLE, count)
+    return count
+
+
+class SpatialIndex:
+    """
+    Read-only queries against ADDR_RTREE.  Keep one instance per thread and
+    reuse it: the connection caches its prepared statements.
+
+    Coordinates are (longitude, latitude) in degrees.  With *year*, only
+    places valid in that year are returned, with the period containing it;
+    without, each place is returned once with the span of all its periods.
+    """
+
+    def __init__(self, db_path: str | Path):
+        db_path = Path(db_path)
+        if not db_path.exists():
+            raise FileNotFoundError(f"Database file not found: {db_path}")
+        self.conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+        exists = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = ?", (RTREE_TABLE,)
+        ).fetchone()
+        if not exists:
+            self.conn.close()
+            raise LookupError(f"{RTREE_TABLE} not found in {db_path}, run `spatial_index.py build` first")
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def __enter__(self) -> "SpatialIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _query(self, min_x: float, min_y: float, max_x: float, max_y: float, year: Optional[int]) -> List[Place]:
+        bounds = (max_x, min_x, max_y, min_y) * 2
+        where = """
+            min_x <= ? AND max_x >= ? AND min_y <= ? AND max_y >= ?
+            AND x_coord <= ? AND x_coord >= ? AND y_coord <= ? AND y_coord >= ?
+        """
+        if year is None:
+            rows = self.conn.execute(
+                f"""
+                SELECT c_addr_id, x_coord, y_coord, MIN(min_year), MAX(max_year)
+                FROM {RTREE_TABLE}
+                WHERE {where}
+                GROUP BY c_addr_id
+                """,
+                bounds,
+            )
+        else:
+            rows = self.conn.execute(
+                f"""
+                SELECT c_addr_id, x_coord, y_coord, min_year, max_year
+                FROM {RTREE_TABLE}
+                WHERE {where} AND min_year <= ? AND max_year >= ?
+                """,
+                bounds + (year, year),
+            )
+        return [Place(addr_id, x, y, int(first), int(last)) for addr_id, x, y, first, last in rows]
+
+    def bbox(
+        self, min_x: float, min_y: float, max_x: float, max_y: float, year: Optional[int] = None
+    ) -> List[Place]:
+        """Places inside the box, edges included."""
+        return self._query(min_x, min_y, max_x, max_y, year)
+
+    def radius(self, x: float, y: float, km: float, year: Optional[int] = None) -> List[Tuple[float, Place]]:
+        """(distance_km, place) for the places within *km* of (x, y), nearest first."""
+        dy = km / KM_PER_DEGREE
+        cos_y = math.cos(math.radians(min(89.9, abs(y) + dy)))
+        dx = 180.0 if dy >= 90 else min(180.0, dy / cos_y)
+        found = []
+        for place in self._query(x - dx, max(-90.0, y - dy), x + dx, min(90.0, y + dy), year):
+            distance = haversine_km(x, y, place.x_coord, place.y_coord)
+            if distance <= km:
+                found.append((distance, place))
+        found.sort(key=lambda item: (item[0], item[1].c_addr_id))
+        return found
+
+    def nearest(self, x: float, y: float, k: int = 10, year: Optional[int] = None) -> List[Tuple[float, Place]]:
+        """(distance_km, place) for the *k* places nearest to (x, y), nearest first."""
+        km = NEAREST_START_KM
+        while True:
+            found = self.radius(x, y, km, year)
+            # Everything within km was found, so the k nearest are exact once there are k.
+            if len(found) >= k or km >= math.pi * EARTH_RADIUS_KM:
+                return found[:k]
+            km *= 2
+
+
+def _print_places(places: List[Place], distances: Optional[List[float]] = None) -> None:
+    print(f"{'c_addr_id':>10}  {'x_coord':>10}  {'y_coord':>10}  {'years':>11}" + ("  distance_km" if distances else ""))
+    for index, place in enumerate(places):
+        line = f"{place.c_addr_id:>10}  {place.x_coord:>10.5f}  {place.y_coord:>10.5f}  {place.first_year:>5}-{place.last_year:<5}"
+        if distances:
+            line += f"  {distances[index]:>11.2f}"
+        print(line)
+    print(f"{len(places)} place(s)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build and query the R*Tree index over CBDB address coordinates.")
+    parser.add_argument(
+        "--db",
+        default="latest.db",
+        type=Path,
+        help="Path to the SQLite database (default: latest.db).",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("build", help=f"(Re)build {RTREE_TABLE} from ADDRESSES and ADDR_CODES.")
+    bbox = subparsers.add_parser("bbox", help="Places inside a bounding box.")
+    for name in ("min_x", "min_y", "max_x", "max_y"):
+        bbox.add_argument(name, type=float)
+    radius = subparsers.add_parser("radius", help="Places within a distance of a point.")
+    radius.add_argument("x", type=float)
+    radius.add_argument("y", type=float)
+    radius.add_argument("km", type=float)
+    nearest = subparsers.add_parser("nearest", help="The k places nearest to a point.")
+    nearest.add_argument("x", type=float)
+    nearest.add_argument("y", type=float)
+    nearest.add_argument("-k", type=int, default=10, help="Number of places (default: 10).")
+    for sub in (bbox, radius, nearest):
+        sub.add_argument("--year", type=int, help="Only places that existed in this year.")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        build_spatial_index(args.db)
+    else:
+        with SpatialIndex(args.db) as index:
+            if args.command == "bbox":
+                _print_places(index.bbox(args.min_x, args.min_y, args.max_x, args.max_y, args.year))
+            else:
+                if args.command == "radius":
+                    results = index.radius(args.x, args.y, args.km, args.year)
+                else:
+                    results = index.nearest(args.x, args.y, args.k, args.year)
+                _print_places([place for _, place in results], [distance for distance, _ in results])
@@ -0,0 +1,332 @@
+"""
+Opt-in SQL instrumentation for the build scripts.
+
+``profiling(path)`` enables a process-wide profiler for the duration of a
+``with`` block.  Every connection opened through sqlite_profiles.connect in
+the meantime is instrumented:
+
+* its cursors time the execute and fetch calls of each statement and count
+  the rows it returned or changed;
+* set_trace_callback counts every statement SQLite runs, including each row
+  of an executemany and the statements of an executescript;
+* set_progress_handler counts virtual machine steps, SQLite's own measure of
+  the work a statement did, independent of the Python code around it.
+
+Statements are grouped by their text with literals replaced by ``?``, under
+the stage that was active when they ran.  Stages nest with
+``with sql_profiler.stage(name):`` per thread and cost next to nothing while
+profiling is off.  When the block ends the profile is written to *path* as
+JSON (per-stage and per-statement totals and the slowest executions of each
+stage), and next to it as folded stacks, one ``stage;substage;statement
+microseconds`` line each, which flamegraph.pl and speedscope read as is.
+"""
+
+from __future__ import annotations
+
+import contextlib
+import heapq
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import asdict, dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+REPORT_VERSION = 1
+# Virtual machine steps between two progress handler calls.
+DEFAULT_PROGRESS_STEPS = 1000
+# Slowest single executions kept per stage.
+SLOWEST_PER_STAGE = 10
+FOLDED_LABEL_WIDTH = 120
+
+logger = logging.getLogger(__name__)
+
+StagePath = Tuple[str, ...]
+
+_LITERAL_RE = re.compile(r"'(?:[^']|'')*'|\bX'[0-9A-Fa-f]*'|\b\d+(?:\.\d+)?(?:[eE][-+]?\d+)?\b")
+_PLACEHOLDER_LIST_RE = re.compile(r"\?(?:\s*,\s*\?)+")
+_SPACE_RE = re.compile(r"\s+")
+
+_active: Optional["SQLProfiler"] = None
+
+
+@lru_cache(maxsize=4096)
+def normalize(sql: str) -> str:
+    """*sql* on one line with literals and placeholder lists reduced to ``?``."""
+    sql = _LITERAL_RE.sub("?", sql)
+    sql = _PLACEHOLDER_LIST_RE.sub("?, ...", sql)
+    return _SPACE_RE.sub(" ", sql).strip()
+
+
+@dataclass
+class StatementStats:
+    calls: int = 0
+    executions: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    rows: int = 0
+    vm_steps: int = 0
+
+
+@dataclass
+class StageStats:
+    entered: int = 0
+    seconds: float = 0.0
+
+
+class _Running:
+    """The statement a connection is running, shared by its callbacks and cursors."""
+
+    __slots__ = ("key", "pinned")
+
+    def __init__(self):
+        self.key: Optional[Tuple[StagePath, str]] = None
+        # Set by a cursor while it executes, so the trace callback need not normalize.
+        self.pinned: Optional[Tuple[StagePath, str]] = None
+
+
+class SQLProfiler:
+    """Collects statement statistics from every connection attached to it."""
+
+    def __init__(self, progress_steps: int = DEFAULT_PROGRESS_STEPS):
+        self.progress_steps = progress_steps
+        self.statements: Dict[Tuple[StagePath, str], StatementStats] = {}
+        self.stages: Dict[StagePath, StageStats] = {}
+        # Min-heaps of (seconds, statement) per stage.
+        self.slowest: Dict[StagePath, List[Tuple[float, str]]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def path(self) -> StagePath:
+        return getattr(self._local, "path", ())
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        outer = self.path()
+        path = self._local.path = outer + (name,)
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            self._local.path = outer
+            with self._lock:
+                stats = self.stages.setdefault(path, StageStats())
+                stats.entered += 1
+                stats.seconds += elapsed
+
+    def _stats(self, path: StagePath, sql: str) -> StatementStats:
+        key = (path, sql)
+        stats = self.statements.get(key)
+        if stats is None:
+            stats = self.statements[key] = StatementStats()
+        return stats
+
+    def add(self, path: StagePath, sql: str, seconds: float, rows: int = 0, calls: int = 0) -> None:
+        with self._lock:
+            stats = self._stats(path, sql)
+            stats.calls += calls
+            stats.seconds += seconds
+            stats.rows += rows
+
+    def finish(self, path: StagePath, sql: str, seconds: float) -> None:
+        """Record one complete execution (execute plus its fetches) of *sql*."""
+        with self._lock:
+            stats = self._stats(path, sql)
+            stats.max_seconds = max(stats.max_seconds, seconds)
+            heap = self.slowest.setdefault(path, [])
+            if len(heap) < SLOWEST_PER_STAGE:
+                heapq.heappush(heap, (seconds, sql))
+            elif seconds > heap[0][0]:
+                heapq.heapreplace(heap, (seconds, sql))
+
+    def attach(self, conn: sqlite3.Connection) -> None:
+        """Install the trace callback and progress handler on *conn*."""
+        running = _Running()
+
+        def trace(statement: str) -> None:
+            # Triggers and the statements of a script arrive here without a cursor of their own.
+            key = running.pinned or (self.path(), normalize(statement))
+            running.key = key
+            with self._lock:
+                self._stats(*key).executions += 1
+
+        def progress() -> int:
+            if running.key is not None:
+                with self._lock:
+                    self._stats(*running.key).vm_steps += self.progress_steps
+            return 0
+
+        conn.set_trace_callback(trace)
+        conn.set_progress_handler(progress, self.progress_steps)
+        conn.profiler = self
+        conn.profiler_running = running
+
+    # -- reports -------------------------------------------------------------
+
+    def report(self) -> Dict[str, object]:
+        sql_seconds: Dict[StagePath, float] = {}
+        for (path, _), stats in self.statements.items():
+            sql_seconds[path] = sql_seconds.get(path, 0.0) + stats.seconds
+        return {
+            "version": REPORT_VERSION,
+            "progress_steps": self.progress_steps,
+            "stages": [
+                {"stage": "/".join(path), **asdict(stats), "sql_seconds": sql_seconds.get(path, 0.0)}
+                for path, stats in sorted(self.stages.items())
+            ],
+            "statements": [
+                {"stage": "/".join(path), "sql": sql, **asdict(stats)}
+                for (path, sql), stats in sorted(self.statements.items(), key=lambda item: -item[1].seconds)
+            ],
+            "slowest": {
+                "/".join(path): [
+                    {"seconds": seconds, "sql": sql} for seconds, sql in sorted(heap, reverse=True)
+                ]
+                for path, heap in sorted(self.slowest.items())
+            },
+        }
+
+    def folded(self) -> List[str]:
+        """Folded stacks weighted in microseconds; time a stage spent outside SQL is its [python] frame."""
+        lines = []
+        outside = {path: stats.seconds for path, stats in self.stages.items()}
+        for path, stats in self.stages.items():
+            if path[:-1] in outside:
+                outside[path[:-1]] -= stats.seconds
+        for (path, sql), stats in self.statements.items():
+            if path in outside:
+                outside[path] -= stats.seconds
+            label = sql[:FOLDED_LABEL_WIDTH].replace(";", ",")
+            lines.append(f"{';'.join(path + (label,))} {round(stats.seconds * 1e6)}")
+        for path, seconds in outside.items():
+            if seconds > 0:
+                lines.append(f"{';'.join(path + ('[python]',))} {round(seconds * 1e6)}")
+        return sorted(lines)
+
+    def write(self, path: str | Path) -> None:
+        path = Path(path)
+        path.write_text(json.dumps(self.report(), indent=2, ensure_ascii=False) + "\n", encoding="utf-8")
+        folded = path.with_suffix(".folded")
+        folded.write_text("\n".join(self.folded()) + "\n", encoding="utf-8")
+        logger.info("Wrote SQL profile to %s and %s", path, folded)
+
+    def log_summary(self, limit: int = 10) -> None:
+        top = sorted(self.statements.items(), key=lambda item: -item[1].seconds)[:limit]
+        if not top:
+            return
+        logger.info("Slowest statements (total time):")
+        for (path, sql), stats in top:
+            logger.info(
+                "  %8.3f s  %8d calls  %10d execs  %-24s  %.70s",
+                stats.seconds, stats.calls, stats.executions, "/".join(path) or "-", sql,
+            )
+
+
+class ProfilingCursor(sqlite3.Cursor):
+    """Cursor that reports the time and rows of its statements to the connection's profiler."""
+
+    _key: Optional[Tuple[StagePath, str]] = None
+    _elapsed = 0.0
+
+    def _begin(self, sql: str, method, *args):
+        self._end()
+        profiler = self.connection.profiler
+        running = self.connection.profiler_running
+        key = running.pinned = (profiler.path(), normalize(sql))
+        started = time.perf_counter()
+        try:
+            return method(*args)
+        finally:
+            elapsed = time.perf_counter() - started
+            running.pinned = None
+            self._key, self._elapsed = key, elapsed
+            profiler.add(*key, elapsed, rows=max(self.rowcount, 0), calls=1)
+
+    def _fetched(self, started: float, rows: int, done: bool) -> None:
+        if self._key is None:
+            return
+        elapsed = time.perf_counter() - started
+        self._elapsed += elapsed
+        self.connection.profiler.add(*self._key, elapsed, rows=rows)
+        if done:
+            self._end()
+
+    def _end(self) -> None:
+        if self._key is not None:
+            self.connection.profiler.finish(*self._key, self._elapsed)
+            self._key = None
+
+    def execute(self, sql, parameters=()):
+        return self._begin(sql, super().execute, sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self._begin(sql, super().executemany, sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        return self._begin(sql_script, super().executescript, sql_script)
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(started, 0, done=True)
+            raise
+        self._fetched(started, 1, done=False)
+        return row
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(started, row is not None, done=row is None)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(started, len(rows), done=not rows)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(started, len(rows), done=True)
+        return rows
+
+    def close(self):
+        self._end()
+        super().close()
+
+
+def active() -> Optional[SQLProfiler]:
+    """The profiler enabled by profiling(), if any."""
+    return _active
+
+
+def stage(name: str) -> contextlib.AbstractContextManager:
+    """Attribute the statements run inside the block to stage *name*; a no-op unless profiling."""
+    profiler = _active
+    return profiler.stage(name) if profiler is not None else contextlib.nullcontext()
+
+
+@contextlib.contextmanager
+def profiling(
+    path: Optional[str | Path], progress_steps: int = DEFAULT_PROGRESS_STEPS
+) -> Iterator[Optional[SQLProfiler]]:
+    """Profile the connections opened inside the block and write the report to *path*; no-op if None."""
+    global _active
+    if path is None:
+        yield None
+        return
+    profiler = _active = SQLProfiler(progress_steps)
+    try:
+        yield profiler
+    finally:
+        _active = None
+        profiler.log_summary()
+        profiler.write(path)
@@ -0,0 +1,117 @@
+"""
+Shared SQLite connection factory for the write-heavy scripts.
+
+``connect(db_path)`` opens a connection with the "bulk" profile:
+
+* journal_mode = WAL (or MEMORY / OFF for scratch databases that are thrown
+  away on failure; ROLLBACK is not reliable without a journal)
+* synchronous = OFF
+* a 512 MiB page cache, temp_store = MEMORY and a 1 GiB mmap window
+
+Closing the connection runs PRAGMA optimize, switches synchronous back to
+FULL and restores the journal mode the database had before, so the file is
+left in its usual, safe state.  ``profile="default"`` opens a plain
+connection with SQLite's defaults, e.g. for comparisons.
+
+While sql_profiler.profiling() is active, new connections are instrumented
+and their cursors report to the profiler.
+"""
+
+from __future__ import annotations
+
+import logging
+import sqlite3
+from pathlib import Path
+from typing import Optional, Tuple
+
+import sql_profiler
+
+PROFILES = ("bulk", "default")
+JOURNAL_MODES = ("wal", "memory", "off")
+
+BULK_CACHE_KIB = 512 * 1024
+BULK_MMAP_BYTES = 1 << 30
+
+logger = logging.getLogger(__name__)
+
+
+class ProfiledConnection(sqlite3.Connection):
+    """sqlite3.Connection that undoes the bulk profile when it is closed."""
+
+    _saved: Optional[Tuple[str, int]] = None
+    profiler: Optional[sql_profiler.SQLProfiler] = None
+
+    def apply_bulk_profile(self, journal_mode: str = "wal") -> None:
+        if journal_mode not in JOURNAL_MODES:
+            raise ValueError(f"Unknown journal mode {journal_mode!r}, expected one of {JOURNAL_MODES}")
+        saved_journal = self.execute("PRAGMA journal_mode").fetchone()[0]
+        saved_synchronous = self.execute("PRAGMA synchronous").fetchone()[0]
+        try:
+            self.execute(f"PRAGMA journal_mode = {journal_mode}")
+        except sqlite3.OperationalError as exc:
+            # e.g. leaving WAL while another connection has the database open.
+            logger.warning("Keeping journal_mode=%s: %s", saved_journal, exc)
+        self.execute("PRAGMA synchronous = OFF")
+        self.execute(f"PRAGMA cache_size = -{BULK_CACHE_KIB}")
+        self.execute("PRAGMA temp_store = MEMORY")
+        self.execute(f"PRAGMA mmap_size = {BULK_MMAP_BYTES}")
+        self._saved = (saved_journal, saved_synchronous)
+
+    # sqlite3.Connection.execute* do not go through cursor(), so route them there when profiling.
+
+    def cursor(self, factory=None):
+        if factory is None:
+            factory = sqlite3.Cursor if self.profiler is None else sql_profiler.ProfilingCursor
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        if self.profiler is None:
+            return super().execute(sql, parameters)
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        if self.profiler is None:
+            return super().executemany(sql, seq_of_parameters)
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, sql_script):
+        if self.profiler is None:
+            return super().executescript(sql_script)
+        return self.cursor().executescript(sql_script)
+
+    def close(self) -> None:
+        if self._saved is not None:
+            journal_mode, synchronous = self._saved
+            self._saved = None
+            try:
+                if self.in_transaction:
+                    self.rollback()
+                self.execute("PRAGMA optimize")
+                # Sync the final checkpoint properly before leaving WAL.
+                self.execute(f"PRAGMA synchronous = {max(synchronous, 2)}")
+                if self.execute("PRAGMA journal_mode").fetchone()[0] != journal_mode:
+                    self.execute(f"PRAGMA journal_mode = {journal_mode}")
+            except sqlite3.Error as exc:
+                logger.warning("Could not restore connection settings: %s", exc)
+        super().close()
+
+
+def connect(
+    db_path: str | Path,
+    profile: str = "bulk",
+    journal_mode: str = "wal",
+    **kwargs,
+) -> sqlite3.Connection:
+    """
+    Open *db_path* with the given *profile*; further keyword arguments go to
+    sqlite3.connect.
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown profile {profile!r}, expected one of {PROFILES}")
+    conn = sqlite3.connect(str(db_path), factory=ProfiledConnection, **kwargs)
+    profiler = sql_profiler.active()
+    if profiler is not None:
+        profiler.attach(conn)
+    if profile == "bulk":
+        conn.apply_bulk_profile(journal_mode)
+    return conn
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Differential tests for create_addresses_table.py: every engine must build the
+same ADDRESSES and ADDR_CLOSURE tables from a make_synthetic_db database.
+
+Usage:
+    cd scripts && python -m unittest test_create_addresses_table
+"""
+
+from __future__ import annotations
+
+import logging
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from typing import Dict, List
+
+import create_addresses_table
+import make_synthetic_db
+
+PEOPLE = 500
+
+
+def setUpModule() -> None:
+    logging.disable(logging.CRITICAL)
+
+
+def tearDownModule() -> None:
+    logging.disable(logging.NOTSET)
+
+
+def _dump(db_path: Path, table: str) -> List[tuple]:
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        return conn.execute(f"SELECT * FROM {table} ORDER BY rowid").fetchall()
+    finally:
+        conn.close()
+
+
+class EngineTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls) -> None:
+        tmp = tempfile.TemporaryDirectory()
+        cls.addClassCleanup(tmp.cleanup)
+        cls.dir = Path(tmp.name)
+        cls.source = cls.dir / "synthetic.db"
+        make_synthetic_db.generate(cls.source, people=PEOPLE)
+
+    def _build(self, engine: str) -> Path:
+        db_path = self.dir / f"{engine}.db"
+        shutil.copyfile(self.source, db_path)
+        with create_addresses_table.AddressHierarchyBuilder(str(db_path), engine=engine) as builder:
+            builder.run(closure=True)
+        return db_path
+
+    def test_engines_build_identical_tables(self) -> None:
+        built: Dict[str, Path] = {engine: self._build(engine) for engine in create_addresses_table.ENGINES}
+        for table in ("ADDRESSES", create_addresses_table.CLOSURE_TABLE):
+            expected = _dump(built["memory"], table)
+            self.assertTrue(expected, f"{table} is empty")
+            for engine in ("query", "sql"):
+                with self.subTest(table=table, engine=engine):
+                    self.assertEqual(_dump(built[engine], table), expected)
+
+    def test_verify_sql_engine_agrees_and_restores_the_engine(self) -> None:
+        db_path = self.dir / "verify.db"
+        shutil.copyfile(self.source, db_path)
+        with create_addresses_table.AddressHierarchyBuilder(str(db_path), engine="query") as builder:
+            self.assertTrue(builder.verify_sql_engine())
+            self.assertEqual(builder.engine, "query")
+
+
+if __name__ == "__main__":
+    unittest.main()
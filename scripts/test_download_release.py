@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Tests for download_release.py against a local HTTP server standing in for
+the release host.
+
+Usage:
+    cd scripts && python -m unittest test_download_release
+"""
+
+from __future__ import annotations
+
+import hashlib
+import http.server
+import json
+import logging
+import sqlite3
+import tempfile
+import threading
+import unittest
+import zipfile
+from pathlib import Path
+from typing import Dict, List, Optional
+from unittest import mock
+
+import download_release
+import release_patch
+
+PAYLOAD = bytes(range(256)) * 4096  # 1 MiB, read in several chunks with the patched CHUNK_SIZE
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    """Serves server.files, optionally failing, ignoring Range or dropping the first transfer."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        server = self.server
+        server.ranges.append(self.headers.get("Range"))
+        if server.fail_with:
+            self.send_error(server.fail_with.pop(0))
+            return
+        body = server.files.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        start = 0
+        range_header = self.headers.get("Range")
+        if range_header and server.honour_range:
+            start = int(range_header.split("=")[1].split("-")[0])
+            if start >= len(body):
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{len(body)}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header("Content-Range", f"bytes {start}-{len(body) - 1}/{len(body)}")
+        else:
+            self.send_response(200)
+        self.send_header("Content-Length", str(len(body) - start))
+        self.end_headers()
+        if server.drop_after is not None:
+            # Advertise the full length but hang up partway through, once.
+            self.wfile.write(body[start:server.drop_after])
+            server.drop_after = None
+            self.close_connection = True
+            return
+        self.wfile.write(body[start:])
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+class _ReleaseServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, files: Dict[str, bytes]):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.files = files
+        self.honour_range = True
+        self.drop_after: Optional[int] = None
+        # Statuses answered, in turn, before any request is served.
+        self.fail_with: List[int] = []
+        self.ranges: List[Optional[str]] = []
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+def setUpModule() -> None:
+    logging.disable(logging.CRITICAL)
+
+
+def tearDownModule() -> None:
+    logging.disable(logging.NOTSET)
+
+
+class _ServerTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = _ReleaseServer({"/release.bin": PAYLOAD})
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        # Keep the retry back-off and the read size out of the way of the tests.
+        for name, value in (("time.sleep", lambda _: None), ("CHUNK_SIZE", 64 * 1024)):
+            patcher = mock.patch(f"download_release.{name}", value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+
+class DownloadTest(_ServerTestCase):
+    def test_resumes_with_range_after_a_drop(self) -> None:
+        self.server.drop_after = 300_000
+        target = self.dir / "release.bin"
+        sha = download_release.download(self.server.url("/release.bin"), target)
+        self.assertEqual(target.read_bytes(), PAYLOAD)
+        self.assertEqual(sha, hashlib.sha256(PAYLOAD).hexdigest())
+        self.assertEqual(self.server.ranges, [None, "bytes=300000-"])
+        self.assertFalse(target.with_name("release.bin.part").exists())
+
+    def test_continues_a_part_file_from_an_earlier_run(self) -> None:
+        target = self.dir / "release.bin"
+        target.with_name("release.bin.part").write_bytes(PAYLOAD[:123_456])
+        sha = download_release.download(self.server.url("/release.bin"), target)
+        self.assertEqual(target.read_bytes(), PAYLOAD)
+        self.assertEqual(sha, hashlib.sha256(PAYLOAD).hexdigest())
+        self.assertEqual(self.server.ranges, ["bytes=123456-"])
+
+    def test_restarts_when_the_server_ignores_range(self) -> None:
+        self.server.honour_range = False
+        target = self.dir / "release.bin"
+        # Stale bytes that must not survive the restart.
+        target.with_name("release.bin.part").write_bytes(b"\xff" * 200_000)
+        sha = download_release.download(self.server.url("/release.bin"), target)
+        self.assertEqual(target.read_bytes(), PAYLOAD)
+        self.assertEqual(sha, hashlib.sha256(PAYLOAD).hexdigest())
+        self.assertEqual(self.server.ranges, ["bytes=200000-"])
+
+    def test_416_on_a_complete_part_file(self) -> None:
+        target = self.dir / "release.bin"
+        target.with_name("release.bin.part").write_bytes(PAYLOAD)
+        sha = download_release.download(self.server.url("/release.bin"), target)
+        self.assertEqual(target.read_bytes(), PAYLOAD)
+        self.assertEqual(sha, hashlib.sha256(PAYLOAD).hexdigest())
+        self.assertEqual(self.server.ranges, [f"bytes={len(PAYLOAD)}-"])
+
+    def test_retries_transient_http_errors(self) -> None:
+        self.server.fail_with = [503, 429]
+        target = self.dir / "release.bin"
+        sha = download_release.download(self.server.url("/release.bin"), target)
+        self.assertEqual(target.read_bytes(), PAYLOAD)
+        self.assertEqual(sha, hashlib.sha256(PAYLOAD).hexdigest())
+        self.assertEqual(self.server.ranges, [None, None, None])
+
+    def test_transient_errors_resume_with_range(self) -> None:
+        target = self.dir / "release.bin"
+        target.with_name("release.bin.part").write_bytes(PAYLOAD[:300_000])
+        self.server.fail_with = [502]
+        download_release.download(self.server.url("/release.bin"), target)
+        self.assertEqual(target.read_bytes(), PAYLOAD)
+        self.assertEqual(self.server.ranges, ["bytes=300000-", "bytes=300000-"])
+
+    def test_gives_up_after_the_retry_budget(self) -> None:
+        self.server.fail_with = [500, 500, 500]
+        with self.assertRaises(download_release.urllib.error.HTTPError) as raised:
+            download_release.download(self.server.url("/release.bin"), self.dir / "release.bin", retries=2)
+        self.assertEqual(raised.exception.code, 500)
+        self.assertEqual(len(self.server.ranges), 3)
+
+    def test_client_errors_are_not_retried(self) -> None:
+        with self.assertRaises(download_release.urllib.error.HTTPError):
+            download_release.download(self.server.url("/missing.bin"), self.dir / "missing.bin")
+        self.assertEqual(self.server.ranges, [None])
+
+
+def _zip(path: Path, members: Dict[str, bytes]) -> bytes:
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name, data in members.items():
+            zf.writestr(name, data)
+    return path.read_bytes()
+
+
+class ReleaseTest(_ServerTestCase):
+    def test_extract_picks_sqlite_filename_inside_a_folder(self) -> None:
+        archive = self.dir / "release.zip"
+        _zip(archive, {
+            "cbdb/README.txt": b"readme",
+            "cbdb/older.db": b"older",
+            "cbdb/cbdb_20250101.db": PAYLOAD,
+        })
+        target = self.dir / "latest.db"
+        sha = download_release.extract_database(archive, target, "cbdb_20250101.db")
+        self.assertEqual(target.read_bytes(), PAYLOAD)
+        self.assertEqual(sha, hashlib.sha256(PAYLOAD).hexdigest())
+        self.assertFalse(target.with_name("latest.db.part").exists())
+
+    def test_extract_without_a_member_takes_the_first_database(self) -> None:
+        archive = self.dir / "release.zip"
+        _zip(archive, {"cbdb/README.txt": b"readme", "cbdb/older.db": b"older"})
+        target = self.dir / "latest.db"
+        download_release.extract_database(archive, target)
+        self.assertEqual(target.read_bytes(), b"older")
+
+    def _publish(self, sha256: str) -> Path:
+        self.server.files["/release.zip"] = _zip(self.dir / "published.zip", {"cbdb/cbdb_20250101.db": PAYLOAD})
+        self.server.files["/latest.json"] = json.dumps({
+            "huggingface_url": self.server.url("/release.zip"),
+            "sqlite_filename": "cbdb_20250101.db",
+            "sha256": sha256,
+        }).encode("utf-8")
+        return self.dir / "work"
+
+    def test_download_release_verifies_the_database(self) -> None:
+        workdir = self._publish(hashlib.sha256(PAYLOAD).hexdigest())
+        target = self.dir / "latest.db"
+        download_release.download_release(target, self.server.url("/latest.json"), workdir)
+        self.assertEqual(target.read_bytes(), PAYLOAD)
+        self.assertEqual(list(workdir.iterdir()), [])
+
+    def test_sha256_mismatch_deletes_the_outputs(self) -> None:
+        workdir = self._publish("0" * 64)
+        target = self.dir / "latest.db"
+        with self.assertRaisesRegex(ValueError, "sha256 mismatch"):
+            download_release.download_release(target, self.server.url("/latest.json"), workdir, keep_archive=True)
+        self.assertFalse(target.exists())
+        self.assertEqual(list(workdir.iterdir()), [])
+
+
+def _database(path: Path, rows: List[tuple]) -> Path:
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT)")
+    conn.executemany("INSERT INTO t VALUES (?, ?)", rows)
+    conn.commit()
+    conn.close()
+    return path
+
+
+class UpdateTest(_ServerTestCase):
+    def setUp(self) -> None:
+        super().setUp()
+        self.base = _database(self.dir / "base.sqlite3", [(1, "a"), (2, "b"), (3, "c")])
+        self.release = _database(self.dir / "release.sqlite3", [(1, "a"), (2, "B"), (4, "d")])
+
+    def _publish(self, patch_base: Path) -> Dict[str, object]:
+        """Publish a patch made from *patch_base* as the patch for self.base."""
+        header = release_patch.make_patch(patch_base, self.release, self.dir / "release.patch")
+        self.server.files["/release.patch"] = (self.dir / "release.patch").read_bytes()
+        latest = self.dir / "latest.json"
+        latest.write_text(json.dumps({"sha256": header["target"]["sha256"]}), encoding="utf-8")
+        release_patch.record_in_latest_json(latest, header, self.server.url("/release.patch"))
+        info = json.loads(latest.read_text(encoding="utf-8"))
+        info["patch"]["from_sha256"] = release_patch.file_sha256(self.base)
+        self.server.files["/latest.json"] = json.dumps(info).encode("utf-8")
+        return header
+
+    def _update(self) -> Path:
+        download_release.update_release(self.dir / "latest.db", self.server.url("/latest.json"), self.dir / "work")
+        return self.dir / "latest.db"
+
+    def test_patch_is_applied_to_a_copy_and_swapped_in(self) -> None:
+        header = self._publish(self.base)
+        target = self.dir / "latest.db"
+        target.write_bytes(self.base.read_bytes())
+        # Readers holding the old file keep it; the patched database is a new one.
+        inode = target.stat().st_ino
+        self._update()
+        self.assertNotEqual(target.stat().st_ino, inode)
+        self.assertEqual(release_patch.database_digest(target), header["target"]["digest"])
+        self.assertFalse(target.with_name("latest.db.new").exists())
+        self.assertEqual(list((self.dir / "work").iterdir()), [])
+
+    def test_failed_patch_leaves_the_database_untouched(self) -> None:
+        other = _database(self.dir / "other.sqlite3", [(1, "a"), (5, "e")])
+        self._publish(other)
+        target = self.dir / "latest.db"
+        target.write_bytes(self.base.read_bytes())
+        with self.assertRaises((ValueError, sqlite3.Error)):
+            self._update()
+        self.assertEqual(target.read_bytes(), self.base.read_bytes())
+        self.assertFalse(target.with_name("latest.db.new").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()